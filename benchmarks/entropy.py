@@ -0,0 +1,111 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Measure the throughput of the entropy detector in MB/s.
+
+    python benchmarks/entropy.py [--size MB] [--repo PATH]
+
+Without `--repo`, scans generated source-like blobs with a few embedded
+keys. With `--repo`, scans every blob of a local repository's object
+store, the way `surch repo --engine native --entropy` does.
+"""
+
+import os
+import time
+import base64
+import random
+import argparse
+
+from surch import pack
+from surch.entropy import EntropyDetector
+
+WORDS = ('def', 'return', 'self', 'import', 'config', 'value', 'for', 'in',
+         'if', 'else', 'name', 'path', 'os.path.join', 'logger.info', '=',
+         '(', ')', ':', 'None', 'True', '0', '1', "'string'", 'results')
+
+
+def generate_blobs(size, blob_size=16 * 1024, seed=0):
+    rand = random.Random(seed)
+    blobs = []
+    total = 0
+    while total < size:
+        lines = []
+        length = 0
+        while length < blob_size:
+            line = ' '.join(rand.choice(WORDS) for _ in range(10))
+            if rand.random() < 0.001:
+                line = "key = '{0}'".format(base64.b64encode(os.urandom(30)))
+            lines.append(line)
+            length += len(line) + 1
+        blob = '\n'.join(lines)
+        blobs.append(blob)
+        total += len(blob)
+    return blobs
+
+
+def repo_blobs(repo_path):
+    store = pack.ObjectStore(repo_path)
+    blobs = []
+    for sha in set(store.iter_shas()):
+        object_type, data = store.read_binary(sha)
+        if object_type == 'blob':
+            blobs.append(data)
+    store.close()
+    return blobs
+
+
+def run(blobs, batch_size, repeat):
+    detector = EntropyDetector()
+    size = sum(len(blob) for blob in blobs)
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        hits = 0
+        batch = []
+        batch_bytes = 0
+        for blob in blobs:
+            batch.append(blob)
+            batch_bytes += len(blob)
+            if batch_bytes >= batch_size:
+                hits += len(detector.scan_batch(batch))
+                batch = []
+                batch_bytes = 0
+        hits += len(detector.scan_batch(batch))
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print('{0} blobs, {1:.1f} MB, {2} with high entropy strings'.format(
+        len(blobs), size / 1e6, hits))
+    print('{0:.1f} MB/s (best of {1})'.format(size / 1e6 / best, repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--size', type=float, default=32,
+                        help='MB of generated blobs to scan')
+    parser.add_argument('--repo', help='scan the blobs of this repository')
+    parser.add_argument('--batch-size', type=int,
+                        default=4 * 1024 * 1024,
+                        help='bytes scanned per detector call')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    if args.repo:
+        blobs = repo_blobs(args.repo)
+    else:
+        blobs = generate_blobs(int(args.size * 1e6))
+    run(blobs, args.batch_size, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
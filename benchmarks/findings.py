@@ -0,0 +1,135 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Measure the memory and write time per finding of a repository.
+
+    python benchmarks/findings.py [--findings N] [--commits N] [--files N]
+
+Builds the findings of a generated scan both as the dicts they used to
+be held as and as `surch.findings` records, each in a child process,
+and reports how much each grew the process and how long serialising
+them back to rows takes. Like in a real history, files keep their blob
+across many commits and commits have a few authors.
+"""
+
+import time
+import resource
+import argparse
+import multiprocessing
+
+from surch import delta, constants, findings
+
+ORGANIZATION = 'cloudify-cosmo'
+REPO_NAME = 'cloudify-manager-blueprints'
+
+
+def generate_matches(count, commits, files):
+    """Yield `sha:path` matches, fresh strings like git's output
+    """
+    for index in xrange(count):
+        commit = index % commits
+        yield '{0:040x}:src/module{1}/file{2}.py'.format(
+            commit, index % 97, (index // commits) % files)
+
+
+def details(commit_sha, authors=50):
+    author = int(commit_sha, 16) % authors
+    return ('Author {0}'.format(author),
+            'author{0}@example.com'.format(author),
+            'Tue Jul 12 10:15:30 2016')
+
+
+def blob_sha(commit_sha, filepath):
+    # A file changes every 50 commits.
+    return '{0:040x}'.format(hash((filepath, int(commit_sha, 16) // 50))
+                             & (2 ** 160 - 1))
+
+
+def as_dicts(matches):
+    """Return a callable yielding the rows of the findings, held as dicts
+    """
+    commit_details = {}
+    rows = []
+    for match in matches:
+        commit_sha, filepath = match.rsplit(':', 1)
+        if commit_sha not in commit_details:
+            commit_details[commit_sha] = details(commit_sha)
+        username, email, commit_time = commit_details[commit_sha]
+        blob = blob_sha(commit_sha, filepath)
+        rows.append(dict(
+            email=email,
+            filepath=filepath,
+            username=username,
+            commit_sha=commit_sha,
+            commit_time=commit_time,
+            blob_sha=blob,
+            fingerprint=delta.fingerprint(ORGANIZATION, REPO_NAME, filepath,
+                                          blob),
+            repository_name=REPO_NAME,
+            organization_name=ORGANIZATION,
+            blob_url=constants.GITHUB_BLOB_URL.format(
+                ORGANIZATION, REPO_NAME, commit_sha, filepath)))
+    return lambda: iter(rows)
+
+
+def as_findings(matches):
+    """Return a callable yielding the rows of the findings, held as
+    records
+    """
+    found = findings.Findings(ORGANIZATION, REPO_NAME)
+    for match in matches:
+        commit_sha, filepath = match.rsplit(':', 1)
+        commit = found.commit(commit_sha, *details(commit_sha))
+        blob = blob_sha(commit_sha, filepath)
+        found.add(commit, filepath, blob, delta.fingerprint(
+            ORGANIZATION, REPO_NAME, filepath, blob))
+    return found.rows
+
+
+def max_rss():
+    # In KB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(build, args, queue):
+    before = max_rss()
+    rows = build(generate_matches(args.findings, args.commits, args.files))
+    grown = max_rss() - before
+    start = time.time()
+    for _ in rows():
+        pass
+    queue.put((grown, time.time() - start))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--findings', type=int, default=1000000)
+    parser.add_argument('--commits', type=int, default=5000)
+    parser.add_argument('--files', type=int, default=2000)
+    args = parser.parse_args()
+    for name, build in (('dicts', as_dicts), ('findings', as_findings)):
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=measure,
+                                          args=(build, args, queue))
+        process.start()
+        grown, serialise = queue.get()
+        process.join()
+        print('{0:>8}: {1:>8.1f} MB, {2:>6.0f} B per finding, rows in '
+              '{3:.2f}s'.format(name, grown / 1024.0,
+                                grown * 1024.0 / args.findings, serialise))
+
+
+if __name__ == '__main__':
+    main()
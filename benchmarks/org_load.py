@@ -0,0 +1,175 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Load test `surch org` end to end against a local fake GitHub API.
+
+    python benchmarks/org_load.py [--repos N] [--workers N] [--runs N]
+        [--latency S] [--error-rate R] [--rate-limit N] [--user]
+
+Generates an organization (or user) of local repositories, serves it
+through `surch.tests.fake_github` with paging, rate limits and the given
+latency and share of 502s, and searches it with `Organization`. Every
+run reports its throughput, the latencies of the API requests and the
+per repository scan times. Later runs find the repositories unchanged
+unless `--rescan` is given.
+"""
+
+import os
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from multiprocessing.pool import ThreadPool
+
+from surch import utils, journal, scheduler, organization
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+OWNER = 'load'
+SECRET = 'hunter2'
+
+
+def generate_repo(path, index, commits, files, secret_every):
+    """Create the `index`th repository of the organization and return
+    its API data
+    """
+    repo_path = os.path.join(path, 'repo{0}'.format(index))
+    history = []
+    for commit in range(commits):
+        history.append(dict(
+            ('src/file{0}.py'.format(number),
+             'value = {0}\n'.format(commit * files + number) * 20)
+            for number in range(files)))
+    if secret_every and index % secret_every == 0:
+        history[-1]['settings.py'] = 'password = "{0}"\n'.format(SECRET)
+    helpers.import_repo(repo_path, history)
+    return {'name': 'repo{0}'.format(index),
+            'clone_url': repo_path,
+            'size': max(1, commits * files),
+            'pushed_at': '2016-07-12T10:15:30Z'}
+
+
+def generate_owner(path, args):
+    pool = ThreadPool(8)
+    try:
+        return pool.map(
+            lambda index: generate_repo(path, index, args.commits,
+                                        args.files, args.secret_every),
+            range(args.repos))
+    finally:
+        pool.close()
+
+
+def percentiles(values, points=(50, 95, 99)):
+    values = sorted(values)
+    if not values:
+        return [0] * (len(points) + 1)
+    return [values[min(len(values) - 1, len(values) * point // 100)]
+            for point in points] + [values[-1]]
+
+
+def search(api, path, args):
+    tokens = ['token{0}'.format(number) for number in range(args.tokens)]
+    organization.Organization(
+        organization=OWNER,
+        is_organization=not args.user,
+        github_api_url=api.url,
+        github_tokens=tokens,
+        github_cache_dir=os.path.join(path, 'cache'),
+        cache_ttl=0,
+        results_dir=os.path.join(path, 'results'),
+        cloned_repos_dir=os.path.join(path, 'clones'),
+        workers=args.workers,
+        rescan=args.rescan,
+        engine=args.engine).search([SECRET])
+
+
+def report(run, api, path, wall_time, repos):
+    results_file_path = os.path.join(path, 'results', 'results.json')
+    entries = journal.Journal(results_file_path).done().values()
+    scanned = [entry['repo_name'] for entry in entries
+               if not entry.get('carried')]
+    costs = scheduler.Costs(results_file_path).costs
+    scan_times = [costs[name]['seconds'] for name in scanned
+                  if name in costs]
+    api_times = [seconds for _, _, seconds in api.timings]
+    errors = sum(1 for _, status, _ in api.timings if status >= 500)
+    print('run {0}: {1} repos in {2:.2f}s, {3:.1f} repos/s, {4} scanned, '
+          '{5} findings'.format(run, repos, wall_time, repos / wall_time,
+                                len(scanned),
+                                len(helpers.read_results(results_file_path))))
+    print('  api: {0} requests, {1} errors, latency p50/p95/p99/max '
+          '{2:.3f}/{3:.3f}/{4:.3f}/{5:.3f}s'.format(
+              len(api_times), errors, *percentiles(api_times)))
+    print('  scan: p50/p95/p99/max {0:.3f}/{1:.3f}/{2:.3f}/{3:.3f}s '
+          'per repository'.format(*percentiles(scan_times)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repos', type=int, default=1000)
+    parser.add_argument('--commits', type=int, default=5)
+    parser.add_argument('--files', type=int, default=5)
+    parser.add_argument('--secret-every', type=int, default=10,
+                        help='put a secret in every Nth repository')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--runs', type=int, default=2)
+    parser.add_argument('--latency', type=float, nargs='+', default=[0.05],
+                        help='seconds, or a min and max, per API request')
+    parser.add_argument('--error-rate', type=float, default=0.02)
+    parser.add_argument('--rate-limit', type=int, default=5000,
+                        help='requests per token per window')
+    parser.add_argument('--rate-limit-window', type=int, default=3600)
+    parser.add_argument('--tokens', type=int, default=1)
+    parser.add_argument('--engine', default='grep')
+    parser.add_argument('--user', action='store_true')
+    parser.add_argument('--rescan', action='store_true')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    # The progress of 1,000 repositories would drown the report.
+    # `Organization` sets the level of the logger, so filter at its
+    # handlers.
+    for handler in utils.logger.handlers:
+        handler.setLevel(logging.WARNING)
+    path = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        repos = generate_owner(os.path.join(path, 'upstream'), args)
+        print('generated {0} repositories in {1:.2f}s'.format(
+            len(repos), time.time() - start))
+        latency = args.latency[0] if len(args.latency) == 1 \
+            else tuple(args.latency[:2])
+        api = FakeGitHub(
+            owners={('users' if args.user else 'orgs', OWNER): repos},
+            rate_limit=args.rate_limit,
+            rate_limit_window=args.rate_limit_window,
+            latency=latency,
+            error_rate=args.error_rate,
+            seed=args.seed).start()
+        try:
+            for run in range(1, args.runs + 1):
+                del api.timings[:]
+                start = time.time()
+                search(api, path, args)
+                report(run, api, path, time.time() - start, len(repos))
+        finally:
+            api.stop()
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
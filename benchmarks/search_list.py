@@ -0,0 +1,100 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+"""Measure search time with search lists of 10, 1k and 10k patterns.
+
+    python benchmarks/search_list.py [--sizes 10,1000,10000] [--commits N]
+
+Searches a generated repository with each engine, and reports the
+backend the `auto` engine selects. The search lists are mostly
+`re.escape`d literals, like the ones the Vault source produces, with a
+few regular expressions.
+"""
+
+import os
+import re
+import time
+import random
+import shutil
+import tempfile
+import argparse
+
+from surch import repo
+from surch.tests import helpers
+
+
+def generate_search_list(size, seed=0):
+    rand = random.Random(seed)
+    search_list = []
+    for index in range(size):
+        if index % 100 == 99:
+            search_list.append('key{0}[0-9]\\+'.format(index))
+        else:
+            search_list.append(re.escape('secret-{0:x}.{1}'.format(
+                rand.getrandbits(64), index)))
+    return search_list
+
+
+def generate_repo(path, commits, files, seed=0):
+    rand = random.Random(seed)
+    history = []
+    for commit in range(commits):
+        history.append(dict(
+            ('dir{0}/file{1}.txt'.format(index % 10, index),
+             ''.join('line {0} {1:x}\n'.format(line, rand.getrandbits(64))
+                     for line in range(200)))
+            for index in rand.sample(range(files), files // 10 or 1)))
+    helpers.create_local_repo(path, history)
+
+
+def run(tmp, engine, search_list):
+    surch_repo = repo.Repo(
+        repo_url=os.path.join(tmp, 'upstream', 'bench'),
+        search_list=search_list,
+        engine=engine,
+        results_dir=os.path.join(tmp, engine),
+        cloned_repo_dir=os.path.join(tmp, 'clones'))
+    surch_repo._clone_or_pull()
+    commits = surch_repo._get_all_commits()
+    start = time.time()
+    surch_repo._search(search_list, commits)
+    elapsed = time.time() - start
+    if surch_repo.store:
+        surch_repo.store.close()
+    return elapsed, surch_repo.backend
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,10000')
+    parser.add_argument('--commits', type=int, default=20)
+    parser.add_argument('--files', type=int, default=200)
+    args = parser.parse_args()
+    tmp = tempfile.mkdtemp()
+    try:
+        generate_repo(os.path.join(tmp, 'upstream', 'bench'),
+                      args.commits, args.files)
+        for size in [int(size) for size in args.sizes.split(',')]:
+            search_list = generate_search_list(size)
+            for engine in ('grep', 'native', 'auto'):
+                elapsed, backend = run(tmp, engine, search_list)
+                print('{0:>6} patterns, {1:>6}: {2:.2f}s ({3})'.format(
+                    size, engine, elapsed, backend))
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
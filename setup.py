@@ -53,5 +53,8 @@ setup(
         "tinydb==3.1.3",
         "requests==2.9.1",
         "retrying==1.3.3",
-    ]
+    ],
+    extras_require={
+        'entropy': ["numpy>=1.9"],
+    }
 )
@@ -0,0 +1,279 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+
+from . import pack, utils, patterns, constants
+
+# A backend finds the files of a commit which match the search list:
+#
+#   grep            git grep, with the search list in pattern files and
+#                   `GREP_THREADS` threads reading the tree
+#   grep-pcre       git grep -P, with the search list compiled into one
+#                   Perl-compatible expression (git must be built with
+#                   PCRE)
+#   native-regex    reads the object store directly and matches each
+#                   unique blob once with the compiled search list
+#   native-literal  same, but looks for each fixed string with str.find,
+#                   which beats the regex engine for a few fixed strings
+#
+# The `auto` engine calibrates the backends on the HEAD commit of the
+# repository and picks the one with the lowest estimated cost. git grep
+# reads the whole tree of every commit, so its cost is its time on HEAD
+# times the number of commits. The native backends only read blobs they
+# haven't seen, so their cost is their time on HEAD scaled to the bytes
+# of all the unique blobs of the repository (see `planner.repo_stats`).
+
+GREP = 'grep'
+GREP_PCRE = 'grep-pcre'
+NATIVE_REGEX = 'native-regex'
+NATIVE_LITERAL = 'native-literal'
+NATIVE_BACKENDS = (NATIVE_REGEX, NATIVE_LITERAL)
+
+
+class LiteralMatcher(object):
+    def __init__(self, fixed_strings):
+        """Match any of a few fixed strings, with the same interface as
+        a compiled regular expression
+        """
+        self.fixed_strings = fixed_strings
+
+    def search(self, data):
+        for fixed_string in self.fixed_strings:
+            if data.find(fixed_string) != -1:
+                return True
+        return False
+
+
+class GitGrep(object):
+    entropy = False
+
+    def __init__(self, repo_path, search_list, pcre=False,
+                 threads=constants.GREP_THREADS):
+        """Search commits with git grep
+
+        :param repo_path: path to the repository (string)
+        :param search_list: list of strings to search for (list)
+        :param pcre: match the search list as one Perl-compatible
+                     expression (boolean)
+        :param threads: number of threads of every git grep (int)
+        """
+        if pcre and patterns.matches_empty(search_list):
+            # git grep -P doesn't match the empty line git grep sees
+            # after the last newline of a file, so it would miss files
+            # git grep finds.
+            utils.logger.warn(
+                'The search list matches empty lines, which grep-pcre '
+                'matches differently. Using grep instead.')
+            pcre = False
+        self.name = GREP_PCRE if pcre else GREP
+        self.repo_path = repo_path
+        self.threads = threads
+        # Pattern files keep the command line short however long the
+        # search list is, and may hold secrets so are removed on close.
+        self.patterns_dir = tempfile.mkdtemp(prefix='surch-')
+        if pcre:
+            path = os.path.join(self.patterns_dir, 'pcre')
+            with open(path, 'w') as pattern_file:
+                pattern_file.write(
+                    patterns.translate_search_list(search_list) + '\n')
+            self.grep_options = ['-P -f {0}'.format(path)]
+        else:
+            self.grep_options = create_pattern_files(
+                list(search_list), self.patterns_dir)
+
+    def search_commit(self, commit):
+        """Run git grep on the commit once per pattern file and return
+        the matching files as (`sha:path`, finding type)
+        """
+        matches = []
+        seen = set()
+        for options in self.grep_options:
+            try:
+                matched_files = subprocess.check_output(
+                    'git -C {0} grep -l --threads {1} {2} {3}'.format(
+                        self.repo_path, self.threads, options, commit),
+                    shell=True)
+            except subprocess.CalledProcessError:
+                continue
+            for match in matched_files.splitlines():
+                if match not in seen:
+                    seen.add(match)
+                    matches.append((match, pack.PATTERN))
+        return matches
+
+    def close(self):
+        shutil.rmtree(self.patterns_dir, ignore_errors=True)
+
+
+class Native(object):
+    entropy = True
+
+    def __init__(self, store, search_list, entropy=None, literal=False,
+                 candidates=None):
+        """Search commits by reading the repository's object store
+        directly. Entropy findings are collected in the same pass.
+
+        :param store: object store of the repository (pack.ObjectStore)
+        :param search_list: list of strings to search for (list)
+        :param entropy: detector of high entropy strings (EntropyDetector)
+        :param literal: match the fixed strings of the search list with
+                        str.find instead of a regular expression (boolean)
+        :param candidates: binary shas of the only blobs which may match
+                        the search list, e.g. from the trigram index (set)
+        """
+        self.name = NATIVE_LITERAL if literal else NATIVE_REGEX
+        matcher = None
+        if search_list and literal:
+            matcher = LiteralMatcher(patterns.classify(search_list)[0])
+        elif search_list:
+            matcher = patterns.compile_search_list(search_list)
+        self.searcher = pack.NativeSearch(store, matcher, entropy=entropy,
+                                          candidates=candidates)
+
+    def search_commit(self, commit):
+        return self.searcher.search_commit(commit)
+
+    def close(self):
+        pass
+
+
+def create_pattern_files(search_list, patterns_dir):
+    """Write the search list to pattern files and return the git grep
+    options reading them.
+
+    git grep matches each of its patterns separately, so fixed
+    strings are joined into extended regex alternations of
+    `PATTERN_ALTERNATION_SIZE` strings which it matches at once.
+    Regular expressions are kept as they are. The patterns are split
+    into files of at most `PATTERN_FILE_CHUNK_SIZE` lines, each
+    searched with its own git grep invocation.
+    """
+    utils.logger.debug('Generating git grep pattern files...')
+    fixed_strings, regexes = patterns.classify(search_list)
+    alternation_size = constants.PATTERN_ALTERNATION_SIZE
+    alternations = [
+        patterns.extended_alternation(
+            fixed_strings[index:index + alternation_size])
+        for index in range(0, len(fixed_strings), alternation_size)]
+    chunk_size = constants.PATTERN_FILE_CHUNK_SIZE
+    grep_options = []
+    for kind, option, lines in (('fixed', '-E', alternations),
+                                ('regex', '-G', regexes)):
+        for index in range(0, len(lines), chunk_size):
+            path = os.path.join(patterns_dir, '{0}-{1}'.format(
+                kind, index // chunk_size))
+            with open(path, 'w') as pattern_file:
+                for line in lines[index:index + chunk_size]:
+                    pattern_file.write(line + '\n')
+            grep_options.append('{0} -f {1}'.format(option, path))
+    return grep_options
+
+
+def create(name, repo_path, search_list, store=None, entropy=None,
+           candidates=None):
+    """Return the backend of a name
+    """
+    if name in (GREP, GREP_PCRE):
+        return GitGrep(repo_path, search_list, pcre=name == GREP_PCRE)
+    return Native(store or pack.ObjectStore(repo_path), search_list,
+                  entropy=entropy, literal=name == NATIVE_LITERAL,
+                  candidates=candidates)
+
+
+def native(search_list):
+    """Return the name of the native backend for the search list
+    """
+    fixed_strings, regexes = patterns.classify(search_list)
+    if fixed_strings and not regexes and \
+            len(fixed_strings) <= constants.LITERAL_MATCHER_MAX:
+        return NATIVE_LITERAL
+    return NATIVE_REGEX
+
+
+def pcre_available(repo_path):
+    """Return whether git was built with PCRE
+    """
+    with open(os.devnull, 'w') as devnull:
+        return subprocess.call(
+            'git -C {0} grep -P -q -e surch HEAD'.format(repo_path),
+            shell=True, stdout=devnull, stderr=devnull) in (0, 1)
+
+
+def candidates(repo_path, search_list):
+    """Return the names of the backends able to search for the search
+    list in the repository
+    """
+    if not search_list:
+        # Only the native backends score entropy.
+        return [NATIVE_REGEX]
+    names = [GREP]
+    if pcre_available(repo_path) and not patterns.matches_empty(search_list):
+        names.append(GREP_PCRE)
+    names.append(NATIVE_REGEX)
+    if native(search_list) == NATIVE_LITERAL:
+        names.append(NATIVE_LITERAL)
+    return names
+
+
+def calibrate(repo_path, search_list, stats, entropy=None):
+    """Time every candidate backend on the HEAD commit and return the
+    name of the one with the lowest estimated cost for the whole
+    repository, with the estimated seconds of every candidate
+
+    :param repo_path: path to the repository (string)
+    :param search_list: list of strings to search for (list)
+    :param stats: shape of the repository (see `planner.repo_stats`)
+    :param entropy: detector of high entropy strings (EntropyDetector)
+    """
+    names = candidates(repo_path, search_list)
+    if len(names) == 1:
+        return names[0], {}
+    try:
+        head = subprocess.check_output(
+            'git -C {0} rev-parse --verify --quiet HEAD'.format(repo_path),
+            shell=True).strip()
+    except subprocess.CalledProcessError:
+        return names[0], {}
+    estimates = {}
+    for name in names:
+        store = pack.ObjectStore(repo_path) \
+            if name in NATIVE_BACKENDS else None
+        backend = create(name, repo_path, search_list, store=store,
+                         entropy=entropy)
+        try:
+            start = time.time()
+            backend.search_commit(head)
+            seconds = time.time() - start
+        finally:
+            backend.close()
+            if store:
+                store.close()
+        if store:
+            if stats['head_bytes']:
+                seconds *= stats['blob_bytes'] / float(stats['head_bytes'])
+        else:
+            seconds *= stats['commits']
+        estimates[name] = seconds
+    if entropy:
+        # git grep is followed by a native pass scoring entropy.
+        for name in (GREP, GREP_PCRE):
+            if name in estimates:
+                estimates[name] += estimates[NATIVE_REGEX]
+    return min(names, key=lambda name: estimates[name]), estimates
@@ -0,0 +1,272 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import re
+import sys
+import logging
+import functools
+import subprocess
+from time import time
+from collections import Counter
+
+from .plugins import handler
+from . import repo, utils, github, patterns, suppress, clonecache, \
+    scheduler, organization, constants
+
+# A batch scans the repositories of several organizations, users and
+# single repositories, listed in a config file, in one run. The search
+# list is built once (e.g. from Vault), the GitHub client and its cache
+# are shared, and all repositories are scanned by the same workers,
+# largest first. Results are written to a single results file, with a
+# table per target (e.g. `org/cloudify-cosmo`). Single repositories get
+# a table per owner (e.g. `repo/cloudify-cosmo`). Batch runs don't
+# trigger pager plugins.
+#
+#   targets:
+#     - org: cloudify-cosmo
+#       repos_to_skip: [surch]
+#     - user: someone
+#     - repo: https://github.com/cloudify-cosmo/surch.git
+
+TARGET_TYPES = ('org', 'user', 'repo')
+
+
+class Batch(object):
+    def __init__(self,
+                 config_file,
+                 results_dir=None,
+                 cloned_repos_dir=None,
+                 workers=1,
+                 cache_ttl=constants.GITHUB_CACHE_TTL,
+                 offline=False,
+                 verbose=False,
+                 github_cache_dir=None,
+                 clone_budget=None,
+                 suppressions=None):
+        """Surch batch instance init
+
+        :param config_file: path to a config file with the targets and
+                        the options to search them with (string)
+        :param results_dir: path to result file (string)
+        :param cloned_repos_dir: path for cloned repos (string)
+        :param workers: number of repositories to scan at once (int)
+        :param cache_ttl: seconds during which cached GitHub API responses
+                        are used without revalidating them (int)
+        :param offline: only use cached GitHub API responses (boolean)
+        :param verbose: log level (boolean)
+        :param github_cache_dir: path for cached GitHub API responses
+                        (string)
+        :param clone_budget: bytes the clones of all targets may take,
+                        least recently scanned ones are removed beyond
+                        it (int)
+        :param suppressions: path to a file of known false positives to
+                        leave out of the results (string)
+        """
+        utils.check_if_executable_exists_else_exit('git')
+        self.logger = utils.logger
+        self.logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+        self.config_file = config_file
+        conf_vars = utils.read_config_file(config_file=config_file)
+        self.targets = self._parse_targets(conf_vars.get('targets'))
+        self.source = handler.plugins_handle(
+            config_file=config_file, plugins_list=conf_vars.get('source'))
+        self.engine = conf_vars.get('engine', 'grep')
+        self.introduced = conf_vars.get('introduced', False)
+        self.entropy = conf_vars.get('entropy', False)
+        self.head_only = conf_vars.get('head_only', False)
+        self.shared_store = conf_vars.get('shared_store', False)
+        self.suppressions = suppressions or conf_vars.get('suppressions')
+        self.verbose = verbose
+        self.workers = max(1, workers or 1)
+        self.results_dir = results_dir or os.path.join(
+            constants.RESULTS_PATH, 'batch')
+        self.results_file_path = os.path.join(self.results_dir,
+                                              'results.json')
+        self.cloned_repos_dir = cloned_repos_dir or \
+            constants.CLONED_REPOS_PATH
+        # One budget for the clones of all targets.
+        clone_budget = clone_budget or conf_vars.get('clone_budget')
+        self.clone_cache = clonecache.CloneCache(
+            self.cloned_repos_dir, clonecache.parse_size(clone_budget)) \
+            if clone_budget else None
+        self.client = github.create_client(
+            git_user=conf_vars.get('git_user'),
+            git_password=conf_vars.get('git_password'),
+            github_tokens=conf_vars.get('github_tokens'),
+            github_api_url=conf_vars.get('github_api_url'),
+            github_cache_dir=github_cache_dir,
+            cache_ttl=cache_ttl,
+            offline=offline)
+
+    def _parse_targets(self, targets):
+        parsed = []
+        for target in targets or []:
+            kinds = [kind for kind in TARGET_TYPES
+                     if isinstance(target, dict) and kind in target]
+            if len(kinds) != 1:
+                self.logger.error(
+                    'Every target must have exactly one of {0}: {1}'.format(
+                        ', '.join(TARGET_TYPES), target))
+                sys.exit(1)
+            parsed.append((kinds[0], target))
+        if not parsed:
+            self.logger.error('No targets found in {0}'.format(
+                self.config_file))
+            sys.exit(1)
+        return parsed
+
+    def _get_search_list(self):
+        search_list = handler.merge_all_search_list(
+            source=self.source, config_file=self.config_file, search_list=[])
+        if len(search_list) == 0 and not self.entropy:
+            self.logger.error(
+                'You must supply at least one string to search for.')
+            sys.exit(1)
+        if search_list and (self.engine != 'grep' or self.introduced or
+                            self.head_only):
+            # Compile it once for all repositories.
+            try:
+                patterns.compile_search_list(search_list)
+            except patterns.PatternError as error:
+                self.logger.error(error)
+                sys.exit(1)
+        return search_list
+
+    def _list_target(self, kind, target):
+        """Return the repositories of a target, with the table and the
+        clones directory of the target
+        """
+        # Repositories of different owners may have the same name.
+        if kind == 'repo':
+            repo_url = target['repo']
+            owner, name = re.split('[/:]', repo_url.rstrip('/'))[-2:]
+            repos = [dict(name=name.rsplit('.', 1)[0]
+                          if name.endswith('.git') else name,
+                          clone_url=repo_url)]
+            table = '{0}/{1}'.format(kind, owner)
+            cloned_repos_dir = os.path.join(kind, owner)
+        else:
+            table = '{0}/{1}'.format(kind, target[kind])
+            cloned_repos_dir = os.path.join(kind, target[kind])
+            repos = organization.Organization(
+                organization=target[kind],
+                is_organization=kind == 'org',
+                repos_to_check=target.get('repos_to_check'),
+                repos_to_skip=target.get('repos_to_skip'),
+                verbose=self.verbose,
+                github_client=self.client).list_repos()
+        return [dict(repo_data,
+                     name='{0}/{1}'.format(table, repo_data['name']),
+                     table=table,
+                     cloned_repo_dir=os.path.join(self.cloned_repos_dir,
+                                                  cloned_repos_dir))
+                for repo_data in repos]
+
+    def _scan_repo(self, search_list, repo_data):
+        """Scan a repository and return its data, the scanned repo (None
+        if it failed) and the seconds it took
+        """
+        start = time()
+        try:
+            scanned_repo = repo.search(
+                print_result=False,
+                repo_url=repo_data['clone_url'],
+                verbose=self.verbose,
+                consolidate_log=True,
+                search_list=search_list,
+                remove_cloned_dir=False,
+                from_organization=True,
+                results_dir=self.results_dir,
+                results_table=repo_data['table'],
+                cloned_repo_dir=repo_data['cloned_repo_dir'],
+                engine=self.engine,
+                introduced=self.introduced,
+                entropy=self.entropy,
+                shared_store=self.shared_store,
+                head_only=self.head_only,
+                clone_cache=self.clone_cache,
+                suppressions=self.suppressions)
+        except subprocess.CalledProcessError:
+            return repo_data, None, time() - start
+        return repo_data, scanned_repo, time() - start
+
+    def search(self):
+        """Scan the repositories of all targets
+        """
+        search_list = self._get_search_list()
+        repos = []
+        for kind, target in self.targets:
+            repos.extend(self._list_target(kind, target))
+        utils.handle_results_file(self.results_file_path, False)
+
+        costs = scheduler.Costs(self.results_file_path)
+        repos = scheduler.largest_first(repos, costs.estimate(repos))
+        start = time()
+        failed = []
+        results = {}
+        suppressed = Counter()
+        try:
+            for repo_data, scanned_repo, seconds in scheduler.run(
+                    functools.partial(self._scan_repo, search_list),
+                    repos, self.workers):
+                if scanned_repo is None:
+                    failed.append(repo_data['name'])
+                    continue
+                results[repo_data['table']] = results.get(
+                    repo_data['table'], 0) + scanned_repo.result_count
+                suppress.add(suppressed, scanned_repo.suppressed)
+                costs.record(repo_data['name'], seconds,
+                             size=repo_data.get('size'),
+                             pushed_at=repo_data.get('pushed_at'),
+                             commits=scanned_repo.commits,
+                             backend=scanned_repo.backend)
+        finally:
+            costs.save()
+        scheduler.report(costs, [repo_data['name'] for repo_data in repos],
+                         time() - start, self.workers)
+        for table in sorted(results):
+            self.logger.info('{0}: {1} results'.format(table, results[table]))
+        if suppressed:
+            self.logger.info(suppress.summary(suppressed))
+        if failed:
+            self.logger.error('Failed to scan {0} repositories: {1}'.format(
+                len(failed), ', '.join(failed)))
+
+
+def search(config_file,
+           results_dir=None,
+           cloned_repos_dir=None,
+           workers=1,
+           cache_ttl=constants.GITHUB_CACHE_TTL,
+           offline=False,
+           verbose=False,
+           clone_budget=None,
+           suppressions=None):
+    """Api method init batch instance and search the targets of its
+    config file
+    """
+    batch = Batch(
+        config_file=config_file,
+        results_dir=results_dir,
+        cloned_repos_dir=cloned_repos_dir,
+        workers=workers,
+        cache_ttl=cache_ttl,
+        offline=offline,
+        verbose=verbose,
+        clone_budget=clone_budget,
+        suppressions=suppressions)
+    batch.search()
+    return batch
@@ -0,0 +1,200 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import sys
+import json
+import errno
+import time
+import fcntl
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+
+from . import utils, constants
+
+# The clones directory is kept under a disk budget. An index at its root
+# records the size of every clone, by path relative to the root (clones
+# of `surch batch` are grouped by owner), and when it was last scanned.
+# When the clones take more than the budget, the least recently scanned
+# ones are removed, so repositories scanned often keep being pulled
+# instead of cloned again.
+#
+# Clones being scanned, by this process or another sharing the clones
+# directory, hold a lease in the index: the pid of the process and when
+# the scan started. They are never evicted while the process is alive,
+# unless the lease is older than `CLONE_LEASE_TTL` (e.g. the pid was
+# reused after a crash).
+
+_lock = threading.Lock()
+
+
+def parse_size(size):
+    """Return the number of bytes of a size like `500M` or `20G`
+    """
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    size = str(size).strip().upper().rstrip('B')
+    if size and size[-1] in units:
+        return int(float(size[:-1]) * units[size[-1]])
+    return int(size)
+
+
+def disk_usage(path):
+    """Return the bytes a directory takes on disk
+    """
+    total = 0
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_blocks * 512
+            except OSError:
+                pass
+    return total
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        return error.errno == errno.EPERM
+    return True
+
+
+class CloneCache(object):
+    def __init__(self, cloned_repos_dir, budget):
+        """A clones directory kept under a disk budget
+
+        :param cloned_repos_dir: directory containing the clones, possibly
+                        in subdirectories (string)
+        :param budget: bytes the clones may take (int)
+        """
+        self.logger = utils.logger
+        self.cloned_repos_dir = cloned_repos_dir
+        self.budget = budget
+        self.path = os.path.join(cloned_repos_dir, constants.CLONE_CACHE_INDEX)
+
+    @contextmanager
+    def _index(self):
+        """Lock the index, for other threads and processes, and yield it
+        to be updated
+        """
+        if not os.path.isdir(self.cloned_repos_dir):
+            os.makedirs(self.cloned_repos_dir)
+        with _lock, open(self.path + '.lock', 'w') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            index = {}
+            if os.path.isfile(self.path):
+                with open(self.path) as index_file:
+                    index = json.load(index_file)
+            yield index
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w') as index_file:
+                json.dump(index, index_file, indent=4, sort_keys=True)
+            os.rename(temp_path, self.path)
+
+    def _name(self, repo_path):
+        return os.path.relpath(repo_path, self.cloned_repos_dir)
+
+    def _untracked(self, index):
+        """Add the clones which aren't in the index yet (e.g. cloned
+        before the budget was set), as last used when last modified
+        """
+        for root, dirs, _ in os.walk(self.cloned_repos_dir):
+            if root != self.cloned_repos_dir and '.git' in dirs:
+                name = self._name(root)
+                if name not in index:
+                    index[name] = dict(last_used=os.path.getmtime(root),
+                                       size=disk_usage(root))
+                dirs[:] = []
+            else:
+                # Skip the shared object store and other hidden files.
+                dirs[:] = [name for name in dirs if not name.startswith('.')]
+
+    def use(self, repo_path):
+        """Mark a clone as used before scanning it
+        """
+        with self._index() as index:
+            entry = index.setdefault(self._name(repo_path), dict(size=0))
+            entry['last_used'] = time.time()
+            entry.setdefault('leases', []).append([os.getpid(), time.time()])
+
+    def release(self, repo_path):
+        """Record the size of a clone once scanned and evict the least
+        recently used clones if the budget is exceeded
+        """
+        with self._index() as index:
+            name = self._name(repo_path)
+            leases = index.get(name, {}).get('leases', [])
+            if os.path.isdir(repo_path):
+                index[name] = dict(last_used=time.time(),
+                                   size=disk_usage(repo_path),
+                                   leases=leases)
+            else:
+                index.pop(name, None)
+            self._untracked(index)
+            # The clone just scanned is kept even if it alone exceeds
+            # the budget.
+            self._evict(index)
+            # Expired leases were dropped while evicting.
+            leases = index.get(name, {}).get('leases', [])
+            for lease in leases:
+                if lease[0] == os.getpid():
+                    leases.remove(lease)
+                    break
+
+    def evict(self):
+        """Evict the least recently used clones until the budget is met
+        """
+        with self._index() as index:
+            self._untracked(index)
+            self._evict(index)
+
+    @staticmethod
+    def _leased(entry):
+        """Drop the expired leases of a clone and return whether it is
+        still used by a scan
+        """
+        now = time.time()
+        entry['leases'] = [
+            [pid, started] for pid, started in entry.get('leases', [])
+            if now - started < constants.CLONE_LEASE_TTL and _alive(pid)]
+        return bool(entry['leases'])
+
+    def _evict(self, index):
+        total = sum(entry['size'] for entry in index.values())
+        for name in sorted(index, key=lambda name: index[name]['last_used']):
+            if total <= self.budget:
+                break
+            if self._leased(index[name]):
+                continue
+            path = os.path.join(self.cloned_repos_dir, name)
+            self.logger.info(
+                'Clones take {0} MB, over the budget of {1} MB. Removing '
+                'the least recently scanned clone {2}...'.format(
+                    total // 1024 ** 2, self.budget // 1024 ** 2, name))
+            shutil.rmtree(path, ignore_errors=True)
+            total -= index.pop(name)['size']
+
+
+def evict(cloned_repos_dir, budget, verbose=False):
+    """Api method remove the least recently scanned clones of a clones
+    directory until they take less than the budget
+    """
+    utils.logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    if not os.path.isdir(cloned_repos_dir):
+        utils.logger.error('No clones found in {0}'.format(cloned_repos_dir))
+        sys.exit(1)
+    CloneCache(cloned_repos_dir, budget).evict()
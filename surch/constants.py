@@ -5,8 +5,62 @@ DEFAULT_PATH = os.path.join(HOME_DIR, '.surch')
 CLONED_REPOS_PATH = os.path.join(DEFAULT_PATH, 'clones')
 RESULTS_PATH = os.path.join(DEFAULT_PATH, 'results')
 
-GITHUB_API_URL = 'https://api.github.com/{0}/{1}'
-GITHUB_REPO_DETAILS_API_URL = \
-    ''.join([GITHUB_API_URL, '/repos?type={2}&per_page={3}&page={4}'])
+GITHUB_API_URL = 'https://api.github.com'
+GITHUB_ORG_API_PATH = '/{0}/{1}'
+GITHUB_REPO_DETAILS_API_PATH = \
+    ''.join([GITHUB_ORG_API_PATH, '/repos?type={2}&per_page={3}&page={4}'])
+GITHUB_RATE_LIMIT = 60
+GITHUB_API_WORKERS = 4
+GITHUB_API_MAX_RETRIES = 5
+GITHUB_API_BACKOFF = 1
+GITHUB_API_TIMEOUT = 30
+GITHUB_CACHE_PATH = os.path.join(DEFAULT_PATH, 'cache', 'github')
+GITHUB_CACHE_TTL = 0
 
 GITHUB_BLOB_URL = 'https://github.com/{0}/{1}/blob/{2}/{3}'
+
+ENGINES = ('grep', 'native', 'auto')
+DELTA_BASE_CACHE_SIZE = 64 * 1024 * 1024
+WORKTREE_WORKERS = 8
+GREP_THREADS = 8
+
+WEBHOOK_PORT = 8090
+
+LEASE_TTL = 300
+QUEUE_POLL_INTERVAL = 10
+QUEUE_MAX_ATTEMPTS = 3
+
+ENTROPY_WINDOW = 32
+ENTROPY_BASE64_THRESHOLD = 4.2
+ENTROPY_HEX_THRESHOLD = 3.2
+ENTROPY_BATCH_SIZE = 4 * 1024 * 1024
+
+PATTERN_ALTERNATION_SIZE = 250
+PATTERN_FILE_CHUNK_SIZE = 1000
+LITERAL_MATCHER_MAX = 16
+
+PROFILE_TOP = 25
+
+SHARED_STORE_DIR = '.shared.git'
+SHARED_STORE_PRUNE = '2.weeks.ago'
+
+CLONE_ATTEMPTS = 5
+CLONE_BACKOFF = 1
+CLONE_BACKOFF_MAX = 60
+
+NEW_RESULTS_FILE = 'new_results.json'
+RESOLVED_RESULTS_FILE = 'resolved_results.json'
+
+REPO_COSTS_FILE = 'costs.json'
+REMOTE_HEAD_WORKERS = 16
+SCAN_STATE_DIR = 'scan_state'
+
+CLONE_CACHE_INDEX = '.clone-cache.json'
+CLONE_LEASE_TTL = 24 * 3600
+
+TRIGRAM_INDEX_FILE = 'surch-trigrams.sqlite'
+TRIGRAM_INDEX_BATCH_SIZE = 64 * 1024 * 1024
+
+FIRST_MATCH_EXIT_CODE = 3
+
+SCAN_PLAN_FILE = 'scan_plan.json'
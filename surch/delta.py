@@ -0,0 +1,138 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import hashlib
+
+from tinydb import TinyDB
+
+from . import pack, utils, constants
+
+# Every finding has a fingerprint: a hash of the repository, the path and
+# the blob holding the finding, and the finding type. The same blob is
+# reported for every commit containing it, but only fingerprints are
+# compared between runs, so a finding is new once, however many commits
+# hold it.
+#
+# The fingerprints of the last run are kept in an index next to the
+# results file, one per line. Comparing it with the current results gives
+# the findings which are new since the last run and the ones which are
+# resolved, without reading older results files.
+
+
+def fingerprint(organization, repo_name, filepath, blob_sha,
+                finding_type=None):
+    """Return the fingerprint of a finding
+    """
+    return hashlib.sha1('\0'.join((
+        organization, repo_name, filepath, blob_sha,
+        finding_type or pack.PATTERN)).encode('utf-8')).hexdigest()
+
+
+class FingerprintIndex(object):
+    def __init__(self, results_file_path):
+        """The fingerprints of the findings of the last run
+
+        :param results_file_path: path to the results file (string)
+        """
+        self.path = results_file_path + '.fingerprints'
+
+    def read(self):
+        """Return the fingerprints of the last run, with the
+        organization, repository, blob and path of each finding
+        """
+        entries = {}
+        if not os.path.isfile(self.path):
+            return entries
+        with open(self.path) as index_file:
+            for line in index_file:
+                fields = line.rstrip('\n').split('\t', 4)
+                if len(fields) == 5:
+                    entries[fields[0]] = tuple(fields[1:])
+        return entries
+
+    def write(self, entries):
+        # Replace the index at once so that an interrupted run leaves
+        # the previous one.
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as index_file:
+            for key in sorted(entries):
+                index_file.write('\t'.join((key,) + entries[key]) + '\n')
+        os.rename(temp_path, self.path)
+
+
+def _write_findings(path, findings):
+    if os.path.isfile(path):
+        os.remove(path)
+    db = TinyDB(path, indent=4, sort_keys=True, separators=(',', ': '))
+    db.insert_multiple(findings)
+
+
+def update(results_file_path, scanned_repos=None):
+    """Api method write the findings which are new since the last run
+    and the resolved ones next to the results file, and update the index
+
+    :param results_file_path: path to the results file of the run (string)
+    :param scanned_repos: names of the repositories the run scanned
+                          entirely. Findings of other repositories are
+                          never resolved. Defaults to all (list)
+    :return: path to the new findings file (string)
+    """
+    results_dir = os.path.dirname(results_file_path)
+    new_results_path = os.path.join(results_dir, constants.NEW_RESULTS_FILE)
+    resolved_results_path = os.path.join(
+        results_dir, constants.RESOLVED_RESULTS_FILE)
+    index = FingerprintIndex(results_file_path)
+    previous = index.read()
+
+    current = {}
+    new_findings = []
+    if os.path.isfile(results_file_path):
+        for result in TinyDB(results_file_path).all():
+            key = result.get('fingerprint')
+            if not key:
+                # Written by a version which didn't fingerprint findings.
+                continue
+            current[key] = (result['organization_name'],
+                            result['repository_name'],
+                            result['blob_sha'],
+                            result['filepath'])
+            if key not in previous:
+                new_findings.append(result)
+
+    resolved_findings = []
+    for key, entry in previous.items():
+        if key in current:
+            continue
+        if scanned_repos is None or entry[1] in scanned_repos:
+            organization, repo_name, blob_sha, filepath = entry
+            resolved_findings.append(dict(
+                fingerprint=key,
+                organization_name=organization,
+                repository_name=repo_name,
+                blob_sha=blob_sha,
+                filepath=filepath))
+        else:
+            current[key] = entry
+
+    _write_findings(new_results_path, new_findings)
+    _write_findings(resolved_results_path, resolved_findings)
+    index.write(current)
+    utils.logger.info(
+        '{0} new and {1} resolved findings since the last run, written to '
+        '{2} and {3}.'.format(
+            len(set(result['fingerprint'] for result in new_findings)),
+            len(resolved_findings), new_results_path, resolved_results_path))
+    return new_results_path
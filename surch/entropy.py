@@ -0,0 +1,172 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import string
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import constants
+
+# High entropy strings (keys, tokens, passwords) are found by computing
+# the Shannon entropy of every window of `ENTROPY_WINDOW` consecutive
+# characters of an alphabet. Only runs of alphabet characters at least a
+# window long can hold such a string. Every such run contains an aligned
+# block of half a window, so the data is first cut into blocks and only
+# the blocks around full ones are gathered, leaving the (usually tiny)
+# rest of the data unscored.
+
+ALPHABETS = (
+    ('base64', string.ascii_letters + string.digits + '+/=',
+     constants.ENTROPY_BASE64_THRESHOLD),
+    ('hex', string.hexdigits, constants.ENTROPY_HEX_THRESHOLD),
+)
+# A byte which isn't part of any alphabet, used to separate blobs
+# scanned in the same batch.
+SEPARATOR = '\n'
+
+
+class EntropyError(Exception):
+    pass
+
+
+class Alphabet(object):
+    def __init__(self, name, characters, threshold):
+        self.name = name
+        self.threshold = threshold
+        self.symbols = numpy.array(
+            sorted(set(ord(char) for char in characters)), dtype=numpy.uint8)
+        self.members = numpy.zeros(256, dtype=bool)
+        self.members[self.symbols] = True
+
+
+def _ranges(starts, lengths):
+    """Return the concatenation of `arange(start, start + length)` for
+    every start and length
+    """
+    total = lengths.sum()
+    run_offsets = numpy.cumsum(lengths) - lengths
+    return numpy.repeat(starts - run_offsets, lengths) + numpy.arange(total)
+
+
+class EntropyDetector(object):
+    def __init__(self, window=constants.ENTROPY_WINDOW, alphabets=ALPHABETS):
+        """Find high entropy strings in blobs
+
+        :param window: number of characters scored at once (int)
+        :param alphabets: (name, characters, threshold in bits per
+                          character) to score windows of (tuple)
+        """
+        if numpy is None:
+            raise EntropyError(
+                'Entropy detection requires NumPy. Install it with '
+                '`pip install surch[entropy]`.')
+        self.window = window
+        self.alphabets = [Alphabet(*alphabet) for alphabet in alphabets]
+        self.block = window // 2
+        self._any_members = numpy.zeros(256, dtype=bool)
+        for alphabet in self.alphabets:
+            self._any_members |= alphabet.members
+        self._separator = ord(SEPARATOR)
+        counts = numpy.arange(window + 1, dtype=numpy.float64)
+        counts[0] = 1
+        # c * log2(c) for every count a symbol can have in a window.
+        self._count_entropy = counts * numpy.log2(counts)
+
+    def _candidates(self, data):
+        """Return the data around full blocks, with a separator between
+        regions which aren't contiguous, and the offset of each of its
+        bytes in the original data (-1 for separators)
+        """
+        padding = -len(data) % self.block
+        if padding:
+            data = numpy.concatenate((data, numpy.repeat(
+                numpy.uint8(self._separator), padding)))
+        blocks = self._any_members[data].reshape(-1, self.block)
+        full = numpy.flatnonzero(blocks.all(axis=1))
+        # A run extends less than a block beyond its full blocks.
+        keep = numpy.zeros(len(blocks) + 2, dtype=bool)
+        for shift in range(3):
+            keep[full + shift] = True
+        kept = numpy.flatnonzero(keep[1:-1])
+        offsets = (kept[:, None] * self.block +
+                   numpy.arange(self.block)).ravel()
+        gaps = numpy.flatnonzero(numpy.diff(kept) != 1) + 1
+        offsets = numpy.insert(offsets, gaps * self.block, -1)
+        candidates = data[offsets]
+        candidates[offsets == -1] = self._separator
+        return candidates, offsets
+
+    def _runs(self, data, alphabet):
+        """Return the start and end offsets of runs of alphabet
+        characters which are at least a window long
+        """
+        members = alphabet.members[data].view(numpy.int8)
+        edges = numpy.diff(numpy.concatenate(([0], members, [0])))
+        starts = numpy.flatnonzero(edges == 1)
+        ends = numpy.flatnonzero(edges == -1)
+        long_runs = ends - starts >= self.window
+        return starts[long_runs], ends[long_runs]
+
+    def _window_entropy(self, runs_data, window_starts):
+        """Return the Shannon entropy of the windows starting at the
+        given offsets, in bits per character
+        """
+        count_entropy = numpy.zeros(len(window_starts))
+        for symbol in numpy.unique(runs_data):
+            seen = numpy.concatenate(([0], numpy.cumsum(
+                runs_data == symbol, dtype=numpy.int32)))
+            counts = seen[window_starts + self.window] - seen[window_starts]
+            count_entropy += self._count_entropy[counts]
+        return numpy.log2(self.window) - count_entropy / self.window
+
+    def scan(self, data):
+        """Return the (start, end, alphabet name) of the high entropy
+        strings in data
+        """
+        data, offsets = self._candidates(
+            numpy.frombuffer(data, dtype=numpy.uint8))
+        findings = []
+        for alphabet in self.alphabets:
+            starts, ends = self._runs(data, alphabet)
+            if not len(starts):
+                continue
+            lengths = ends - starts
+            runs_data = data[_ranges(starts, lengths)]
+            # Windows must not span two runs.
+            windows_per_run = lengths - self.window + 1
+            runs_offsets = numpy.cumsum(lengths) - lengths
+            window_starts = _ranges(runs_offsets, windows_per_run)
+            entropy = self._window_entropy(runs_data, window_starts)
+            window_runs = numpy.repeat(
+                numpy.arange(len(starts)), windows_per_run)
+            hits = numpy.unique(window_runs[entropy > alphabet.threshold])
+            findings.extend((int(offsets[starts[run]]),
+                             int(offsets[ends[run] - 1]) + 1,
+                             alphabet.name) for run in hits)
+        return sorted(findings)
+
+    def scan_batch(self, blobs):
+        """Scan several blobs at once and return the indexes of those
+        containing high entropy strings
+        """
+        if not blobs:
+            return set()
+        offsets = numpy.cumsum([len(blob) + 1 for blob in blobs])
+        findings = self.scan(SEPARATOR.join(blobs))
+        return set(int(index) for index in numpy.searchsorted(
+            offsets, [start for start, _, _ in findings], side='right'))
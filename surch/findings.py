@@ -0,0 +1,131 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+from . import constants
+
+# The findings of a repository are held in memory until they are written
+# to the results file, and most of their fields repeat: every finding
+# names the organization and repository, every finding of a commit its
+# author, and a file found in many commits has the same path and, until
+# it changes, the same blob and fingerprint.
+#
+# A `Finding` has slots instead of a dict. It refers to a single tuple
+# per repository and per commit, and the strings it holds are interned
+# in the tables of its `Findings`, so each distinct string is stored
+# once. The row written to the results file, including its blob url, is
+# only built while writing it.
+
+
+class Finding(object):
+    __slots__ = ('repository', 'commit', 'filepath', 'blob_sha',
+                 'fingerprint', 'finding_type')
+
+    def __init__(self, repository, commit, filepath, blob_sha, fingerprint,
+                 finding_type=None):
+        """A finding of a search
+
+        :param repository: organization and repository names (tuple)
+        :param commit: sha, author name, email and time of the commit
+                       (tuple)
+        :param filepath: path of the file in the commit (string)
+        :param blob_sha: sha of the file's blob (string)
+        :param fingerprint: fingerprint of the finding (string)
+        :param finding_type: `entropy` or None for a pattern (string)
+        """
+        self.repository = repository
+        self.commit = commit
+        self.filepath = filepath
+        self.blob_sha = blob_sha
+        self.fingerprint = fingerprint
+        self.finding_type = finding_type
+
+    def as_row(self):
+        """Return the finding as a row of the results file
+        """
+        organization, repo_name = self.repository
+        commit_sha, username, email, commit_time = self.commit
+        row = dict(
+            email=email,
+            filepath=self.filepath,
+            username=username,
+            commit_sha=commit_sha,
+            commit_time=commit_time,
+            blob_sha=self.blob_sha,
+            fingerprint=self.fingerprint,
+            repository_name=repo_name,
+            organization_name=organization,
+            blob_url=constants.GITHUB_BLOB_URL.format(
+                organization, repo_name, commit_sha, self.filepath))
+        if self.finding_type:
+            row['finding_type'] = self.finding_type
+        return row
+
+
+class Findings(object):
+    def __init__(self, organization, repo_name):
+        """The findings of a repository
+
+        :param organization: organization name (string)
+        :param repo_name: repository name (string)
+        """
+        self.repository = organization, repo_name
+        self._strings = {}
+        self._commits = {}
+        self._findings = []
+
+    def __len__(self):
+        return len(self._findings)
+
+    def __iter__(self):
+        return iter(self._findings)
+
+    def _intern(self, string):
+        return self._strings.setdefault(string, string)
+
+    def commit(self, commit_sha, username, email, commit_time):
+        """Return the record of a commit, shared by its findings
+        """
+        commit = self._commits.get(commit_sha)
+        if commit is None:
+            commit = self._commits[commit_sha] = tuple(
+                self._intern(value)
+                for value in (commit_sha, username, email, commit_time))
+        return commit
+
+    def add(self, commit, filepath, blob_sha, fingerprint,
+            finding_type=None):
+        """Add a finding of a commit (a record `commit` returned)
+        """
+        self._findings.append(Finding(
+            self.repository, commit, self._intern(filepath),
+            self._intern(blob_sha), self._intern(fingerprint),
+            finding_type))
+
+    def select(self, keep):
+        """Return the findings for which `keep(finding)` is true, sharing
+        the records of these findings
+        """
+        selected = Findings(*self.repository)
+        selected._strings = self._strings
+        selected._commits = self._commits
+        selected._findings = [finding for finding in self._findings
+                              if keep(finding)]
+        return selected
+
+    def rows(self):
+        """Yield the findings as rows of the results file
+        """
+        for finding in self._findings:
+            yield finding.as_row()
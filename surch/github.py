@@ -0,0 +1,296 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import time
+import threading
+from multiprocessing.pool import ThreadPool
+
+import requests
+
+from . import utils, constants
+from .httpcache import CachedResponse, ResponseCache
+
+RATE_LIMITED_CODES = (requests.codes.FORBIDDEN, requests.codes.TOO_MANY)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class OfflineError(Exception):
+    pass
+
+
+class TokenBucket(object):
+    """Track the rate limit of a single GitHub credential
+
+    The bucket's size is unknown until the first response made with the
+    credential; it is then refilled from the `X-RateLimit-*` headers of
+    every response. The requests made in the current window are counted
+    as they are sent, so concurrent requests are spread over the
+    credentials before any of them answered, and a response arriving
+    after later requests were sent never makes the bucket look fuller
+    than it is.
+    """
+    def __init__(self, credential, limit=constants.GITHUB_RATE_LIMIT):
+        self.credential = credential
+        self.limit = limit
+        self.remaining = None
+        self.taken = 0
+        self.in_flight = 0
+        self.reset = 0
+        self.blocked_until = 0
+
+    def left(self):
+        """Return the requests left in the current window, or None if the
+        bucket was never refilled from a response
+        """
+        if self.remaining is None:
+            return None
+        return min(self.remaining, self.limit - self.taken)
+
+    def ready_at(self, now):
+        """Return the time at which a request can be made with this bucket
+        """
+        left = self.left()
+        if left is not None and left <= 0 and now < self.reset:
+            return max(self.reset, self.blocked_until)
+        return max(now, self.blocked_until)
+
+    def priority(self, now):
+        """Sort key preferring the bucket ready soonest with the most
+        requests left (untried buckets first, the least busy of them
+        first)
+        """
+        left = self.left()
+        if left is None:
+            return self.ready_at(now), float('-inf'), self.in_flight
+        return self.ready_at(now), -left, self.in_flight
+
+    def take(self, now):
+        if self.remaining is not None and now >= self.reset and \
+                self.left() <= 0:
+            self.remaining = self.limit
+            self.taken = 0
+        self.taken += 1
+        self.in_flight += 1
+
+    def done(self, headers=None):
+        """Count a request as answered, refilling the bucket from the
+        headers of its response if there is one
+        """
+        self.in_flight = max(self.in_flight - 1, 0)
+        if headers is not None:
+            self.update(headers)
+
+    def update(self, headers):
+        try:
+            limit = int(headers['X-RateLimit-Limit'])
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset = int(headers['X-RateLimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        if self.reset and reset > self.reset:
+            # A new window; only the requests still in flight may count
+            # against it.
+            self.taken = self.in_flight
+        self.limit = limit
+        self.remaining = remaining
+        self.reset = max(self.reset, reset)
+
+    def block(self, until):
+        self.blocked_until = max(self.blocked_until, until)
+
+    def request_kwargs(self):
+        if not self.credential:
+            return {}
+        if isinstance(self.credential, tuple):
+            return {'auth': self.credential}
+        return {'headers': {
+            'Authorization': 'token {0}'.format(self.credential)}}
+
+
+class GitHubClient(object):
+    def __init__(self,
+                 credentials=None,
+                 api_url=constants.GITHUB_API_URL,
+                 workers=constants.GITHUB_API_WORKERS,
+                 max_retries=constants.GITHUB_API_MAX_RETRIES,
+                 backoff=constants.GITHUB_API_BACKOFF,
+                 timeout=constants.GITHUB_API_TIMEOUT,
+                 cache=None,
+                 cache_ttl=constants.GITHUB_CACHE_TTL,
+                 offline=False):
+        """GitHub API client which spreads requests over several
+        credentials and respects their rate limits
+
+        :param credentials: (user, password) tuples or tokens (list)
+        :param api_url: GitHub API base url (string)
+        :param workers: number of concurrent requests (int)
+        :param max_retries: retries per request before giving up (int)
+        :param backoff: first backoff delay in seconds (float)
+        :param timeout: timeout per request in seconds (float)
+        :param cache: cache of the responses, revalidated with
+                      conditional requests (httpcache.ResponseCache)
+        :param cache_ttl: seconds during which a cached response is used
+                          without revalidating it (int)
+        :param offline: only use cached responses (boolean)
+        """
+        self.logger = utils.logger
+        self.api_url = api_url.rstrip('/')
+        self.buckets = [TokenBucket(credential)
+                        for credential in credentials or [None]]
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.cache = cache
+        self.cache_ttl = cache_ttl
+        self.offline = offline
+        self.session = requests.Session()
+        self._lock = threading.Lock()
+        self._time = time.time
+        self._sleep = time.sleep
+
+    def _acquire(self):
+        """Wait for the credential which is available soonest and
+        take a request from it
+        """
+        while True:
+            with self._lock:
+                now = self._time()
+                bucket = min(self.buckets, key=lambda b: b.priority(now))
+                ready_at = bucket.ready_at(now)
+                if ready_at <= now:
+                    bucket.take(now)
+                    return bucket
+            self.logger.warn(
+                'GitHub API rate limit reached. Waiting {0} seconds '
+                'for it to reset...'.format(int(ready_at - now)))
+            self._sleep(ready_at - now)
+
+    def _backoff_delay(self, attempt):
+        return self.backoff * (2 ** attempt)
+
+    def get(self, path):
+        """Get an API path, retrying on rate limits, connection and
+        server errors
+        """
+        url = path if '://' in path else self.api_url + path
+        entry = self.cache.get(url) if self.cache else None
+        if entry and (self.offline or self._time() - entry['validated_at'] <
+                      self.cache_ttl):
+            return CachedResponse(entry)
+        if self.offline:
+            raise OfflineError('{0} is not cached. Run once without '
+                               '--offline to cache it.'.format(url))
+        conditional_headers = \
+            self.cache.conditional_headers(entry) if entry else {}
+        for attempt in range(self.max_retries + 1):
+            bucket = self._acquire()
+            kwargs = bucket.request_kwargs()
+            headers = dict(kwargs.pop('headers', {}), **conditional_headers)
+            try:
+                response = self.session.get(
+                    url, timeout=self.timeout, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                with self._lock:
+                    bucket.done()
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff_delay(attempt)
+                self.logger.warn('Request to {0} failed ({1}), retrying in '
+                                 '{2} seconds...'.format(url, error, delay))
+                self._sleep(delay)
+                continue
+            with self._lock:
+                bucket.done(response.headers)
+            if response.status_code in RATE_LIMITED_CODES:
+                retry_after = response.headers.get('Retry-After')
+                if retry_after is not None:
+                    # Secondary rate limit.
+                    delay = int(retry_after)
+                elif response.headers.get('X-RateLimit-Remaining') == '0':
+                    # Primary rate limit, `_acquire` waits for the reset
+                    # (or picks another credential).
+                    continue
+                elif response.status_code == requests.codes.FORBIDDEN:
+                    # A secondary rate limit without a hint, or a plain
+                    # permission error which retrying won't fix.
+                    if 'rate limit' not in response.text.lower():
+                        return response
+                    delay = self._backoff_delay(attempt)
+                else:
+                    delay = self._backoff_delay(attempt)
+                with self._lock:
+                    bucket.block(self._time() + delay)
+                self.logger.debug('Rate limited on {0}, retrying in {1} '
+                                  'seconds...'.format(url, delay))
+            elif response.status_code >= 500:
+                delay = self._backoff_delay(attempt)
+                self.logger.debug('Got {0} from {1}, retrying in {2} '
+                                  'seconds...'.format(response.status_code,
+                                                      url, delay))
+                self._sleep(delay)
+            elif response.status_code == requests.codes.NOT_MODIFIED and \
+                    entry:
+                self.logger.debug('{0} is not modified.'.format(url))
+                self.cache.revalidated(entry, self._time())
+                return CachedResponse(entry)
+            else:
+                if self.cache and response.status_code == requests.codes.OK:
+                    self.cache.put(url, response, self._time())
+                return response
+        raise RateLimitError('Giving up on {0} after {1} attempts'.format(
+            url, self.max_retries + 1))
+
+    def get_json(self, path):
+        return self.get(path).json()
+
+    def get_many(self, paths):
+        """Get several API paths concurrently and return their JSON
+        bodies in order
+        """
+        pool = ThreadPool(min(self.workers, len(paths)) or 1)
+        try:
+            return pool.map(self.get_json, paths)
+        finally:
+            pool.close()
+            pool.join()
+
+
+def create_client(git_user=None,
+                  git_password=None,
+                  github_tokens=None,
+                  github_api_url=None,
+                  github_cache_dir=None,
+                  cache_ttl=constants.GITHUB_CACHE_TTL,
+                  offline=False):
+    """Return a client using all the given credentials and caching its
+    responses
+    """
+    credentials = list(github_tokens or [])
+    if git_user and git_password:
+        credentials.append((git_user, git_password))
+    if not credentials:
+        utils.logger.warn(
+            'Choosing not to provide GitHub credentials limits '
+            'requests to GitHub to 60/h. This might affect cloning.')
+    return GitHubClient(
+        credentials=credentials,
+        api_url=github_api_url or constants.GITHUB_API_URL,
+        cache=ResponseCache(github_cache_dir or constants.GITHUB_CACHE_PATH),
+        cache_ttl=cache_ttl,
+        offline=offline)
@@ -0,0 +1,101 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import hashlib
+
+# GitHub answers a request carrying the `ETag` (`If-None-Match`) or the
+# `Last-Modified` date (`If-Modified-Since`) of a response it already
+# sent with `304 Not Modified` when nothing changed, and 304s don't count
+# against the rate limit. Successful responses are kept on disk, one
+# JSON file per url, with the time they were last validated.
+
+
+class CachedResponse(object):
+    """A response served from the cache, with the parts of a
+    `requests.Response` surch uses
+    """
+    def __init__(self, entry):
+        self.url = entry['url']
+        self.status_code = entry['status_code']
+        self.headers = entry['headers']
+        self.text = entry['body']
+        self.content = entry['body'].encode('utf-8')
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class ResponseCache(object):
+    def __init__(self, cache_dir):
+        """Responses of the GitHub API kept on disk
+
+        :param cache_dir: directory to keep the responses in (string)
+        """
+        self.cache_dir = cache_dir
+
+    def _path(self, url):
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def get(self, url):
+        """Return the cache entry of a url, or None
+        """
+        try:
+            with open(self._path(url)) as entry_file:
+                return json.load(entry_file)
+        except (IOError, ValueError):
+            return None
+
+    def _write(self, entry):
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                # Created by a concurrent request.
+                pass
+        path = self._path(entry['url'])
+        temp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+        with open(temp_path, 'w') as entry_file:
+            json.dump(entry, entry_file)
+        os.rename(temp_path, path)
+
+    def put(self, url, response, now):
+        """Keep a successful response
+        """
+        headers = dict((key, response.headers[key]) for key in
+                       ('ETag', 'Last-Modified') if key in response.headers)
+        self._write(dict(
+            url=url,
+            status_code=response.status_code,
+            headers=headers,
+            body=response.text,
+            validated_at=now))
+
+    def revalidated(self, entry, now):
+        """Mark an entry as validated by a 304 response
+        """
+        entry['validated_at'] = now
+        self._write(entry)
+
+    @staticmethod
+    def conditional_headers(entry):
+        headers = {}
+        if entry['headers'].get('ETag'):
+            headers['If-None-Match'] = entry['headers']['ETag']
+        if entry['headers'].get('Last-Modified'):
+            headers['If-Modified-Since'] = entry['headers']['Last-Modified']
+        return headers
@@ -0,0 +1,95 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import threading
+
+from tinydb import TinyDB, Query
+
+# The journal of a run is a file of JSON lines next to its results file.
+# A `start` line is written before a repository is scanned and a `done`
+# line once all of its results are written. Every line is flushed to
+# disk before going on, so after a crash the journal tells which
+# repositories are done and which ones may have partial results.
+
+STARTED = 'start'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class Journal(object):
+    def __init__(self, results_file_path):
+        """The journal of the run writing to a results file
+
+        :param results_file_path: path to the results file (string)
+        """
+        self.results_file_path = results_file_path
+        self.path = results_file_path + '.journal'
+        self._lock = threading.Lock()
+
+    def reset(self):
+        if os.path.isfile(self.path):
+            os.remove(self.path)
+
+    def record(self, event, repo_url, **fields):
+        fields.update(event=event, repo_url=repo_url)
+        with self._lock, open(self.path, 'a') as journal_file:
+            journal_file.write(json.dumps(fields, sort_keys=True) + '\n')
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+    def read(self):
+        """Return the last event of every repository in the journal
+        """
+        events = {}
+        if not os.path.isfile(self.path):
+            return events
+        with open(self.path) as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # The last line of a run killed while writing it.
+                    continue
+                events[entry['repo_url']] = entry
+        return events
+
+    def done(self):
+        return dict((repo_url, entry) for repo_url, entry
+                    in self.read().items() if entry['event'] == DONE)
+
+    def unfinished(self):
+        return dict((repo_url, entry) for repo_url, entry
+                    in self.read().items() if entry['event'] != DONE)
+
+    def remove_partial_results(self):
+        """Remove the results of the repositories whose scan started but
+        didn't finish, which will be scanned again
+        """
+        unfinished = self.unfinished()
+        if not unfinished or not os.path.isfile(self.results_file_path):
+            return 0
+        db = TinyDB(
+            self.results_file_path,
+            indent=4,
+            sort_keys=True,
+            separators=(',', ': '))
+        result = Query()
+        removed = 0
+        for entry in unfinished.values():
+            removed += len(db.remove(
+                result.repository_name == entry['repo_name']))
+        return removed
@@ -15,12 +15,22 @@
 
 import os
 import sys
+import json
+import hashlib
 import logging
+import functools
+import threading
+import subprocess
+from time import time
+from collections import Counter
+from multiprocessing.pool import ThreadPool
 
 import requests
+from tinydb import TinyDB
 
 from .plugins import handler
-from . import repo, utils, constants
+from . import repo, delta, utils, github, journal, planner, suppress, \
+    profiling, scheduler, workqueue, constants
 
 
 class Organization(object):
@@ -42,6 +52,24 @@ class Organization(object):
             consolidate_log=False,
             cloned_repos_dir=None,
             remove_cloned_dir=False,
+            github_tokens=None,
+            github_api_url=None,
+            engine='grep',
+            introduced=False,
+            entropy=False,
+            shared_store=False,
+            resume=False,
+            workers=1,
+            cache_ttl=constants.GITHUB_CACHE_TTL,
+            offline=False,
+            github_cache_dir=None,
+            head_only=False,
+            github_client=None,
+            clone_budget=None,
+            suppressions=None,
+            first_match=False,
+            rescan=False,
+            use_index=False,
             **kwargs):
         """Surch org instance init
 
@@ -60,6 +88,39 @@ class Organization(object):
         :param cloned_repos_dir: path for cloned repo (string)
         :param remove_cloned_dir:
                         this flag for removing the clone directory (boolean)
+        :param github_tokens: GitHub API tokens to spread requests on (list)
+        :param github_api_url: GitHub API base url (string)
+        :param engine: search engine to scan repositories with (string)
+        :param introduced: only report the commits which added the
+                        matching lines (boolean)
+        :param entropy: also report files containing high entropy
+                        strings (boolean)
+        :param shared_store: share the objects of all cloned
+                        repositories through a reference store (boolean)
+        :param resume: skip the repositories an interrupted run already
+                        scanned and add to its results (boolean)
+        :param workers: number of repositories to scan at once (int)
+        :param cache_ttl: seconds during which cached GitHub API responses
+                        are used without revalidating them (int)
+        :param offline: only use cached GitHub API responses (boolean)
+        :param github_cache_dir: path for cached GitHub API responses
+                        (string)
+        :param head_only: only scan the files of the current HEAD of
+                        each repository (boolean)
+        :param github_client: client shared with other organizations,
+                        instead of the credentials and cache options
+                        (github.GitHubClient)
+        :param clone_budget: bytes the cloned repositories may take, least
+                        recently scanned ones are removed beyond it (int)
+        :param suppressions: path to a file of known false positives to
+                        leave out of the results (string)
+        :param first_match: stop scanning all repositories at the first
+                        finding and only report it (boolean)
+        :param rescan: scan the repositories which are unchanged since
+                        their last scan too, and their whole history for
+                        the whole search list (boolean)
+        :param use_index: only match the blobs the trigram index of each
+                        clone finds (boolean)
         """
         utils.check_if_executable_exists_else_exit('git')
         self.logger = utils.logger
@@ -68,13 +129,14 @@ class Organization(object):
             self.logger.warn(
                 'You can\'t both include and exclude repositories.')
             sys.exit(1)
-        if not git_user or not git_password:
-            self.logger.warn(
-                'Choosing not to provide GitHub credentials limits '
-                'requests to GitHub to 60/h. This might affect cloning.')
-            self.git_credentials = False
-        else:
-            self.git_credentials = (git_user, git_password)
+        self.client = github_client or github.create_client(
+            git_user=git_user,
+            git_password=git_password,
+            github_tokens=github_tokens,
+            github_api_url=github_api_url,
+            github_cache_dir=github_cache_dir,
+            cache_ttl=cache_ttl,
+            offline=offline)
 
         self.config_file = config_file if config_file else None
         self.pager = handler.plugins_handle(config_file=self.config_file,
@@ -98,6 +160,21 @@ class Organization(object):
         self.cloned_repos_dir = cloned_repos_dir or os.path.join(
             self.organization, constants.CLONED_REPOS_PATH)
         self.verbose = verbose
+        self.engine = engine
+        self.introduced = introduced
+        self.entropy = entropy
+        self.shared_store = shared_store
+        self.resume = resume
+        self.head_only = head_only
+        self.clone_budget = clone_budget
+        self.suppressions = suppressions
+        self.first_match = first_match
+        self.rescan = rescan
+        self.use_index = use_index
+        self.first_finding = None
+        self._stop = threading.Event()
+        self.workers = max(1, workers or 1)
+        self._repos_data = {}
 
     @classmethod
     def init_with_config_file(cls,
@@ -108,7 +185,8 @@ class Organization(object):
                               search_list=None,
                               print_result=False,
                               is_organization=True,
-                              remove_cloned_dir=False):
+                              remove_cloned_dir=False,
+                              **kwargs):
         """Init org instance from config file
         """
         source = handler.plugins_handle(config_file=config_file,
@@ -120,12 +198,18 @@ class Organization(object):
                                            config_file=config_file,
                                            print_result=print_result,
                                            is_organization=is_organization,
-                                           remove_cloned_dir=remove_cloned_dir)
+                                           remove_cloned_dir=remove_cloned_dir,
+                                           **kwargs)
         return cls(**conf_vars)
 
     def _get_org_data(self):
-        response = requests.get(constants.GITHUB_API_URL.format(
-            self.item_type, self.organization), auth=self.git_credentials)
+        try:
+            response = self.client.get(constants.GITHUB_ORG_API_PATH.format(
+                self.item_type, self.organization))
+        except (requests.ConnectionError, requests.Timeout,
+                github.RateLimitError, github.OfflineError) as error:
+            self.logger.error(error)
+            sys.exit(1)
         if response.status_code == requests.codes.NOT_FOUND:
             self.logger.error(
                 'The organization or user {0} could not be found. '
@@ -134,26 +218,31 @@ class Organization(object):
             sys.exit(1)
         return response.json()
 
+    def _get_repos_page_path(self, repos_per_page, page_num):
+        return constants.GITHUB_REPO_DETAILS_API_PATH.format(
+            self.item_type,
+            self.organization,
+            'public',
+            repos_per_page,
+            page_num)
+
     def get_repos_list_per_page(self, repos_per_page, page_num):
         """Getting repository data from git api per api page
         """
         try:
-            response = requests.get(
-                constants.GITHUB_REPO_DETAILS_API_URL.format(
-                    self.item_type,
-                    self.organization,
-                    'public',
-                    repos_per_page,
-                    page_num), auth=self.git_credentials)
-            return response.json()
-        except (requests.ConnectionError, requests.Timeout) as error:
+            return self.client.get_json(
+                self._get_repos_page_path(repos_per_page, page_num))
+        except (requests.ConnectionError, requests.Timeout,
+                github.RateLimitError, github.OfflineError) as error:
             self.logger.error(error)
             sys.exit(1)
 
     def _parse_repo_data(self, repo_data):
-        """Return only name and clone_url from all repo list of dicts
+        """Return only name, clone_url, size and pushed_at from all repo
+        list of dicts
         """
-        return [dict((key, data[key]) for key in ['name', 'clone_url'])
+        return [dict((key, data.get(key)) for key in
+                     ['name', 'clone_url', 'size', 'pushed_at'])
                 for data in repo_data]
 
     def _get_all_repos_list(self, repos_per_page=100):
@@ -166,17 +255,21 @@ class Organization(object):
                 self.organization))
         org_data = self._get_org_data()
         repo_count = org_data['public_repos']
-        last_page_number = repo_count / repos_per_page
-        if (repo_count % repos_per_page) > 0:
-            # Adding 2 because 1 for the extra repos that mean more page,
-            #  and 1 for the next for loop.
-            last_page_number += 2
-            repos_data = []
-            for page_num in xrange(1, last_page_number):
-                repo_data = self.get_repos_list_per_page(repos_per_page,
-                                                         page_num)
-                repos_data.extend(self._parse_repo_data(repo_data))
-            return repos_data
+        pages_count = -(-repo_count // repos_per_page)
+        # The pages are independent, so fetch them concurrently and let
+        # the client keep within the rate limits.
+        try:
+            pages = self.client.get_many(
+                [self._get_repos_page_path(repos_per_page, page_num)
+                 for page_num in xrange(1, pages_count + 1)])
+        except (requests.ConnectionError, requests.Timeout,
+                github.RateLimitError, github.OfflineError) as error:
+            self.logger.error(error)
+            sys.exit(1)
+        repos_data = []
+        for repo_data in pages:
+            repos_data.extend(self._parse_repo_data(repo_data))
+        return repos_data
 
     def get_repo_include_list(self,
                               all_repos,
@@ -203,45 +296,288 @@ class Organization(object):
                 repo_url_list.append(repo_data['clone_url'])
         return repo_url_list
 
-    def search(self, search_list=None):
-        """This method search the string on the organization/user
-        """
+    def _get_search_list(self, search_list):
         search_list = search_list or []
         handler.merge_all_search_list(source=self.source,
                                       config_file=self.config_file,
                                       search_list=search_list)
-        if len(search_list) == 0:
+        if len(search_list) == 0 and not self.entropy:
             self.logger.error(
                 'You must supply at least one string to search for.')
             sys.exit(1)
-        repos_data = self._get_all_repos_list()
-        if not os.path.isdir(self.cloned_repos_dir):
-            os.makedirs(self.cloned_repos_dir)
-        utils.handle_results_file(self.results_file_path, self.consolidate_log)
+        return search_list
 
-        repos_url_list = self.get_repo_include_list(
+    def _get_repos_url_list(self):
+        repos_data = self._get_all_repos_list()
+        self._repos_data = dict(
+            (repo_data['clone_url'], repo_data) for repo_data in repos_data)
+        return self.get_repo_include_list(
             all_repos=repos_data,
             repos_to_include=self.repos_to_check,
             repos_to_exclude=self.repos_to_skip)
 
-        for repo_data in repos_url_list:
-            repo.search(
+    def list_repos(self):
+        """Return the data (name, clone_url, size and pushed_at) of the
+        repositories to search
+        """
+        return [self._repos_data[repo_url]
+                for repo_url in self._get_repos_url_list()]
+
+    def _largest_first(self, costs, repos_url_list):
+        """Return the data of the repositories, by decreasing estimated
+        scan time
+        """
+        repos = [self._repos_data[repo_url] for repo_url in repos_url_list]
+        return scheduler.largest_first(repos, costs.estimate(repos))
+
+    def plan(self, queue_dir=None, search_list=None):
+        """Report what scanning the repositories would cost and, with a
+        queue directory, write a work unit per repository to it for
+        `surch worker` processes to scan
+        """
+        profiling.stage('list_repos')
+        costs = scheduler.Costs(self.results_file_path)
+        # Units are claimed in order, so plan the largest ones first.
+        repos = self._largest_first(costs, self._get_repos_url_list())
+        planner.report(
+            planner.plan(repos, self.cloned_repos_dir, costs,
+                         workers=self.workers, head_only=self.head_only),
+            os.path.dirname(self.results_file_path))
+        if not queue_dir:
+            return
+        search_list = self._get_search_list(search_list)
+        workqueue.WorkQueue(queue_dir).plan(
+            [repo_data['clone_url'] for repo_data in repos],
+            search_list,
+            engine=self.engine,
+            introduced=self.introduced,
+            entropy=self.entropy,
+            shared_store=self.shared_store,
+            head_only=self.head_only)
+
+    def _resume(self, run_journal, repos_url_list):
+        """Return the repositories left to scan by the interrupted run
+        and remove the partial results of the ones it was scanning
+        """
+        done = run_journal.done()
+        removed = run_journal.remove_partial_results()
+        if removed:
+            self.logger.info('Removed {0} partial results of unfinished '
+                             'repositories.'.format(removed))
+        self.logger.info('Resuming: {0} of {1} repositories are already '
+                         'done.'.format(len(done), len(repos_url_list)))
+        return [repo_url for repo_url in repos_url_list
+                if repo_url not in done]
+
+    def _scan_key(self, search_list):
+        """Return a digest of what the scan looks for. Results of a scan
+        which looked for something else can't be carried forward
+        """
+        suppressions = None
+        if self.suppressions:
+            with open(self.suppressions) as f:
+                suppressions = hashlib.sha1(f.read()).hexdigest()
+        return hashlib.sha1(json.dumps(
+            [sorted(search_list), self.introduced, self.entropy,
+             self.head_only, suppressions])).hexdigest()
+
+    @staticmethod
+    def _remote_head(repo_url):
+        """Return the sha of the default branch of a remote repository,
+        None if it can't be listed
+        """
+        try:
+            refs = subprocess.check_output(
+                'git ls-remote {0} HEAD'.format(repo_url), shell=True)
+        except subprocess.CalledProcessError:
+            return None
+        return refs.split()[0] if refs.strip() else None
+
+    def _unchanged(self, costs, repos_url_list, scan_key):
+        """Return the urls of the repositories which weren't pushed to
+        and whose default branch didn't move since their last scan
+        """
+        candidates = []
+        for repo_url in repos_url_list:
+            repo_data = self._repos_data[repo_url]
+            cost = costs.costs.get(repo_data['name']) or {}
+            if cost.get('head') and cost.get('scan_key') == scan_key and \
+                    repo_data.get('pushed_at') and \
+                    cost.get('pushed_at') == repo_data['pushed_at']:
+                candidates.append((repo_url, cost['head']))
+        if not candidates:
+            return []
+        # pushed_at only tells about pushes, the default branch may
+        # have been changed to another one since.
+        pool = ThreadPool(min(len(candidates), constants.REMOTE_HEAD_WORKERS))
+        try:
+            heads = pool.map(self._remote_head,
+                             [repo_url for repo_url, _ in candidates])
+        finally:
+            pool.terminate()
+        return [repo_url for (repo_url, head), remote_head
+                in zip(candidates, heads) if head == remote_head]
+
+    def _previous_results(self, repo_names):
+        """Return the results of the last run for the repositories
+        """
+        if not os.path.isfile(self.results_file_path):
+            return []
+        db = TinyDB(self.results_file_path)
+        try:
+            return [dict(result) for result in db.all()
+                    if result.get('repository_name') in repo_names]
+        finally:
+            db.close()
+
+    def _carry_forward(self, run_journal, unchanged, previous_results):
+        """Add the results of the last run for the unchanged
+        repositories to the results file and mark them as done
+        """
+        if previous_results:
+            db = TinyDB(
+                self.results_file_path,
+                indent=4,
+                sort_keys=True,
+                separators=(',', ': '))
+            db.insert_multiple(previous_results)
+            db.close()
+        counts = Counter(result['repository_name']
+                         for result in previous_results)
+        for repo_url in unchanged:
+            repo_name = self._repos_data[repo_url]['name']
+            run_journal.record(journal.DONE, repo_url, repo_name=repo_name,
+                               results=counts[repo_name], carried=True)
+        self.logger.info(
+            'Skipping {0} repositories unchanged since their last scan, '
+            'carrying their {1} results forward.'.format(
+                len(unchanged), len(previous_results)))
+
+    def _scan_repo(self, search_list, run_journal, repo_data):
+        """Scan a repository and return its data, the scanned repo (None
+        if it failed) and the seconds it took
+        """
+        repo_url = repo_data['clone_url']
+        repo_name = repo_url.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+        start = time()
+        run_journal.record(journal.STARTED, repo_url, repo_name=repo_name)
+        try:
+            scanned_repo = repo.search(
                 print_result=False,
-                repo_url=repo_data,
+                repo_url=repo_url,
                 verbose=self.verbose,
                 consolidate_log=True,
                 search_list=search_list,
                 remove_cloned_dir=False,
                 from_organization=True,
                 results_dir=self.results_dir,
-                cloned_repo_dir=self.cloned_repos_dir)
+                cloned_repo_dir=self.cloned_repos_dir,
+                engine=self.engine,
+                introduced=self.introduced,
+                entropy=self.entropy,
+                shared_store=self.shared_store,
+                head_only=self.head_only,
+                clone_budget=self.clone_budget,
+                suppressions=self.suppressions,
+                first_match=self.first_match,
+                stop=self._stop,
+                use_index=self.use_index,
+                rescan=self.rescan)
+        except subprocess.CalledProcessError:
+            # Skip it, a --resume run will try it again.
+            run_journal.record(journal.FAILED, repo_url, repo_name=repo_name)
+            return repo_data, None, time() - start
+        run_journal.record(journal.DONE, repo_url, repo_name=repo_name,
+                           results=scanned_repo.result_count)
+        return repo_data, scanned_repo, time() - start
+
+    def search(self, search_list=None):
+        """This method search the string on the organization/user
+        """
+        search_list = self._get_search_list(search_list)
+        profiling.stage('list_repos')
+        repos_url_list = self._get_repos_url_list()
+        if not os.path.isdir(self.cloned_repos_dir):
+            os.makedirs(self.cloned_repos_dir)
+        repo_names = [repo_url.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+                      for repo_url in repos_url_list]
+        run_journal = journal.Journal(self.results_file_path)
+        costs = scheduler.Costs(self.results_file_path)
+        scan_key = self._scan_key(search_list)
+        if self.resume:
+            repos_url_list = self._resume(run_journal, repos_url_list)
+        else:
+            unchanged = []
+            previous_results = []
+            if not self.rescan and not self.first_match:
+                unchanged = self._unchanged(costs, repos_url_list, scan_key)
+            if unchanged and not self.consolidate_log:
+                # The results file of the last run is about to be backed
+                # up, keep the results of the unchanged repositories.
+                previous_results = self._previous_results(set(
+                    self._repos_data[repo_url]['name']
+                    for repo_url in unchanged))
+            utils.handle_results_file(self.results_file_path,
+                                      self.consolidate_log)
+            run_journal.reset()
+            if unchanged:
+                self._carry_forward(run_journal, unchanged, previous_results)
+                unchanged = set(unchanged)
+                repos_url_list = [repo_url for repo_url in repos_url_list
+                                  if repo_url not in unchanged]
+
+        repos = self._largest_first(costs, repos_url_list)
+        scan = functools.partial(self._scan_repo, search_list, run_journal)
+        start = time()
+        failed = []
+        suppressed = Counter()
+        try:
+            for repo_data, scanned_repo, seconds in scheduler.run(
+                    scan, repos, self.workers):
+                if scanned_repo is None:
+                    failed.append(repo_data['name'])
+                    continue
+                suppress.add(suppressed, scanned_repo.suppressed)
+                if self._stop.is_set():
+                    # Scans are cut short once a finding is found, their
+                    # costs are unknown. Wait for the repository which
+                    # found it.
+                    self.first_finding = scanned_repo.first_finding
+                    if self.first_finding:
+                        break
+                    continue
+                costs.record(repo_data['name'], seconds,
+                             size=repo_data.get('size'),
+                             pushed_at=repo_data.get('pushed_at'),
+                             commits=scanned_repo.commits,
+                             backend=scanned_repo.backend,
+                             head=scanned_repo.head,
+                             scan_key=scan_key)
+        finally:
+            costs.save()
+        scheduler.report(costs, [repo_data['name'] for repo_data in repos],
+                         time() - start, self.workers)
+        if suppressed:
+            self.logger.info(suppress.summary(suppressed))
+        if failed:
+            self.logger.error(
+                'Failed to scan {0} repositories: {1}. Run again with '
+                '--resume to retry them.'.format(len(failed),
+                                                 ', '.join(failed)))
         if self.print_result:
             utils.print_result_file(self.results_file_path)
         if self.remove_cloned_dir:
             utils.remove_repos_folder(path=self.cloned_repos_dir)
+        pager_log = self.results_file_path
+        if not self.head_only and not self.first_match:
+            # The findings of the repositories which failed aren't
+            # resolved.
+            pager_log = delta.update(
+                self.results_file_path,
+                scanned_repos=set(repo_names) - set(failed))
         if 'pagerduty' in self.pager:
             handler.pagerduty_trigger(config_file=self.config_file,
-                                      log=self.results_file_path)
+                                      log=pager_log)
 
 
 def search(
@@ -260,6 +596,24 @@ def search(
         is_organization=True,
         cloned_repos_dir=None,
         remove_cloned_dir=False,
+        github_tokens=None,
+        github_api_url=None,
+        engine='grep',
+        introduced=False,
+        entropy=False,
+        shared_store=False,
+        resume=False,
+        workers=1,
+        cache_ttl=constants.GITHUB_CACHE_TTL,
+        offline=False,
+        head_only=False,
+        clone_budget=None,
+        suppressions=None,
+        first_match=False,
+        rescan=False,
+        use_index=False,
+        plan=False,
+        queue_dir=None,
         **kwargs):
     """Api method init organization instance and search strings
     """
@@ -281,7 +635,23 @@ def search(
             search_list=search_list,
             print_result=print_result,
             is_organization=is_organization,
-            remove_cloned_dir=remove_cloned_dir)
+            remove_cloned_dir=remove_cloned_dir,
+            github_tokens=github_tokens,
+            github_api_url=github_api_url,
+            engine=engine,
+            introduced=introduced,
+            entropy=entropy,
+            shared_store=shared_store,
+            resume=resume,
+            workers=workers,
+            cache_ttl=cache_ttl,
+            offline=offline,
+            head_only=head_only,
+            clone_budget=clone_budget,
+            suppressions=suppressions,
+            first_match=first_match,
+            rescan=rescan,
+            use_index=use_index)
 
     else:
         search_list = handler.merge_all_search_list(source=source,
@@ -300,6 +670,27 @@ def search(
             repos_to_check=repos_to_check,
             is_organization=is_organization,
             cloned_repos_dir=cloned_repos_dir,
-            remove_cloned_dir=remove_cloned_dir)
+            remove_cloned_dir=remove_cloned_dir,
+            github_tokens=github_tokens,
+            github_api_url=github_api_url,
+            engine=engine,
+            introduced=introduced,
+            entropy=entropy,
+            shared_store=shared_store,
+            resume=resume,
+            workers=workers,
+            cache_ttl=cache_ttl,
+            offline=offline,
+            head_only=head_only,
+            clone_budget=clone_budget,
+            suppressions=suppressions,
+            first_match=first_match,
+            rescan=rescan,
+            use_index=use_index)
 
-    org.search(search_list=search_list)
+    if plan:
+        org.plan(queue_dir=queue_dir, search_list=search_list)
+    else:
+        org.search(search_list=search_list)
+        if org.first_finding:
+            sys.exit(constants.FIRST_MATCH_EXIT_CODE)
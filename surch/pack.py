@@ -0,0 +1,581 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import glob
+import mmap
+import zlib
+import struct
+from datetime import datetime, timedelta
+from binascii import hexlify, unhexlify
+from collections import OrderedDict
+
+from . import constants
+
+OBJECT_TYPES = {1: 'commit', 2: 'tree', 3: 'blob', 4: 'tag'}
+OFS_DELTA = 6
+REF_DELTA = 7
+IDX_V2_SIGNATURE = '\377tOc'
+TREE_MODE = '40000'
+BLOB_MODES = ('100644', '100755', '100664')
+
+PATTERN = 'pattern'
+ENTROPY = 'entropy'
+
+
+class ObjectNotFound(KeyError):
+    pass
+
+
+def _map(path):
+    with open(path, 'rb') as f:
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _read_varint(data, pos):
+    """Read a delta header size (little endian base 128)
+    """
+    result = 0
+    shift = 0
+    while True:
+        byte = ord(data[pos])
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        shift += 7
+        if not byte & 0x80:
+            return result, pos
+
+
+def apply_delta(base, delta):
+    """Rebuild an object from its delta base and a git delta
+    """
+    _, pos = _read_varint(delta, 0)
+    target_size, pos = _read_varint(delta, pos)
+    chunks = []
+    while pos < len(delta):
+        opcode = ord(delta[pos])
+        pos += 1
+        if opcode & 0x80:
+            offset = size = 0
+            for i in range(4):
+                if opcode & (1 << i):
+                    offset |= ord(delta[pos]) << (8 * i)
+                    pos += 1
+            for i in range(3):
+                if opcode & (0x10 << i):
+                    size |= ord(delta[pos]) << (8 * i)
+                    pos += 1
+            chunks.append(base[offset:offset + (size or 0x10000)])
+        elif opcode:
+            chunks.append(delta[pos:pos + opcode])
+            pos += opcode
+        else:
+            raise ValueError('Invalid delta opcode')
+    data = ''.join(chunks)
+    if len(data) != target_size:
+        raise ValueError('Delta produced {0} bytes instead of {1}'.format(
+            len(data), target_size))
+    return data
+
+
+class DeltaBaseCache(object):
+    """A least recently used cache of inflated objects, bounded by the
+    total size of the cached data
+    """
+    def __init__(self, max_size=constants.DELTA_BASE_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        item = self._items.pop(key, None)
+        if item is not None:
+            self._items[key] = item
+        return item
+
+    def put(self, key, item):
+        size = len(item[1])
+        if size > self.max_size / 4 or key in self._items:
+            return
+        self._items[key] = item
+        self.size += size
+        while self.size > self.max_size:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted[1])
+
+
+class Pack(object):
+    def __init__(self, idx_path, store):
+        self.store = store
+        self.idx = _map(idx_path)
+        self.pack = _map(idx_path[:-len('.idx')] + '.pack')
+        if self.idx[:4] == IDX_V2_SIGNATURE:
+            self.version = 2
+            fanout_start = 8
+        else:
+            self.version = 1
+            fanout_start = 0
+        self.fanout = struct.unpack(
+            '>256I', self.idx[fanout_start:fanout_start + 1024])
+        self.count = self.fanout[255]
+        self.entries_start = fanout_start + 1024
+
+    def _sha_at(self, index):
+        if self.version == 2:
+            start = self.entries_start + index * 20
+        else:
+            start = self.entries_start + index * 24 + 4
+        return self.idx[start:start + 20]
+
+    def _offset_at(self, index):
+        if self.version == 1:
+            start = self.entries_start + index * 24
+            return struct.unpack('>I', self.idx[start:start + 4])[0]
+        start = self.entries_start + self.count * 24 + index * 4
+        offset = struct.unpack('>I', self.idx[start:start + 4])[0]
+        if offset & 0x80000000:
+            start = self.entries_start + self.count * 28 + \
+                (offset & 0x7fffffff) * 8
+            offset = struct.unpack('>Q', self.idx[start:start + 8])[0]
+        return offset
+
+    def find(self, sha):
+        """Return the pack offset of a binary sha or None
+        """
+        first_byte = ord(sha[0])
+        low = self.fanout[first_byte - 1] if first_byte else 0
+        high = self.fanout[first_byte]
+        while low < high:
+            middle = (low + high) // 2
+            current = self._sha_at(middle)
+            if current < sha:
+                low = middle + 1
+            elif current > sha:
+                high = middle
+            else:
+                return self._offset_at(middle)
+        return None
+
+    def shas(self):
+        for index in xrange(self.count):
+            yield self._sha_at(index)
+
+    def _inflate(self, pos, size):
+        """Inflate a zlib stream straight from the mapped pack
+        """
+        if not size:
+            return ''
+        decompressor = zlib.decompressobj()
+        # Try to read the whole stream at once; incompressible data can
+        # take slightly more room than its inflated size.
+        step = size + 64 + size // 8
+        chunks = []
+        inflated = 0
+        while inflated < size and pos < len(self.pack):
+            chunk = decompressor.decompress(buffer(self.pack, pos, step))
+            chunks.append(chunk)
+            inflated += len(chunk)
+            pos += step
+        return chunks[0] if len(chunks) == 1 else ''.join(chunks)
+
+    def _read_header(self, pos):
+        byte = ord(self.pack[pos])
+        pos += 1
+        object_type = (byte >> 4) & 7
+        size = byte & 0x0f
+        shift = 4
+        while byte & 0x80:
+            byte = ord(self.pack[pos])
+            pos += 1
+            size |= (byte & 0x7f) << shift
+            shift += 7
+        return object_type, size, pos
+
+    def read_at(self, offset):
+        """Return the type and data of the object at a pack offset,
+        resolving deltas through the store's delta base cache
+        """
+        cache = self.store.delta_base_cache
+        deltas = []
+        while True:
+            cached = cache.get((self, offset))
+            if cached is not None:
+                object_type, data = cached
+                break
+            object_type, size, pos = self._read_header(offset)
+            if object_type == OFS_DELTA:
+                byte = ord(self.pack[pos])
+                pos += 1
+                base_distance = byte & 0x7f
+                while byte & 0x80:
+                    byte = ord(self.pack[pos])
+                    pos += 1
+                    base_distance = ((base_distance + 1) << 7) | \
+                        (byte & 0x7f)
+                deltas.append((offset, pos, size))
+                offset -= base_distance
+            elif object_type == REF_DELTA:
+                base_sha = self.pack[pos:pos + 20]
+                deltas.append((offset, pos + 20, size))
+                base_offset = self.find(base_sha)
+                if base_offset is None:
+                    object_type, data = self.store.read_binary(base_sha)
+                    break
+                offset = base_offset
+            else:
+                object_type = OBJECT_TYPES[object_type]
+                data = self._inflate(pos, size)
+                if deltas:
+                    cache.put((self, offset), (object_type, data))
+                break
+        for offset, pos, size in reversed(deltas):
+            data = apply_delta(data, self._inflate(pos, size))
+            cache.put((self, offset), (object_type, data))
+        return object_type, data
+
+    def close(self):
+        self.idx.close()
+        self.pack.close()
+
+
+class ObjectStore(object):
+    def __init__(self,
+                 repo_path,
+                 delta_base_cache_size=constants.DELTA_BASE_CACHE_SIZE):
+        """Read-only access to the objects and refs of a git repository
+        without running git
+
+        :param repo_path: path to a working copy or a bare repository
+        :param delta_base_cache_size: bytes of inflated delta bases to
+                                      keep in memory (int)
+        """
+        git_dir = os.path.join(repo_path, '.git')
+        self.git_dir = git_dir if os.path.isdir(git_dir) else repo_path
+        self.delta_base_cache = DeltaBaseCache(delta_base_cache_size)
+        self.object_dirs = self._get_object_dirs(
+            os.path.join(self.git_dir, 'objects'))
+        self.packs = []
+        for objects_dir in self.object_dirs:
+            for idx_path in sorted(glob.glob(
+                    os.path.join(objects_dir, 'pack', 'pack-*.idx'))):
+                self.packs.append(Pack(idx_path, self))
+
+    def _get_object_dirs(self, objects_dir, seen=None):
+        """Return the objects directory and the ones it borrows objects
+        from through `objects/info/alternates`
+        """
+        seen = seen or set()
+        objects_dir = os.path.realpath(objects_dir)
+        if objects_dir in seen:
+            return []
+        seen.add(objects_dir)
+        object_dirs = [objects_dir]
+        alternates = os.path.join(objects_dir, 'info', 'alternates')
+        if os.path.isfile(alternates):
+            with open(alternates) as f:
+                for line in f.read().splitlines():
+                    if line and not line.startswith('#'):
+                        object_dirs.extend(self._get_object_dirs(
+                            os.path.join(objects_dir, line), seen))
+        return object_dirs
+
+    def read_binary(self, sha):
+        for pack in self.packs:
+            offset = pack.find(sha)
+            if offset is not None:
+                return pack.read_at(offset)
+        hex_sha = hexlify(sha)
+        for objects_dir in self.object_dirs:
+            path = os.path.join(objects_dir, hex_sha[:2], hex_sha[2:])
+            if os.path.isfile(path):
+                with open(path, 'rb') as f:
+                    data = zlib.decompress(f.read())
+                header, data = data.split('\0', 1)
+                return header.split(' ', 1)[0], data
+        raise ObjectNotFound(hex_sha)
+
+    def read(self, hex_sha):
+        """Return the type and data of an object
+        """
+        return self.read_binary(unhexlify(hex_sha))
+
+    def iter_shas(self):
+        """Yield the binary sha of every object in the store
+        (including duplicates between packs)
+        """
+        for pack in self.packs:
+            for sha in pack.shas():
+                yield sha
+        for objects_dir in self.object_dirs:
+            for path in glob.glob(os.path.join(objects_dir, '[0-9a-f]' * 2,
+                                               '*')):
+                directory, name = os.path.split(path)
+                yield unhexlify(os.path.basename(directory) + name)
+
+    def read_tree(self, binary_sha):
+        """Return the (mode, name, binary sha) entries of a tree
+        """
+        _, data = self.read_binary(binary_sha)
+        entries = []
+        pos = 0
+        while pos < len(data):
+            space = data.index(' ', pos)
+            null = data.index('\0', space)
+            entries.append((data[pos:space], data[space + 1:null],
+                            data[null + 1:null + 21]))
+            pos = null + 21
+        return entries
+
+    def read_commit(self, hex_sha):
+        """Return the headers of a commit as a dict of lists
+        """
+        _, data = self.read(hex_sha)
+        headers = {}
+        for line in data.split('\n\n', 1)[0].split('\n'):
+            if line.startswith(' '):
+                # Continuation of a multi-line header (e.g. gpgsig).
+                continue
+            key, _, value = line.partition(' ')
+            headers.setdefault(key, []).append(value)
+        return headers
+
+    def commit_details(self, hex_sha):
+        """Return the author name, email and commit time of a commit the
+        way `git show` prints them
+        """
+        author = self.read_commit(hex_sha)['author'][0]
+        name, _, rest = author.partition(' <')
+        email, _, when = rest.partition('> ')
+        timestamp, timezone = when.split(' ')
+        sign = -1 if timezone.startswith('-') else 1
+        offset = sign * (int(timezone[1:3]) * 60 + int(timezone[3:5]))
+        commit_time = datetime(1970, 1, 1) + timedelta(
+            seconds=int(timestamp), minutes=offset)
+        return name, email, '{0:%a %b} {1} {0:%H:%M:%S %Y}'.format(
+            commit_time, commit_time.day)
+
+    def refs(self):
+        """Return the refs of the repository as a {name: hex sha} dict
+        """
+        refs = {}
+        symbolic = {}
+        packed_refs = os.path.join(self.git_dir, 'packed-refs')
+        if os.path.isfile(packed_refs):
+            with open(packed_refs) as f:
+                for line in f.read().splitlines():
+                    if line and line[0] not in '#^':
+                        sha, name = line.split(' ', 1)
+                        refs[name] = sha
+        ref_files = [os.path.join(self.git_dir, 'HEAD')]
+        for root, _, files in os.walk(os.path.join(self.git_dir, 'refs')):
+            ref_files.extend(os.path.join(root, name) for name in files)
+        for path in ref_files:
+            if not os.path.isfile(path):
+                continue
+            name = os.path.relpath(path, self.git_dir).replace(os.sep, '/')
+            with open(path) as f:
+                value = f.read().strip()
+            if value.startswith('ref: '):
+                symbolic[name] = value[len('ref: '):]
+            else:
+                refs[name] = value
+        for name, target in symbolic.items():
+            while target in symbolic:
+                target = symbolic[target]
+            if target in refs:
+                refs[name] = refs[target]
+        return refs
+
+    def resolve(self, revision):
+        """Return the commit a full sha or a ref name points to
+        """
+        refs = self.refs()
+        for name in (revision, 'refs/' + revision,
+                     'refs/tags/' + revision, 'refs/heads/' + revision,
+                     'refs/remotes/' + revision,
+                     'refs/remotes/{0}/HEAD'.format(revision)):
+            if name in refs:
+                return self.peel(refs[name])
+        if len(revision) == 40:
+            return self.peel(revision)
+        raise ObjectNotFound(revision)
+
+    def peel(self, hex_sha):
+        """Follow annotated tags to the object they point to and return
+        it if it is a commit
+        """
+        while True:
+            object_type, data = self.read(hex_sha)
+            if object_type != 'tag':
+                return hex_sha if object_type == 'commit' else None
+            hex_sha = data.split('\n', 1)[0].split(' ', 1)[1]
+
+    def _walk(self, heads, exclude=None):
+        exclude = exclude or set()
+        seen = set(exclude)
+        commits = []
+        pending = [sha for sha in heads if sha]
+        while pending:
+            sha = pending.pop()
+            if sha in seen:
+                continue
+            seen.add(sha)
+            try:
+                parents = self.read_commit(sha).get('parent', [])
+            except ObjectNotFound:
+                # Shallow clones don't have the parents of their roots.
+                continue
+            commits.append(sha)
+            pending.extend(parents)
+        return commits
+
+    def rev_list(self, commit_range=None):
+        """Return the commits `git rev-list` would for a range
+        (`A..B` or a single revision), or for `--all` if none is given
+        """
+        if not commit_range:
+            heads = set()
+            for sha in self.refs().values():
+                try:
+                    heads.add(self.peel(sha))
+                except ObjectNotFound:
+                    pass
+            return self._walk(heads)
+        if '..' in commit_range:
+            exclude, include = commit_range.split('..', 1)
+            return self._walk(
+                [self.resolve(include or 'HEAD')],
+                set(self._walk([self.resolve(exclude or 'HEAD')])))
+        return self._walk([self.resolve(commit_range)])
+
+    def close(self):
+        for pack in self.packs:
+            pack.close()
+
+
+class NativeSearch(object):
+    def __init__(self, store, regex=None, entropy=None,
+                 batch_size=constants.ENTROPY_BATCH_SIZE, candidates=None):
+        """Match a compiled search list and/or an entropy detector
+        against commits by reading their trees from an object store
+
+        Both blob findings and tree matches are memoized by sha, so each
+        unique blob is inflated and scanned at most once and trees shared
+        between commits are only walked once. The entropy detector scans
+        the new blobs of a commit in batches of about `batch_size` bytes.
+        When `candidates` (a set of binary shas) is given, other blobs
+        are known not to match the search list and are only read for
+        the entropy detector.
+        """
+        self.store = store
+        self.regex = regex
+        self.entropy = entropy
+        self.candidates = candidates
+        self.batch_size = batch_size
+        self._blob_findings = {}
+        self._tree_matches = {}
+        self._trees = {}
+
+    def _scan_batch(self, batch):
+        entropy_hits = self.entropy.scan_batch(
+            [data for _, data in batch]) if self.entropy else ()
+        for index, (binary_sha, data) in enumerate(batch):
+            findings = []
+            # Like git grep, find nothing in empty blobs, even for
+            # patterns matching the empty string.
+            if self.regex is not None and data and \
+                    self._candidate(binary_sha) and self.regex.search(data):
+                findings.append(PATTERN)
+            if index in entropy_hits:
+                findings.append(ENTROPY)
+            self._blob_findings[binary_sha] = tuple(findings)
+
+    def _candidate(self, binary_sha):
+        return self.candidates is None or binary_sha in self.candidates
+
+    def _read_tree(self, binary_sha):
+        entries = self._trees.pop(binary_sha, None)
+        if entries is None:
+            entries = self.store.read_tree(binary_sha)
+        return entries
+
+    def _new_blobs(self, binary_sha, blobs):
+        """Collect the blobs under a tree which weren't scanned yet,
+        keeping the trees read on the way for `tree_matches`
+        """
+        if binary_sha in self._tree_matches or binary_sha in self._trees:
+            return
+        entries = self._trees[binary_sha] = self.store.read_tree(binary_sha)
+        for mode, _, sha in entries:
+            if mode == TREE_MODE:
+                self._new_blobs(sha, blobs)
+            elif mode in BLOB_MODES and sha not in self._blob_findings:
+                blobs[sha] = None
+
+    def scan_tree(self, binary_sha):
+        """Scan all the new blobs under a tree, in batches
+        """
+        blobs = OrderedDict()
+        self._new_blobs(binary_sha, blobs)
+        batch = []
+        size = 0
+        for sha in blobs:
+            _, data = self.store.read_binary(sha)
+            batch.append((sha, data))
+            size += len(data)
+            if size >= self.batch_size:
+                self._scan_batch(batch)
+                batch = []
+                size = 0
+        self._scan_batch(batch)
+
+    def blob_findings(self, binary_sha):
+        findings = self._blob_findings.get(binary_sha)
+        if findings is None and not self.entropy and \
+                not self._candidate(binary_sha):
+            findings = self._blob_findings[binary_sha] = ()
+        if findings is None:
+            _, data = self.store.read_binary(binary_sha)
+            self._scan_batch([(binary_sha, data)])
+            findings = self._blob_findings[binary_sha]
+        return findings
+
+    def tree_matches(self, binary_sha):
+        """Return the (path, finding type) of the matching files under
+        a tree
+        """
+        matches = self._tree_matches.get(binary_sha)
+        if matches is None:
+            matches = []
+            for mode, name, sha in self._read_tree(binary_sha):
+                if mode == TREE_MODE:
+                    matches.extend(('{0}/{1}'.format(name, path), finding)
+                                   for path, finding in self.tree_matches(sha))
+                elif mode in BLOB_MODES:
+                    # Like git grep, skip symlinks and submodules.
+                    matches.extend((name, finding)
+                                   for finding in self.blob_findings(sha))
+            self._tree_matches[binary_sha] = matches
+        return matches
+
+    def search_commit(self, hex_sha):
+        """Return the matches of a commit as (`sha:path`, finding type),
+        using git grep's `sha:path` format
+        """
+        tree = unhexlify(self.store.read_commit(hex_sha)['tree'][0])
+        if self.entropy:
+            self.scan_tree(tree)
+        return [('{0}:{1}'.format(hex_sha, path), finding)
+                for path, finding in self.tree_matches(tree)]
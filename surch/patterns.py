@@ -0,0 +1,390 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import re
+
+# Search strings are POSIX basic regular expressions (with the GNU
+# extensions), since that is what `git grep -e` takes. These helpers
+# translate them to Python regular expressions with the same meaning so
+# the native engines find exactly what git grep finds.
+
+BRE_OPERATORS = {
+    '+': '+',
+    '?': '?',
+    '|': '|',
+    '{': '{',
+    '}': '}',
+    '<': r'\b(?=\w)',
+    '>': r'\b(?<=\w)',
+    '`': r'\A',
+    "'": r'\Z',
+}
+BRE_ESCAPED_LITERALS = '.*[]^$\\'
+ERE_SPECIAL_CHARACTERS = '.[]()*+?{}|^$\\'
+PYTHON_CLASS_ESCAPES = 'wWsSbB'
+# Classes matching a newline in Python, but never across lines in git grep.
+LINE_CLASS_ESCAPES = {
+    's': '[^\\S\\n]',
+    'W': '[^\\w\\n]',
+}
+POSIX_CLASSES = {
+    'alnum': 'a-zA-Z0-9',
+    'alpha': 'a-zA-Z',
+    'blank': ' \\t',
+    'cntrl': '\\x00-\\x1f\\x7f',
+    'digit': '0-9',
+    'graph': '\\x21-\\x7e',
+    'lower': 'a-z',
+    'print': '\\x20-\\x7e',
+    'punct': '!-/:-@\\[-`{-~',
+    'space': ' \\t\\r\\f\\v',
+    'upper': 'A-Z',
+    'xdigit': '0-9A-Fa-f',
+}
+
+# The search list and the regular expression it was last compiled into.
+_last_compiled = None, None
+
+
+class PatternError(ValueError):
+    pass
+
+
+def _translate_bracket(pattern, i):
+    """Translate the bracket expression starting at pattern[i] (`[`)
+    and return it with the index following its closing `]`
+    """
+    i += 1
+    negate = i < len(pattern) and pattern[i] == '^'
+    if negate:
+        i += 1
+    items = []
+    first = True
+    while True:
+        if i >= len(pattern):
+            raise PatternError('Unmatched [ in {0}'.format(pattern))
+        char = pattern[i]
+        if char == ']' and not first:
+            i += 1
+            break
+        first = False
+        if pattern.startswith('[:', i):
+            end = pattern.find(':]', i + 2)
+            if end == -1 or pattern[i + 2:end] not in POSIX_CLASSES:
+                raise PatternError(
+                    'Invalid character class in {0}'.format(pattern))
+            items.append(POSIX_CLASSES[pattern[i + 2:end]])
+            i = end + 2
+        elif pattern.startswith('[=', i) or pattern.startswith('[.', i):
+            end = pattern.find(pattern[i + 1] + ']', i + 2)
+            if end == -1:
+                raise PatternError('Unmatched [ in {0}'.format(pattern))
+            items.append(re.escape(pattern[i + 2:end]))
+            i = end + 2
+        elif char == '-':
+            items.append('-')
+            i += 1
+        else:
+            # A backslash is an ordinary character within brackets.
+            items.append(re.escape(char))
+            i += 1
+    # Bracket expressions never match across lines in git grep.
+    return '[{0}{1}{2}]'.format(
+        '^' if negate else '', ''.join(items), '\\n' if negate else ''), i
+
+
+def translate(pattern, group_offset=0):
+    """Translate a basic regular expression to a Python one
+
+    Return the translated expression and the number of capturing groups
+    in it. Groups are only capturing when the expression uses back
+    references, which are shifted by `group_offset` so several
+    translated expressions can be joined together.
+    """
+    capture = re.search(r'\\[1-9]', pattern) is not None
+    output = []
+    groups = 0
+    # Whether the next token starts an expression, where `*` and `^`
+    # have their literal and anchor meanings respectively.
+    at_start = True
+    last_was_quantifier = False
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        starts_expression = False
+        quantifier = False
+        if char == '\\':
+            if i + 1 >= len(pattern):
+                raise PatternError(
+                    'Trailing backslash in {0}'.format(pattern))
+            i += 1
+            char = pattern[i]
+            if char == '(':
+                groups += 1
+                output.append('(' if capture else '(?:')
+                starts_expression = True
+            elif char == ')':
+                output.append(')')
+            elif char == '|':
+                output.append('|')
+                starts_expression = True
+            elif char in '123456789':
+                output.append('\\{0}'.format(int(char) + group_offset))
+            elif char == '{':
+                end = pattern.find('\\}', i)
+                if end == -1:
+                    raise PatternError('Unmatched \\{{ in {0}'.format(
+                        pattern))
+                output.append('{{{0}}}'.format(pattern[i + 1:end]))
+                i = end + 1
+                quantifier = True
+            elif char in '+?':
+                if at_start:
+                    output.append(re.escape(char))
+                else:
+                    output.append(char)
+                    quantifier = True
+            elif char in BRE_OPERATORS:
+                output.append(BRE_OPERATORS[char])
+            elif char in LINE_CLASS_ESCAPES:
+                output.append(LINE_CLASS_ESCAPES[char])
+            elif char in PYTHON_CLASS_ESCAPES:
+                output.append('\\' + char)
+            else:
+                output.append(re.escape(char))
+        elif char == '[':
+            bracket, i = _translate_bracket(pattern, i)
+            output.append(bracket)
+            i -= 1
+        elif char == '*':
+            if at_start:
+                output.append('\\*')
+            elif not last_was_quantifier:
+                output.append('*')
+                quantifier = True
+            else:
+                quantifier = True
+        elif char == '^' and at_start:
+            output.append('^')
+            starts_expression = True
+        elif char == '$' and (
+                i + 1 == len(pattern) or
+                pattern.startswith('\\)', i + 1) or
+                pattern.startswith('\\|', i + 1)):
+            output.append('$')
+        elif char == '.':
+            output.append('.')
+        else:
+            output.append(re.escape(char))
+        at_start = starts_expression
+        last_was_quantifier = quantifier
+        i += 1
+    return ''.join(output), groups if capture else 0
+
+
+def literal(pattern):
+    """Return the string a pattern matches if it doesn't use any
+    operator, or None
+    """
+    chars = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '\\':
+            if i + 1 >= len(pattern):
+                return None
+            i += 1
+            char = pattern[i]
+            if char in '(){}|123456789' or char in BRE_OPERATORS or \
+                    char in PYTHON_CLASS_ESCAPES:
+                return None
+        elif char in '.[\n' or \
+                (char == '*' and i > 0) or \
+                (char == '^' and i == 0) or \
+                (char == '$' and i == len(pattern) - 1):
+            return None
+        chars.append(char)
+        i += 1
+    return ''.join(chars)
+
+
+def required_substrings(pattern):
+    """Return strings which every match of a pattern contains, e.g. to
+    look them up in an index. Empty when there is no such string (e.g.
+    with an alternation)
+
+    The strings are runs of literal characters outside of groups and not
+    followed by a quantifier. Anything else ends a run, so some required
+    strings may be missed but none is returned which isn't required.
+    """
+    runs = []
+    run = []
+    depth = 0
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        quantifier = False
+        literal_char = None
+        if char == '\\':
+            if i + 1 >= len(pattern):
+                return []
+            i += 1
+            char = pattern[i]
+            if char == '|' and depth == 0:
+                return []
+            elif char == '(':
+                depth += 1
+            elif char == ')':
+                depth = max(depth - 1, 0)
+            elif char == '{':
+                end = pattern.find('\\}', i)
+                if end == -1:
+                    return []
+                i = end + 1
+                quantifier = True
+            elif char in '+?':
+                quantifier = True
+            elif not (char in '|123456789' or char in BRE_OPERATORS or
+                      char in PYTHON_CLASS_ESCAPES):
+                literal_char = char
+        elif char == '\n':
+            # Each line is a pattern of its own.
+            return []
+        elif char == '[':
+            try:
+                _, i = _translate_bracket(pattern, i)
+            except PatternError:
+                return []
+            i -= 1
+        elif char == '*':
+            quantifier = True
+        elif char not in '.^$':
+            literal_char = char
+        if quantifier and run:
+            # The quantified character may not be there.
+            run.pop()
+        if literal_char is not None and depth == 0 and not quantifier:
+            run.append(literal_char)
+        else:
+            runs.append(''.join(run))
+            run = []
+        i += 1
+    runs.append(''.join(run))
+    return [substring for substring in runs if substring]
+
+
+def classify(search_list):
+    """Split the search list into fixed strings (unescaped) and the
+    patterns which are regular expressions
+    """
+    fixed_strings = []
+    regexes = []
+    for pattern in search_list:
+        fixed_string = literal(pattern)
+        if fixed_string is None:
+            regexes.append(pattern)
+        else:
+            fixed_strings.append(fixed_string)
+    return fixed_strings, regexes
+
+
+def extended_alternation(fixed_strings):
+    """Return a POSIX extended regular expression matching any of the
+    fixed strings
+    """
+    return '|'.join(
+        ''.join('\\' + char if char in ERE_SPECIAL_CHARACTERS else char
+                for char in fixed_string)
+        for fixed_string in fixed_strings)
+
+
+def _trie_expression(node):
+    """Return a Python regular expression matching the strings of a
+    trie. Chains of single children are joined without nesting.
+    """
+    chars = []
+    while len(node) == 1 and '' not in node:
+        char, node = next(iter(node.items()))
+        chars.append(re.escape(char))
+    prefix = ''.join(chars)
+    if not node or node.keys() == ['']:
+        return prefix
+    alternatives = [re.escape(next_char) + _trie_expression(child)
+                    for next_char, child in sorted(node.items()) if next_char]
+    expression = '(?:{0})'.format('|'.join(alternatives)) \
+        if len(alternatives) > 1 else alternatives[0]
+    return prefix + (expression + '?' if '' in node else expression)
+
+
+def fixed_strings_expression(fixed_strings):
+    """Return a Python regular expression matching any of the fixed
+    strings. The strings are merged into a trie, so the expression
+    doesn't try each of thousands of alternatives at every position.
+    """
+    trie = {}
+    for fixed_string in fixed_strings:
+        node = trie
+        for char in fixed_string:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _trie_expression(trie)
+
+
+def translate_search_list(search_list):
+    """Translate each pattern of the search list and join them into a
+    single Python regular expression
+    """
+    fixed_strings, regexes = classify(search_list)
+    expressions = []
+    if fixed_strings:
+        expressions.append(
+            '(?:{0})'.format(fixed_strings_expression(fixed_strings)))
+    groups = 0
+    for pattern in regexes:
+        expression, pattern_groups = translate(pattern, groups)
+        groups += pattern_groups
+        expressions.append('(?:{0})'.format(expression))
+    return '|'.join(expressions)
+
+
+def compile_search_list(search_list):
+    """Compile the search list into a single Python regular expression
+    matching wherever `git grep` would match one of its patterns
+
+    git grep has no line to match in an empty file, while a pattern
+    which can match the empty string (e.g. `o*` or `^$`) matches an
+    empty string here, so empty blobs must not be searched.
+
+    Every repository of a run is searched for the same list, so the last
+    compiled one is kept.
+    """
+    global _last_compiled
+    key = tuple(search_list)
+    last_key, last_regex = _last_compiled
+    if key == last_key:
+        return last_regex
+    try:
+        regex = re.compile(translate_search_list(search_list), re.MULTILINE)
+    except re.error as error:
+        raise PatternError('Invalid search list: {0}'.format(error))
+    _last_compiled = key, regex
+    return regex
+
+
+def matches_empty(search_list):
+    """Return whether a pattern of the search list matches the empty
+    string, i.e. an empty line
+    """
+    return compile_search_list(search_list).match('') is not None
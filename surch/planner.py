@@ -0,0 +1,146 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import heapq
+import subprocess
+
+from . import utils, constants
+
+# A plan tells how much a run would scan and how long it would take,
+# without reading the content of any file. Repositories which are already
+# cloned are measured with git plumbing: the commits and blobs reachable
+# from their refs, and the size of these blobs as recorded in the object
+# headers. Repositories which aren't cloned yet only have the size the
+# GitHub API reports.
+#
+# The time to scan each repository is estimated with its recorded costs
+# (see `scheduler.Costs`), scaled down to the part of the repository a
+# commit range or --head-only scans.
+
+
+def repo_stats(repo_path, revisions='--all'):
+    """Return the commits, unique blobs and bytes of these blobs
+    reachable from revisions, and the bytes of the files of HEAD, or None
+    if the repository isn't cloned
+
+    :param repo_path: path to the clone (string)
+    :param revisions: revisions to measure, e.g. `before..after` (string)
+    """
+    if not os.path.isdir(os.path.join(repo_path, '.git')):
+        return None
+    git = 'git -C {0} '.format(repo_path)
+    try:
+        commits = int(subprocess.check_output(
+            git + 'rev-list --count {0}'.format(revisions), shell=True))
+        objects = subprocess.check_output(
+            git + 'rev-list --objects {0} | '.format(revisions) + git +
+            "cat-file --batch-check='%(objecttype) %(objectsize) %(rest)'",
+            shell=True)
+        tree = subprocess.check_output(git + 'ls-tree -r -l HEAD',
+                                       shell=True)
+    except subprocess.CalledProcessError:
+        # An empty repository.
+        return dict(commits=0, blobs=0, blob_bytes=0, head_bytes=0)
+    sizes = [int(line.split(' ', 2)[1]) for line in objects.splitlines()
+             if line.startswith('blob ')]
+    # Submodules have no size.
+    head_bytes = sum(int(line.split(None, 4)[3])
+                     for line in tree.splitlines()
+                     if line.split(None, 4)[3] != '-')
+    return dict(commits=commits, blobs=len(sizes), blob_bytes=sum(sizes),
+                head_bytes=head_bytes)
+
+
+def makespan(estimates, workers):
+    """Return the seconds the slowest of `workers` takes to scan items
+    of estimated seconds, given to the first idle worker largest first
+    """
+    finish_times = [0.0] * max(1, workers)
+    for seconds in sorted(estimates, reverse=True):
+        heapq.heapreplace(finish_times, finish_times[0] + seconds)
+    return max(finish_times)
+
+
+def plan(repos, cloned_repos_dir, costs, workers=1, commit_range=None,
+         head_only=False):
+    """Return the plan of scanning repositories
+
+    :param repos: dicts with the name and GitHub size of each
+                  repository (list)
+    :param cloned_repos_dir: path for cloned repos (string)
+    :param costs: recorded costs of the repositories (scheduler.Costs)
+    :param workers: number of repositories to scan at once (int)
+    :param commit_range: only scan commits in this range (string)
+    :param head_only: only scan the files of HEAD (boolean)
+    """
+    estimates = costs.estimate(repos)
+    rows = []
+    for repo_data in repos:
+        name = repo_data['name']
+        repo_path = os.path.join(cloned_repos_dir, name)
+        stats = repo_stats(repo_path)
+        seconds = estimates[name]
+        scanned_bytes = None
+        if stats:
+            scanned_bytes = stats['blob_bytes']
+            if head_only:
+                scanned_bytes = stats['head_bytes']
+            elif commit_range:
+                stats = repo_stats(repo_path, revisions=commit_range)
+                scanned_bytes = stats['blob_bytes']
+            if stats['blob_bytes'] and scanned_bytes < stats['blob_bytes']:
+                seconds *= scanned_bytes / float(stats['blob_bytes'])
+        rows.append(dict(
+            name=name,
+            size_kb=repo_data.get('size'),
+            commits=stats['commits'] if stats else None,
+            blobs=stats['blobs'] if stats else None,
+            scanned_bytes=scanned_bytes,
+            seconds=round(seconds, 3)))
+    return dict(
+        repos=rows,
+        workers=workers,
+        total_seconds=round(sum(row['seconds'] for row in rows), 3),
+        wall_seconds=round(makespan(
+            [row['seconds'] for row in rows], workers), 3))
+
+
+def report(scan_plan, results_dir):
+    """Log a plan and write it to the results directory
+    """
+    def column(value):
+        return '-' if value is None else value
+
+    utils.logger.info('{0:<40}{1:>12}{2:>10}{3:>10}{4:>16}{5:>12}'.format(
+        'repository', 'size (KB)', 'commits', 'blobs', 'bytes to scan',
+        'est. (s)'))
+    for row in scan_plan['repos']:
+        utils.logger.info(
+            '{0:<40}{1:>12}{2:>10}{3:>10}{4:>16}{5:>12.1f}'.format(
+                row['name'], column(row['size_kb']), column(row['commits']),
+                column(row['blobs']), column(row['scanned_bytes']),
+                row['seconds']))
+    if not os.path.isdir(results_dir):
+        os.makedirs(results_dir)
+    path = os.path.join(results_dir, constants.SCAN_PLAN_FILE)
+    with open(path, 'w') as plan_file:
+        json.dump(scan_plan, plan_file, indent=4, sort_keys=True)
+    utils.logger.info(
+        'Estimated {0:.1f}s of scanning for {1} repositories, {2:.1f}s with '
+        '{3} worker(s). Plan written to {4}'.format(
+            scan_plan['total_seconds'], len(scan_plan['repos']),
+            scan_plan['wall_seconds'], scan_plan['workers'], path))
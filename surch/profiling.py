@@ -0,0 +1,201 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import gc
+import time
+import pstats
+import threading
+import cProfile
+import resource
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+
+try:
+    # Part of Python 3.4+, on Python 2 it's provided by pytracemalloc,
+    # which needs a patched interpreter.
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+from . import utils, constants
+
+# The profiler of the current run, if it is profiled. Stage boundaries
+# are marked with `stage()` which does nothing otherwise.
+_active = None
+
+
+def stage(name):
+    """Mark the start of a stage of the run (e.g. `clone` or `search`)
+
+    Only the main thread is profiled, stages of repositories scanned by
+    other threads are ignored.
+    """
+    if _active is not None and \
+            threading.current_thread().name == 'MainThread':
+        _active.stage(name)
+
+
+def _object_counts():
+    """Return the number of objects tracked by the garbage collector
+    per type name
+    """
+    return Counter(type(obj).__name__ for obj in gc.get_objects())
+
+
+class Profiler(object):
+    def __init__(self, output_dir, top=constants.PROFILE_TOP):
+        """Profile CPU (with cProfile) and memory per stage of a run
+
+        The allocations of every stage are traced with tracemalloc when
+        it is available. Otherwise, the objects tracked by the garbage
+        collector are counted by type at the stage boundaries, and the
+        types whose number grew the most are reported instead.
+
+        Stages with the same name, e.g. the `clone` stage of every
+        repository of an organization, are aggregated.
+
+        :param output_dir: directory to write the reports to (string)
+        :param top: number of entries in the reports (int)
+        """
+        self.output_dir = output_dir
+        self.top = top
+        self.profiles = OrderedDict()
+        self.timings = OrderedDict()
+        self.allocations = OrderedDict()
+        self.objects = OrderedDict()
+        self.current = None
+        self._started = None
+        self._snapshot = None
+        self._objects = None
+
+    @staticmethod
+    def _usage():
+        own = resource.getrusage(resource.RUSAGE_SELF)
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return (time.time(),
+                own.ru_utime + own.ru_stime,
+                children.ru_utime + children.ru_stime,
+                own.ru_maxrss)
+
+    def _enter(self, name):
+        self.current = name
+        if tracemalloc:
+            self._snapshot = tracemalloc.take_snapshot()
+        else:
+            self._objects = _object_counts()
+        self._started = self._usage()
+        self.profiles.setdefault(name, cProfile.Profile()).enable()
+
+    def _leave(self):
+        self.profiles[self.current].disable()
+        usage = self._usage()
+        timing = self.timings.setdefault(self.current, [0, 0, 0, 0, 0])
+        for index in range(3):
+            timing[index] += usage[index] - self._started[index]
+        timing[3] = max(timing[3], usage[3])
+        timing[4] += usage[3] - self._started[3]
+        if tracemalloc:
+            allocations = self.allocations.setdefault(self.current, Counter())
+            for stat in tracemalloc.take_snapshot().compare_to(
+                    self._snapshot, 'lineno'):
+                allocations[str(stat.traceback)] += stat.size_diff
+            self._snapshot = None
+        else:
+            objects = self.objects.setdefault(self.current, Counter())
+            objects.update(_object_counts())
+            objects.subtract(self._objects)
+            self._objects = None
+
+    def start(self):
+        if tracemalloc:
+            tracemalloc.start()
+        self._enter('setup')
+
+    def stage(self, name):
+        self._leave()
+        self._enter(name)
+
+    def stop(self):
+        self._leave()
+        if tracemalloc:
+            tracemalloc.stop()
+        if not os.path.isdir(self.output_dir):
+            os.makedirs(self.output_dir)
+        stats = None
+        for name, profile in self.profiles.items():
+            profile.dump_stats(self._path('profile-{0}.pstats'.format(name)))
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        stats.dump_stats(self._path('profile.pstats'))
+        with open(self._path('profile.txt'), 'w') as report:
+            self._write_report(report, stats)
+        utils.logger.info('Profiling reports written to {0}'.format(
+            self.output_dir))
+
+    def _path(self, name):
+        return os.path.join(self.output_dir, name)
+
+    def _write_report(self, report, stats):
+        report.write('{0:<16}{1:>10}{2:>10}{3:>10}{4:>14}{5:>16}\n'.format(
+            'stage', 'wall (s)', 'cpu (s)', 'git (s)', 'max rss (kB)',
+            'rss grew (kB)'))
+        for name, (wall, cpu, children, max_rss, grown) in \
+                self.timings.items():
+            report.write(
+                '{0:<16}{1:>10.3f}{2:>10.3f}{3:>10.3f}{4:>14}{5:>16}\n'
+                .format(name, wall, cpu, children, max_rss, grown))
+        report.write('\nTop {0} functions by cumulative time:\n'.format(
+            self.top))
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(self.top)
+        if tracemalloc:
+            for name, allocations in self.allocations.items():
+                report.write('Top {0} allocations during {1}:\n'.format(
+                    self.top, name))
+                for location, size in allocations.most_common(self.top):
+                    report.write('{0:>14} B  {1}\n'.format(size, location))
+                report.write('\n')
+        else:
+            report.write('tracemalloc is not available (pip install '
+                         'pytracemalloc on a patched Python 2), counting '
+                         'objects by type instead.\n\n')
+            for name, objects in self.objects.items():
+                report.write('Top {0} object types created during {1}:\n'
+                             .format(self.top, name))
+                for type_name, count in objects.most_common(self.top):
+                    if count <= 0:
+                        break
+                    report.write('{0:>14}  {1}\n'.format(count, type_name))
+                report.write('\n')
+
+
+@contextmanager
+def profile(output_dir, enabled=True):
+    """Profile the run within the context if enabled
+    """
+    global _active
+    if not enabled:
+        yield
+        return
+    _active = Profiler(output_dir)
+    _active.start()
+    try:
+        yield _active
+    finally:
+        profiler, _active = _active, None
+        profiler.stop()
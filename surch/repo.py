@@ -16,14 +16,33 @@
 import os
 import sys
 import logging
+import threading
 import subprocess
 from time import time
+from collections import Counter
 
 import retrying
 from tinydb import TinyDB
 
 from .plugins import handler
-from . import utils, constants
+from . import pack, delta, store, utils, planner, backends, patterns, \
+    trigram, suppress, findings, worktree, scanstate, profiling, \
+    scheduler, clonecache, constants
+from .entropy import EntropyDetector, EntropyError
+
+
+_results_lock = threading.Lock()
+
+
+def _clone_backoff(attempt, delay_since_first_attempt):
+    """Milliseconds to wait before the next clone or pull attempt
+    """
+    return min(constants.CLONE_BACKOFF * 2 ** (attempt - 1),
+               constants.CLONE_BACKOFF_MAX) * 1000
+
+
+def _is_git_error(exception):
+    return isinstance(exception, subprocess.CalledProcessError)
 
 
 class Repo(object):
@@ -38,6 +57,21 @@ class Repo(object):
                  cloned_repo_dir=None,
                  consolidate_log=False,
                  remove_cloned_dir=False,
+                 commit_range=None,
+                 engine='grep',
+                 introduced=False,
+                 entropy=False,
+                 shared_store=False,
+                 report_delta=False,
+                 head_only=False,
+                 results_table=None,
+                 clone_budget=None,
+                 clone_cache=None,
+                 suppressions=None,
+                 first_match=False,
+                 stop=None,
+                 use_index=False,
+                 rescan=False,
                  **kwargs):
         """Surch repo instance init
 
@@ -51,6 +85,38 @@ class Repo(object):
                         this flag decide if save the old result file (boolean)
         :param remove_cloned_dir:
                         this flag for removing the clone directory (boolean)
+        :param commit_range: only scan commits in this range,
+                        e.g. `before..after` (string)
+        :param engine: `grep` to search with git grep, `native` to read
+                        the object store without running git or `auto`
+                        to select the fastest backend (string)
+        :param introduced: only report the commits which added the
+                        matching lines (boolean)
+        :param entropy: also report files containing high entropy
+                        strings (boolean)
+        :param shared_store: share the objects of all clones of
+                        cloned_repo_dir through a reference store (boolean)
+        :param report_delta: write the findings which are new or resolved
+                        since the last run of the repo (boolean)
+        :param head_only: only scan the files of the current HEAD (boolean)
+        :param results_table: TinyDB table of the results file to write
+                        the results to, instead of the default one (string)
+        :param clone_budget: bytes the clones of cloned_repo_dir may take,
+                        least recently scanned clones are removed
+                        beyond it (int)
+        :param clone_cache: cache of clones shared with other repositories,
+                        instead of clone_budget (clonecache.CloneCache)
+        :param suppressions: path to a file of known false positives to
+                        leave out of the results (string)
+        :param first_match: stop at the first finding and only report
+                        it (boolean)
+        :param stop: set on the first finding, and stops the search when
+                        set, e.g. by another repository (threading.Event)
+        :param use_index: only match the blobs the trigram index of the
+                        clone finds, with the native backends (boolean)
+        :param rescan: search the whole history for the whole search list
+                        instead of reusing the last scan's results
+                        (boolean)
         """
 
         utils.check_if_executable_exists_else_exit('git')
@@ -70,6 +136,58 @@ class Repo(object):
         self.repo_path = os.path.join(self.cloned_repo_dir, self.repo_name)
         self.quiet_git = '--quiet' if not verbose else ''
         self.verbose = verbose
+        self.commit_range = commit_range
+        if engine not in constants.ENGINES:
+            self.logger.error('Unknown search engine: {0}'.format(engine))
+            sys.exit(1)
+        self.engine = engine
+        # The auto engine selects a backend once the repo is cloned.
+        self.backend = dict(grep=backends.GREP,
+                            native=backends.NATIVE_REGEX).get(engine)
+        self.introduced = introduced
+        if head_only and (introduced or commit_range):
+            self.logger.error(
+                'Scanning the HEAD only cannot be combined with '
+                '--introduced or a commit range.')
+            sys.exit(1)
+        self.head_only = head_only
+        if use_index and (introduced or head_only):
+            self.logger.error(
+                'The trigram index cannot be combined with --introduced '
+                'or --head-only.')
+            sys.exit(1)
+        self.use_index = use_index
+        self.candidate_blobs = None
+        if use_index:
+            # Refined to the literal backend once the search list is known.
+            self.backend = backends.NATIVE_REGEX
+        self.results_table = results_table
+        self.entropy = None
+        if entropy:
+            if introduced:
+                self.logger.error(
+                    'Entropy detection scans whole blobs and cannot be '
+                    'combined with --introduced.')
+                sys.exit(1)
+            try:
+                self.entropy = EntropyDetector()
+            except EntropyError as error:
+                self.logger.error(error)
+                sys.exit(1)
+        self.store = None
+        self.shared_store = store.SharedStore(
+            self.cloned_repo_dir, verbose) if shared_store else None
+        self.report_delta = report_delta
+        self.clone_cache = clone_cache or (clonecache.CloneCache(
+            self.cloned_repo_dir, clone_budget) if clone_budget else None)
+        self.suppressions_file = suppressions
+        self.suppressions = suppress.load(suppressions) \
+            if suppressions else None
+        self.suppressed = Counter()
+        self.first_match = first_match
+        self.stop = stop or threading.Event()
+        self.first_finding = None
+        self._commit_details = {}
         self.pager = handler.plugins_handle(config_file=self.config_file,
                                             plugins_list=pager)
         results_dir = \
@@ -77,45 +195,76 @@ class Repo(object):
         self.results_file_path = results_dir or os.path.join(
                 constants.RESULTS_PATH, self.organization, 'results.json')
         utils.handle_results_file(self.results_file_path, consolidate_log)
+        # Only full history scans can be continued.
+        self.scan_state = None
+        if not (rescan or introduced or head_only or commit_range or
+                first_match):
+            self.scan_state = scanstate.ScanState(self.results_file_path,
+                                                  self.organization,
+                                                  self.repo_name)
+        self._frontier = None
+        self._carried_results = None
+        self._state_findings = None
 
         self.error_summary = []
+        self.entropy_results = []
         self.result_count = 0
+        self.commits = 0
+        self.head = None
 
     @classmethod
     def init_with_config_file(cls,
                               config_file,
                               pager=None,
                               verbose=False,
-                              print_result=False):
+                              print_result=False,
+                              **kwargs):
         """Init repo instance from config file
         """
         conf_vars = utils.read_config_file(pager=pager,
                                            verbose=verbose,
                                            config_file=config_file,
-                                           print_result=print_result)
+                                           print_result=print_result,
+                                           **kwargs)
         return cls(**conf_vars)
 
-    @retrying.retry(stop_max_attempt_number=3)
+    @retrying.retry(stop_max_attempt_number=constants.CLONE_ATTEMPTS,
+                    wait_func=_clone_backoff,
+                    retry_on_exception=_is_git_error)
     def _clone_or_pull(self):
         """Clone the repo if it doesn't exist in the cloned_repo_dir.
-        Otherwise, pull it.
+        Otherwise, pull it. Failures (e.g. network errors) are retried
+        with an exponential backoff.
         """
 
         def run(command):
-            try:
-                proc = subprocess.Popen(
-                    command, stdout=subprocess.PIPE, shell=True)
-                proc.stdout, proc.stderr = proc.communicate()
-                if self.verbose:
-                    self.logger.debug(proc.stdout)
-            except subprocess.CalledProcessError as git_error:
-                err = 'Failed execute {0} on repo {1} ({1})'.format(
-                    command, self.repo_name, git_error)
-                self.logger.error(err)
-                self.error_summary.append(err)
+            proc = subprocess.Popen(
+                command, stdout=subprocess.PIPE, shell=True)
+            output, _ = proc.communicate()
+            if self.verbose:
+                self.logger.debug(output)
+            if proc.returncode != 0:
+                err = 'Failed execute {0} on repo {1}'.format(
+                    command, self.repo_name)
+                self.logger.warn(err)
+                raise subprocess.CalledProcessError(
+                    proc.returncode, command, output)
 
         if not os.path.isdir(self.cloned_repo_dir):
             os.makedirs(self.cloned_repo_dir)
+        reference = ''
+        if self.shared_store:
+            # Fetch into the shared store first so the clone or pull only
+            # has to get the objects it doesn't have.
+            try:
+                self.shared_store.ensure()
+                self.shared_store.fetch(self.repo_name, self.repo_url)
+                reference = '--reference {0}'.format(self.shared_store.path)
+            except subprocess.CalledProcessError as git_error:
+                err = 'Failed to use the shared object store for repo ' \
+                      '{0} ({1})'.format(self.repo_name, git_error)
+                self.logger.warn(err)
+                self.error_summary.append(err)
         if os.path.isdir(self.repo_path):
             self.logger.debug('Local repo already exists at: {0}'.format(
                 self.repo_path))
@@ -124,122 +273,521 @@ class Repo(object):
         else:
             self.logger.info('Cloning repo {0} from org {1} to {2}...'.format(
                 self.repo_name, self.organization, self.repo_path))
-            run('git clone {0} {1} {2}'.format(
-                self.quiet_git, self.repo_url, self.repo_path))
-
-    def _create_search_string(self, search_list):
-        """Create part of the grep command from search list.
-        """
-
-        self.logger.debug('Generating git grep-able search string...')
-        unglobbed_search_list = ["'{0}'".format(item) for item in search_list]
-        search_string = ' --or -e '.join(unglobbed_search_list)
-        return search_string
+            # The url comes after `--` so it can't be taken as an option.
+            run('git clone {0} {1} -- {2} {3}'.format(
+                self.quiet_git, reference, self.repo_url, self.repo_path))
 
     def _search(self, search_list, commits):
         """Create list of all commits which contains one of the strings
         we're searching for.
         """
-        search_string = self._create_search_string(list(search_list))
-        matching_commits = []
+        if search_list and self.backend != backends.GREP:
+            # Exit on patterns the other backends can't translate.
+            self._compile_search_list(search_list)
+        if self.use_index:
+            self.backend = backends.native(search_list)
+        elif self.backend is None:
+            self._calibrate(search_list)
         self.logger.info('Scanning repo {0} for {1} string(s)...'.format(
             self.repo_name, len(search_list)))
-        for commit in commits:
-            matching_commits.append(self._search_commit(commit, search_string))
+        native = self.backend in backends.NATIVE_BACKENDS
+        matching_commits = []
+        if search_list or native:
+            matching_commits = self._search_backend(
+                self.backend, search_list, commits)
+        if self.entropy and not native and \
+                not (self.first_match and self.stop.is_set()):
+            # git grep can't score entropy, scan the blobs natively.
+            self._search_backend(backends.NATIVE_REGEX, [], commits)
+        return matching_commits
+
+    def _calibrate(self, search_list):
+        """Select the fastest backend for the search list and the shape
+        of the repo
+        """
+        stats = planner.repo_stats(self.repo_path,
+                                   self.commit_range or '--all')
+        self.backend, estimates = backends.calibrate(
+            self.repo_path, search_list, stats, entropy=self.entropy)
+        self.logger.info('Selected the {0} backend for repo {1} ({2})'.format(
+            self.backend, self.repo_name, ', '.join(
+                '{0}: {1:.2f}s'.format(name, seconds)
+                for name, seconds in sorted(estimates.items()))))
+
+    def _search_backend(self, name, search_list, commits):
+        """Search the commits with a backend, collecting entropy
+        findings in entropy_results
+        """
+        if name in backends.NATIVE_BACKENDS and self.store is None:
+            self.store = pack.ObjectStore(self.repo_path)
+        candidates = self.candidate_blobs if search_list else None
+        backend = backends.create(name, self.repo_path, search_list,
+                                  store=self.store, entropy=self.entropy,
+                                  candidates=candidates)
+        matching_commits = []
+        try:
+            for commit in commits:
+                matches = self._search_commit(backend, commit)
+                matching_commits.append([match for match, finding in matches
+                                         if finding == pack.PATTERN])
+                self.entropy_results.append([
+                    match for match, finding in matches
+                    if finding == pack.ENTROPY])
+                if self._stopped(matching_commits[-1],
+                                 self.entropy_results[-1]):
+                    break
+        finally:
+            backend.close()
         return matching_commits
 
+    def _update_index(self, search_list):
+        """Index the blobs fetched since the trigram index of the clone
+        was updated, if it has one or the search uses it, and narrow
+        the search down to its candidate blobs
+        """
+        trigram_index = trigram.TrigramIndex(self.repo_path)
+        if not self.use_index and not trigram_index.exists():
+            return
+        try:
+            indexed = trigram_index.update()
+            self.logger.debug('Indexed {0} new blobs of repo {1}.'.format(
+                indexed, self.repo_name))
+            if self.use_index and search_list:
+                self.candidate_blobs = trigram_index.candidates(search_list)
+                if self.candidate_blobs is None:
+                    self.logger.info(
+                        'The search list has patterns the index cannot '
+                        'narrow down, searching all blobs of repo '
+                        '{0}.'.format(self.repo_name))
+                else:
+                    self.logger.info(
+                        'The index narrowed the search down to {0} of {1} '
+                        'blobs of repo {2}.'.format(
+                            len(self.candidate_blobs), trigram_index.size(),
+                            self.repo_name))
+        finally:
+            trigram_index.close()
+
+    def _compile_search_list(self, search_list):
+        try:
+            return patterns.compile_search_list(search_list)
+        except patterns.PatternError as error:
+            self.logger.error(error)
+            sys.exit(1)
+
+    def _search_head(self, search_list):
+        """Search the checked out files of HEAD, or its tree if they
+        were modified
+        """
+        head = subprocess.check_output(
+            'git -C {0} rev-parse HEAD'.format(self.repo_path),
+            shell=True).strip()
+        self.commits = 1
+        regex = self._compile_search_list(search_list) if search_list \
+            else None
+        searcher = worktree.WorktreeSearch(
+            self.repo_path, regex, entropy=self.entropy)
+        if not searcher.is_clean():
+            self.logger.warn('The checked out files of {0} were modified, '
+                             'scanning its HEAD tree instead.'.format(
+                                 self.repo_name))
+            return self._search(search_list, [head])
+        self.logger.info('Scanning HEAD of repo {0} for {1} string(s)...'
+                         .format(self.repo_name, len(search_list)))
+        findings = searcher.search(stop=lambda path, findings: self._stopped(
+            ['{0}:{1}'.format(head, path)] if pack.PATTERN in findings
+            else [],
+            ['{0}:{1}'.format(head, path)] if pack.ENTROPY in findings
+            else []))
+        self.entropy_results.append([
+            '{0}:{1}'.format(head, path) for path, finding in findings
+            if finding == pack.ENTROPY])
+        return [['{0}:{1}'.format(head, path) for path, finding in findings
+                 if finding == pack.PATTERN]]
+
+    @staticmethod
+    def _parse_diff_path(path):
+        """Return the path of a `+++ b/path` diff header or None for
+        deleted files
+        """
+        # Paths with spaces are followed by a tab.
+        path = path.rstrip('\t')
+        if path.startswith('"'):
+            # git quotes paths with special characters C-style.
+            path = path[1:-1].decode('string_escape')
+        return path[2:] if path.startswith('b/') else None
+
+    def _search_introduced(self, search_list):
+        """Stream the patches of all commits, oldest first, and match
+        only the lines they add. Each added line is reported once, on the
+        commit which introduced it.
+        """
+        regex = self._compile_search_list(search_list)
+        self.logger.info(
+            'Scanning added lines of repo {0} for {1} string(s)...'.format(
+                self.repo_name, len(search_list)))
+        proc = subprocess.Popen(
+            'git -C {0} log -p --text --unified=0 --no-color --no-ext-diff '
+            '--no-renames --reverse --format=%x00%H%x00%an%x00%ae%x00%ad '
+            '{1}'.format(self.repo_path, self.commit_range or '--all'),
+            stdout=subprocess.PIPE, shell=True)
+        seen = set()
+        matching_commits = []
+        commit_matches = []
+        commit_sha = filepath = None
+        in_header = False
+        for line in proc.stdout:
+            if line.startswith('\0'):
+                if self._stopped([]):
+                    break
+                commit_sha, name, email, commit_date = \
+                    line[1:].rstrip('\n').split('\0')
+                self._commit_details[commit_sha] = (
+                    name, email, commit_date.rsplit(' ', 1)[0])
+                commit_matches = []
+                matching_commits.append(commit_matches)
+            elif line.startswith('diff --git '):
+                in_header = True
+                filepath = None
+            elif in_header:
+                if line.startswith('+++ '):
+                    filepath = self._parse_diff_path(line[4:].rstrip('\n'))
+                elif line.startswith('@@'):
+                    in_header = False
+            elif line.startswith('+') and filepath:
+                added_line = line[1:].rstrip('\n')
+                if (filepath, added_line) in seen or \
+                        not regex.search(added_line):
+                    continue
+                seen.add((filepath, added_line))
+                match = '{0}:{1}'.format(commit_sha, filepath)
+                if match not in commit_matches:
+                    commit_matches.append(match)
+                    if self._stopped([match]):
+                        break
+        if self.first_match and self.stop.is_set():
+            # Don't wait for the patches of the remaining commits.
+            proc.kill()
+        proc.wait()
+        self.commits = len(matching_commits)
+        return matching_commits
+
+    def _unsuppressed(self, matches, finding_type=None):
+        """Return the matches which aren't suppressed
+        """
+        if not self.suppressions or not matches:
+            return matches
+        matches = [match for match in matches
+                   if not self.suppressions.path(match.rsplit(':', 1)[-1])]
+        blob_shas = self._blob_shas(matches)
+        return [match for match in matches if not self.suppressions.blob(
+            blob_shas.get(match, ''), delta.fingerprint(
+                self.organization, self.repo_name, match.rsplit(':', 1)[-1],
+                blob_shas.get(match, ''), finding_type))]
+
+    def _stopped(self, matches, entropy_matches=()):
+        """Return whether to stop searching, in first match mode, once
+        a finding is found here or in another repository of the run
+        """
+        if not self.first_match or self.stop.is_set():
+            return self.stop.is_set()
+        for finding_type, found in ((None, matches),
+                                    (pack.ENTROPY, entropy_matches)):
+            found = self._unsuppressed(found, finding_type)
+            if found:
+                self.first_finding = found[0], finding_type
+                self.stop.set()
+                return True
+        return False
+
     def _get_all_commits(self):
         """Get the sha (id) of the commit
         """
         self.logger.debug('Retrieving list of commits...')
+        if self.backend in backends.NATIVE_BACKENDS:
+            self.store = pack.ObjectStore(self.repo_path)
+            try:
+                commit_list = self.store.rev_list(self.commit_range)
+            except pack.ObjectNotFound:
+                commit_list = []
+            self.commits = len(commit_list)
+            return commit_list
+        revisions = self.commit_range or '--all'
         try:
             commits = subprocess.check_output(
-                'git -C {0} rev-list --all'.format(self.repo_path), shell=True)
+                'git -C {0} rev-list {1}'.format(self.repo_path, revisions),
+                shell=True)
             commit_list = commits.splitlines()
             self.commits = len(commit_list)
             return commit_list
         except subprocess.CalledProcessError:
             return []
 
-    def _search_commit(self, commit, search_string):
-        """ Run git grep on the commit
+    def _search_commit(self, backend, commit):
+        return backend.search_commit(commit)
+
+    def _blob_shas(self, matches):
+        """Return the sha of the blob of every `sha:path` match
         """
-        try:
-            matched_files = subprocess.check_output(
-                'git -C {0} grep -l -e {1} {2}'.format(
-                    self.repo_path, search_string, commit), shell=True)
-            return matched_files.splitlines()
-        except subprocess.CalledProcessError:
-            return []
+        if not matches:
+            return {}
+        proc = subprocess.Popen(
+            "git -C {0} cat-file --batch-check='%(objectname)'".format(
+                self.repo_path),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, shell=True)
+        output, _ = proc.communicate('\n'.join(matches) + '\n')
+        return dict(zip(matches, output.splitlines()))
 
-    def _write_results(self, results):
+    def _write_results(self, results, finding_type=None):
         """ Write the result to DB
         """
-        db = TinyDB(
-            self.results_file_path,
-            indent=4,
-            sort_keys=True,
-            separators=(',', ': '))
-
         self.logger.info('Writing results to: {0}...'.format(
             self.results_file_path))
-        for matched_files in results:
-            for match in matched_files:
-                try:
-                    commit_sha, filepath = match.rsplit(':', 1)
-                    username, email, commit_time = \
-                        self._get_user_details(commit_sha)
-                    result = dict(
-                        email=email,
-                        filepath=filepath,
-                        username=username,
-                        commit_sha=commit_sha,
-                        commit_time=commit_time,
-                        repository_name=self.repo_name,
-                        organization_name=self.organization,
-                        blob_url=constants.GITHUB_BLOB_URL.format(
-                            self.organization,
-                            self.repo_name,
-                            commit_sha, filepath)
-                    )
-                    self.result_count += 1
-                    db.insert(result)
-                except IndexError:
-                    # The structre of the output is
-                    # sha:filename
-                    # sha:filename
-                    # filename
-                    # None
-                    # and we need both sha and filename and when we don't \
-                    #  get them we skip to the next
-                    pass
+        matches = [match for matched_files in results
+                   for match in matched_files]
+        if self.suppressions:
+            # Suppressed paths don't need their blob looked up.
+            kept = [match for match in matches
+                    if not self.suppressions.path(match.rsplit(':', 1)[-1])]
+            if len(kept) < len(matches):
+                self.suppressed[suppress.PATH] += len(matches) - len(kept)
+            matches = kept
+        blob_shas = self._blob_shas(matches)
+        found = findings.Findings(self.organization, self.repo_name)
+        for match in matches:
+            try:
+                commit_sha, filepath = match.rsplit(':', 1)
+                blob_sha = blob_shas.get(match, '')
+                fingerprint = delta.fingerprint(
+                    self.organization, self.repo_name, filepath,
+                    blob_sha, finding_type)
+                if self.suppressions:
+                    reason = self.suppressions.blob(blob_sha,
+                                                    fingerprint)
+                    if reason:
+                        self.suppressed[reason] += 1
+                        continue
+                commit = found.commit(
+                    commit_sha, *self._get_user_details(commit_sha))
+                found.add(commit, filepath, blob_sha, fingerprint,
+                          finding_type)
+                self.result_count += 1
+            except IndexError:
+                # The structre of the output is
+                # sha:filename
+                # sha:filename
+                # filename
+                # None
+                # and we need both sha and filename and when we don't \
+                #  get them we skip to the next
+                pass
+        self._insert_results(found)
+
+    def _insert_results(self, found):
+        """Insert findings into the results file, keeping their records
+        for the scan state if it is recorded
+        """
+        if self._state_findings is not None:
+            self._state_findings.append(found)
+        # Repositories of an organization may be scanned concurrently
+        # into the same results file.
+        with _results_lock:
+            db = TinyDB(
+                self.results_file_path,
+                indent=4,
+                sort_keys=True,
+                separators=(',', ': '))
+            if self.results_table:
+                db = db.table(self.results_table)
+            db.insert_multiple(found.rows())
 
     def _get_user_details(self, sha):
         """ Return user_name, user_email, commit_time
         per commit before write to DB
         """
+        if sha in self._commit_details:
+            return self._commit_details[sha]
+        if self.store:
+            details = self.store.commit_details(sha)
+            self._commit_details[sha] = details
+            return details
         details = subprocess.check_output(
-            "git -C {0} show -s  {1}".format(self.repo_path, sha), shell=True)
-        name = utils.find_string_between_strings(details, 'Author: ', ' <')
-        email = utils.find_string_between_strings(details, '<', '>')
-        commit_time = utils.find_string_between_strings(
-            details, 'Date:   ', '+').strip()
+            "git -C {0} show -s --format='%an%n%ae%n%ad' {1}".format(
+                self.repo_path, sha), shell=True)
+        name, email, commit_date = details.splitlines()[:3]
+        # Drop the timezone, e.g. `Tue Jul 12 10:15:30 2016 +0300`
+        commit_time = commit_date.rsplit(' ', 1)[0]
+        self._commit_details[sha] = name, email, commit_time
         return name, email, commit_time
 
+    def _scan_key(self):
+        return scanstate.key(entropy=self.entropy is not None,
+                             suppressions=self.suppressions_file)
+
+    def _search_history(self, search_list, commits):
+        """Search the commits for the search list. With the state of the
+        last scan, only search the new commits for the whole search list
+        and the other ones for the added strings, and carry the last
+        results forward
+        """
+        if not self.scan_state:
+            return self._search(search_list, commits)
+        self._state_findings = []
+        self._frontier = scanstate.frontier(self.repo_path)
+        state = self.scan_state.load(self._scan_key())
+        scanned = scanstate.reachable(self.repo_path, state['frontier']) \
+            if state else None
+        if scanned is None:
+            return self._search(search_list, commits)
+        added, removed = scanstate.changes(state['search_list_digests'],
+                                           search_list)
+        carried = self._carry_results(
+            scanstate.load_findings(state, self.organization, self.repo_name),
+            commits, removed, search_list)
+        if carried is None:
+            return self._search(search_list, commits)
+        new_commits = [commit for commit in commits if commit not in scanned]
+        old_commits = [commit for commit in commits if commit in scanned]
+        self.logger.info(
+            'Reusing the last scan of repo {0}: {1} new commit(s) to '
+            'search, {2} string(s) added and {3} removed.'.format(
+                self.repo_name, len(new_commits), len(added), len(removed)))
+        results = []
+        if new_commits:
+            results = self._search(search_list, new_commits)
+        if added and old_commits:
+            # Entropy findings of these commits are carried already.
+            entropy, self.entropy = self.entropy, None
+            try:
+                added_results = self._search(added, old_commits)
+            finally:
+                self.entropy = entropy
+            carried_matches = set(
+                '{0}:{1}'.format(finding.commit[0], finding.filepath)
+                for finding in carried if not finding.finding_type)
+            results.extend([match for match in matched_files
+                            if match not in carried_matches]
+                           for matched_files in added_results)
+        self._carried_results = carried
+        return results
+
+    def _carry_results(self, results, commits, removed, search_list):
+        """Return the findings of the last scan which still hold, or None
+        if it can't tell
+        """
+        commits = set(commits)
+        # Commits may be gone, e.g. after a force push.
+        results = results.select(
+            lambda finding: finding.commit[0] in commits)
+        if not removed:
+            return results
+        try:
+            regex = patterns.compile_search_list(search_list) \
+                if search_list else None
+        except patterns.PatternError:
+            return None
+        object_store = self.store or pack.ObjectStore(self.repo_path)
+        blob_matches = {}
+        try:
+            for finding in results:
+                blob_sha = finding.blob_sha
+                if finding.finding_type:
+                    continue
+                if not blob_sha:
+                    return None
+                if blob_sha not in blob_matches:
+                    _, data = object_store.read(blob_sha)
+                    blob_matches[blob_sha] = bool(
+                        regex and data and regex.search(data))
+        except pack.ObjectNotFound:
+            return None
+        finally:
+            if object_store is not self.store:
+                object_store.close()
+        return results.select(lambda finding: finding.finding_type or
+                              blob_matches[finding.blob_sha])
+
+    def _scan(self, search_list):
+        profiling.stage('clone')
+        try:
+            self._clone_or_pull()
+        except subprocess.CalledProcessError:
+            self.logger.error('Failed to clone or pull repo {0} after {1} '
+                              'attempts.'.format(self.repo_name,
+                                                 constants.CLONE_ATTEMPTS))
+            raise
+        try:
+            self.head = subprocess.check_output(
+                'git -C {0} rev-parse --verify --quiet HEAD'.format(
+                    self.repo_path), shell=True).strip()
+        except subprocess.CalledProcessError:
+            # An empty repository.
+            self.head = None
+        profiling.stage('index')
+        self._update_index(search_list)
+        if self.introduced:
+            profiling.stage('search')
+            results = self._search_introduced(search_list)
+        elif self.head_only:
+            profiling.stage('search')
+            results = self._search_head(search_list)
+        else:
+            profiling.stage('list_commits')
+            commits = self._get_all_commits()
+            profiling.stage('search')
+            results = self._search_history(search_list, commits)
+        if self.first_match:
+            # Only report the first finding.
+            match, finding_type = self.first_finding or (None, None)
+            results = [[match]] if match and not finding_type else []
+            self.entropy_results = [[match]] if finding_type else []
+        profiling.stage('write_results')
+        self._write_results(results)
+        self._write_results(self.entropy_results, finding_type=pack.ENTROPY)
+        if self._carried_results:
+            self.result_count += len(self._carried_results)
+            self._insert_results(self._carried_results)
+        if self._state_findings is not None:
+            self.scan_state.save(self._scan_key(), search_list,
+                                 self._frontier, self._state_findings)
+        if self.store:
+            self.store.close()
+            self.store = None
+
+    def plan(self):
+        """Report what scanning the repo would cost, without scanning it
+        """
+        planner.report(
+            planner.plan([dict(name=self.repo_name)], self.cloned_repo_dir,
+                         scheduler.Costs(self.results_file_path),
+                         commit_range=self.commit_range,
+                         head_only=self.head_only),
+            os.path.dirname(self.results_file_path))
+
     def search(self, search_list):
         """Api method init repo instance and search strings
         """
-        search_list = search_list or self.search_list
-        if len(search_list) == 0:
+        search_list = search_list or self.search_list or []
+        if self.suppressions:
+            searched = self.suppressions.filter_search_list(search_list)
+            if len(searched) < len(search_list):
+                self.suppressed[suppress.PATTERN] = \
+                    len(search_list) - len(searched)
+            search_list = searched
+        if len(search_list) == 0 and not self.entropy:
             self.logger.error(
                 'You must supply at least one string to search for.')
             sys.exit(1)
 
         start = time()
-        self._clone_or_pull()
-        commits = self._get_all_commits()
-        results = self._search(search_list, commits)
-        self._write_results(results)
+        if self.clone_cache:
+            self.clone_cache.use(self.repo_path)
+        try:
+            self._scan(search_list)
+        finally:
+            if self.clone_cache:
+                self.clone_cache.release(self.repo_path)
+        profiling.stage('report')
         if self.print_result:
             utils.print_result_file(self.results_file_path)
         if self.remove_cloned_dir:
@@ -249,10 +797,20 @@ class Repo(object):
             utils.print_errors_summary(self.error_summary)
         self.logger.info('Found {0} results in {1} commits.'.format(
             self.result_count, self.commits))
+        if self.suppressed:
+            self.logger.info(suppress.summary(self.suppressed))
+        if self.first_finding:
+            self.logger.warn('First finding in {0}: {1}'.format(
+                self.repo_name, self.first_finding[0]))
         self.logger.debug('Total time: {0} seconds'.format(total_time))
+        pager_log = self.results_file_path
+        if self.report_delta:
+            # Only page on the findings which are new since the last run.
+            pager_log = delta.update(self.results_file_path,
+                                     scanned_repos=[self.repo_name])
         if 'pagerduty' in self.pager:
             handler.pagerduty_trigger(config_file=self.config_file,
-                                      log=self.results_file_path)
+                                      log=pager_log)
 
 
 def search(
@@ -268,11 +826,30 @@ def search(
         consolidate_log=False,
         from_organization=False,
         remove_cloned_dir=False,
+        commit_range=None,
+        engine='grep',
+        introduced=False,
+        entropy=False,
+        shared_store=False,
+        head_only=False,
+        results_table=None,
+        clone_budget=None,
+        clone_cache=None,
+        suppressions=None,
+        first_match=False,
+        stop=None,
+        use_index=False,
+        rescan=False,
+        plan=False,
         **kwargs):
     """Api method init repo instance and search strings
     """
 
     utils.check_if_executable_exists_else_exit('git')
+    # Organizations compare all their repositories at the end of the run
+    # and a commit range or HEAD don't hold all the findings of the repo.
+    report_delta = not from_organization and not commit_range and \
+        not head_only and not first_match
     source = handler.plugins_handle(config_file=config_file,
                                     plugins_list=source)
 
@@ -285,7 +862,23 @@ def search(
         repo = Repo.init_with_config_file(pager=pager,
                                           verbose=verbose,
                                           config_file=config_file,
-                                          print_result=print_result)
+                                          print_result=print_result,
+                                          commit_range=commit_range,
+                                          engine=engine,
+                                          introduced=introduced,
+                                          entropy=entropy,
+                                          shared_store=shared_store,
+                                          report_delta=report_delta,
+                                          head_only=head_only,
+                                          results_table=results_table,
+                                          clone_budget=clone_budget,
+                                          clone_cache=clone_cache,
+                                          suppressions=suppressions,
+                                          first_match=first_match,
+                                          stop=stop,
+                                          use_index=use_index,
+                                          rescan=rescan,
+                                          consolidate_log=plan)
     else:
         if not from_organization:
             search_list = handler.merge_all_search_list(
@@ -299,7 +892,34 @@ def search(
             search_list=search_list,
             print_result=print_result,
             cloned_repo_dir=cloned_repo_dir,
-            consolidate_log=consolidate_log,
-            remove_cloned_dir=remove_cloned_dir)
+            # Planning leaves the last results file in place.
+            consolidate_log=consolidate_log or plan,
+            remove_cloned_dir=remove_cloned_dir,
+            commit_range=commit_range,
+            engine=engine,
+            introduced=introduced,
+            entropy=entropy,
+            shared_store=shared_store,
+            report_delta=report_delta,
+            head_only=head_only,
+            results_table=results_table,
+            clone_budget=clone_budget,
+            clone_cache=clone_cache,
+            suppressions=suppressions,
+            first_match=first_match,
+            stop=stop,
+            use_index=use_index,
+            rescan=rescan)
 
-    repo.search(search_list=search_list)
+    if plan:
+        repo.plan()
+        return repo
+    try:
+        repo.search(search_list=search_list)
+    except subprocess.CalledProcessError:
+        if from_organization:
+            raise
+        sys.exit(1)
+    if repo.first_finding and not from_organization:
+        sys.exit(constants.FIRST_MATCH_EXIT_CODE)
+    return repo
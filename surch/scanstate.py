@@ -0,0 +1,188 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import re
+import json
+import hashlib
+import subprocess
+
+from . import delta, findings, constants
+
+# The scan state of a repository records what its last full history scan
+# looked for and where it stopped: the search list, the commits its refs
+# pointed to (the frontier) and its results. The search list may hold
+# secrets (e.g. from Vault), so only the sha1 of each string is stored,
+# and the state is only readable by its owner. The next scan then only
+# searches the commits which aren't reachable from the frontier for the
+# whole search list, and the whole history for the strings added since.
+# The results of the last scan are carried forward, except the ones of
+# commits which are no longer reachable and, when strings were removed,
+# the ones whose blob no longer matches the search list.
+#
+# States are kept per owner, as repositories of different owners may
+# have the same name.
+#
+# The state only holds for the same kind of scan, so it records a key of
+# the options which change the results (see `key`).
+#
+# The results are kept as the compact records of `surch.findings`, and
+# stored as a table of their commits and, per finding, the index of its
+# commit, its path, blob sha and type. Fingerprints and the rest of the
+# rows are derived from these when the results are carried forward.
+
+
+def key(entropy=False, suppressions=None):
+    """Return the key of the options of a scan which change its results
+    besides the search list
+    """
+    suppressions_digest = None
+    if suppressions:
+        with open(suppressions) as f:
+            suppressions_digest = hashlib.sha1(f.read()).hexdigest()
+    return hashlib.sha1(json.dumps(
+        [bool(entropy), suppressions_digest])).hexdigest()
+
+
+def digest(pattern):
+    """Return the sha1 a string of the search list is stored as
+    """
+    if isinstance(pattern, unicode):
+        pattern = pattern.encode('utf-8')
+    return hashlib.sha1(pattern).hexdigest()
+
+
+def changes(previous_digests, search_list):
+    """Return the strings added to the search list, and the digests of
+    the ones removed from it
+    """
+    previous = set(previous_digests)
+    current = set(digest(pattern) for pattern in search_list)
+    return ([pattern for pattern in search_list
+             if digest(pattern) not in previous],
+            [pattern_digest for pattern_digest in previous_digests
+             if pattern_digest not in current])
+
+
+def frontier(repo_path):
+    """Return the commits the refs of a repository point to
+    """
+    refs = subprocess.check_output(
+        "git -C {0} for-each-ref --format='%(objectname)'".format(repo_path),
+        shell=True)
+    return sorted(set(refs.split()))
+
+
+def reachable(repo_path, commits):
+    """Return the commits reachable from commits, or None if one of them
+    is missing (e.g. after a force push and gc)
+    """
+    if not commits:
+        return set()
+    with open(os.devnull, 'w') as devnull:
+        # Repositories may have many refs, pass them on stdin.
+        proc = subprocess.Popen(
+            'git -C {0} rev-list --stdin'.format(repo_path),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=devnull,
+            shell=True)
+        output, _ = proc.communicate('\n'.join(commits) + '\n')
+    if proc.returncode:
+        return None
+    return set(output.split())
+
+
+def dump_findings(collections):
+    """Return the commits and findings of `Findings` collections in the
+    form they are stored in the state
+    """
+    commits = []
+    indexes = {}
+    stored = []
+    for collection in collections:
+        for finding in collection:
+            index = indexes.get(finding.commit)
+            if index is None:
+                index = indexes[finding.commit] = len(commits)
+                commits.append(finding.commit)
+            stored.append((index, finding.filepath, finding.blob_sha,
+                           finding.finding_type))
+    return commits, stored
+
+
+def load_findings(state, organization, repo_name):
+    """Return the findings stored in a state as `Findings`
+    """
+    loaded = findings.Findings(organization, repo_name)
+    commits = [loaded.commit(*commit) for commit in state['commits']]
+    for index, filepath, blob_sha, finding_type in state['findings']:
+        loaded.add(commits[index], filepath, blob_sha, delta.fingerprint(
+            organization, repo_name, filepath, blob_sha, finding_type),
+            finding_type)
+    return loaded
+
+
+class ScanState(object):
+    def __init__(self, results_file_path, organization, repo_name):
+        """The scan state of a repository, next to its results file
+
+        :param results_file_path: path to the results file (string)
+        :param organization: owner of the repository, the last part of
+                        which names its directory of states (string)
+        :param repo_name: name of the repository (string)
+        """
+        owner = re.split('[/:]', organization.rstrip('/'))[-1] or '_'
+        self.path = os.path.join(os.path.dirname(results_file_path),
+                                 constants.SCAN_STATE_DIR, owner,
+                                 repo_name + '.json')
+
+    def load(self, scan_key):
+        """Return the state of the last scan, None if there is none with
+        this key
+        """
+        try:
+            with open(self.path) as state_file:
+                state = json.load(state_file)
+        except (IOError, ValueError):
+            return None
+        # States of older versions held rows instead of findings, and
+        # the search list instead of its digests.
+        if state.get('key') != scan_key or 'findings' not in state or \
+                'search_list_digests' not in state:
+            return None
+        return state
+
+    def save(self, scan_key, search_list, scanned_frontier, collections):
+        """Record the state of a scan
+
+        :param collections: the findings of the scan (list of Findings)
+        """
+        dirname = os.path.dirname(self.path)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        commits, stored = dump_findings(collections)
+        temp_path = self.path + '.tmp'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        state_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL,
+                           0o600)
+        with os.fdopen(state_fd, 'w') as state_file:
+            json.dump(dict(key=scan_key,
+                           search_list_digests=[
+                               digest(pattern) for pattern in search_list],
+                           frontier=scanned_frontier,
+                           commits=commits,
+                           findings=stored),
+                      state_file, sort_keys=True)
+        os.rename(temp_path, self.path)
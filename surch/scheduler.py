@@ -0,0 +1,145 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import sys
+import json
+import functools
+from multiprocessing.pool import ThreadPool
+
+from . import utils, constants
+
+# Repositories of an organization are scanned longest processing time
+# first: when the largest repository starts last, the whole run waits on
+# it alone once all other workers are idle.
+#
+# The time it takes to scan a repository is estimated with the time its
+# last scan took, recorded in a costs file next to the results file.
+# Repositories which were never scanned are estimated from the size the
+# GitHub API reports (in KB), at the average rate of the repositories
+# which were.
+
+
+class Costs(object):
+    def __init__(self, results_file_path):
+        """The recorded scan costs of the repositories of a results file
+
+        :param results_file_path: path to the results file (string)
+        """
+        self.path = os.path.join(os.path.dirname(results_file_path),
+                                 constants.REPO_COSTS_FILE)
+        self.costs = {}
+        if os.path.isfile(self.path):
+            with open(self.path) as costs_file:
+                self.costs = json.load(costs_file)
+
+    def _seconds_per_kb(self):
+        sizes = seconds = 0
+        for cost in self.costs.values():
+            if cost.get('size'):
+                sizes += cost['size']
+                seconds += cost['seconds']
+        return float(seconds) / sizes if sizes else 1.0
+
+    def estimate(self, repos):
+        """Return the estimated seconds to scan every repository
+
+        :param repos: dicts with the name and size of each repository
+                      (list)
+        """
+        rate = self._seconds_per_kb()
+        estimates = {}
+        for repo_data in repos:
+            name = repo_data['name']
+            size = repo_data.get('size') or 0
+            cost = self.costs.get(name)
+            if not cost:
+                estimates[name] = size * rate
+            elif cost.get('size') and size > cost['size']:
+                # Scale the last scan time with the repository's growth.
+                estimates[name] = cost['seconds'] * size / float(cost['size'])
+            else:
+                estimates[name] = cost['seconds']
+        return estimates
+
+    def record(self, repo_name, seconds, size=None, pushed_at=None,
+               commits=None, backend=None, head=None, scan_key=None):
+        self.costs[repo_name] = dict(
+            seconds=round(seconds, 3),
+            size=size,
+            pushed_at=pushed_at,
+            commits=commits,
+            backend=backend,
+            head=head,
+            scan_key=scan_key)
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as costs_file:
+            json.dump(self.costs, costs_file, indent=4, sort_keys=True)
+        os.rename(temp_path, self.path)
+
+
+class _WorkerExit(Exception):
+    def __init__(self, code):
+        super(_WorkerExit, self).__init__(code)
+        self.code = code
+
+
+def _exit_in_main_thread(scan, item):
+    try:
+        return scan(item)
+    except SystemExit as error:
+        # Exiting a worker thread would leave the pool waiting for it.
+        raise _WorkerExit(error.code)
+
+
+def run(scan, items, workers=1):
+    """Yield the result of `scan` for every item as soon as it is
+    done, scanning `workers` items at once
+
+    A single worker scans in the main thread, which --profile follows.
+    """
+    if workers <= 1:
+        for item in items:
+            yield scan(item)
+        return
+    pool = ThreadPool(workers)
+    try:
+        for result in pool.imap_unordered(
+                functools.partial(_exit_in_main_thread, scan), items):
+            yield result
+    except _WorkerExit as error:
+        sys.exit(error.code)
+    finally:
+        pool.terminate()
+
+
+def largest_first(repos, estimates):
+    """Return the repositories ordered by decreasing estimated cost
+    """
+    return sorted(repos, key=lambda repo_data: estimates[repo_data['name']],
+                  reverse=True)
+
+
+def report(costs, repo_names, wall_time, workers):
+    """Log how long the scan of the repositories took
+    """
+    total = sum(costs.costs[name]['seconds'] for name in repo_names
+                if name in costs.costs)
+    utils.logger.info(
+        'Scanned {0} repositories in {1:.1f}s with {2} worker(s), '
+        '{3:.1f}s of scanning in total. Costs written to {4}'.format(
+            len(repo_names), wall_time, workers, total, costs.path))
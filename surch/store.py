@@ -0,0 +1,137 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import sys
+import subprocess
+
+from . import utils, constants
+
+# The shared store is a bare repository next to the clones. The objects
+# of every repository are fetched into it under `refs/surch/<repo>/`
+# before the repository is cloned with `--reference` to it, so objects
+# common to forks and mirrors are downloaded and stored once.
+#
+# Clones only keep the objects they don't find in the store, so the
+# store must never lose an object a clone's refs still reach (e.g. after
+# a force push upstream). `gc` first fetches the refs of every clone into
+# the store, under `refs/surch/<repo>/clone/`, and drops the refs of
+# repositories which are no longer cloned.
+
+REFS_NAMESPACE = 'refs/surch'
+
+
+class SharedStore(object):
+    def __init__(self, cloned_repos_dir, verbose=False):
+        """A reference object store shared by the clones of a directory
+
+        :param cloned_repos_dir: directory containing the clones (string)
+        :param verbose: log level (boolean)
+        """
+        self.logger = utils.logger
+        self.cloned_repos_dir = cloned_repos_dir
+        self.path = os.path.join(cloned_repos_dir, constants.SHARED_STORE_DIR)
+        self.objects_dir = os.path.realpath(os.path.join(self.path, 'objects'))
+        self.quiet_git = '--quiet' if not verbose else ''
+
+    def _git(self, command):
+        return subprocess.check_output(
+            'git -C {0} {1}'.format(self.path, command), shell=True)
+
+    def exists(self):
+        return os.path.isdir(self.objects_dir)
+
+    def ensure(self):
+        if not self.exists():
+            self.logger.info('Creating shared object store at {0}...'.format(
+                self.path))
+            subprocess.check_output(
+                'git init --bare --quiet {0}'.format(self.path), shell=True)
+
+    def fetch(self, repo_name, repo_url):
+        """Fetch the branches and tags of a repository into the store
+        """
+        self.logger.info('Fetching {0} into the shared object store...'.format(
+            repo_name))
+        self._git(
+            'fetch {0} --no-tags -- {1} '
+            '+refs/heads/*:{2}/{3}/heads/* '
+            '+refs/tags/*:{2}/{3}/tags/*'.format(
+                self.quiet_git, repo_url, REFS_NAMESPACE, repo_name))
+
+    def clones(self):
+        """Return the name and path of the clones which borrow objects
+        from the store
+        """
+        clones = []
+        for name in sorted(os.listdir(self.cloned_repos_dir)):
+            alternates = os.path.join(self.cloned_repos_dir, name, '.git',
+                                      'objects', 'info', 'alternates')
+            if not os.path.isfile(alternates):
+                continue
+            objects_dir = os.path.dirname(os.path.dirname(alternates))
+            with open(alternates) as f:
+                if any(os.path.realpath(os.path.join(objects_dir, line)) ==
+                       self.objects_dir for line in f.read().splitlines()):
+                    clones.append((name, os.path.join(
+                        self.cloned_repos_dir, name)))
+        return clones
+
+    def _namespaces(self):
+        refs = self._git(
+            "for-each-ref --format='%(refname)' {0}".format(REFS_NAMESPACE))
+        return set(ref.split('/')[2] for ref in refs.splitlines())
+
+    def gc(self, prune=constants.SHARED_STORE_PRUNE):
+        """Repack the store and prune the objects no clone can reach
+
+        :param prune: prune loose unreachable objects older than this
+                      date, which protects objects fetched by runs in
+                      progress (string)
+        """
+        clones = self.clones()
+        cloned = set(name for name, _ in clones)
+        for namespace in sorted(self._namespaces() - cloned):
+            self.logger.info('Dropping refs of {0}, which is no longer '
+                             'cloned...'.format(namespace))
+            refs = self._git("for-each-ref --format='%(refname)' {0}/{1}/"
+                             .format(REFS_NAMESPACE, namespace))
+            for ref in refs.splitlines():
+                self._git('update-ref -d {0}'.format(ref))
+        for name, path in clones:
+            self.logger.debug('Keeping the objects of {0}...'.format(name))
+            self._git('fetch {0} --no-tags {1} '
+                      '+refs/*:{2}/{3}/clone/*'.format(
+                          self.quiet_git, path, REFS_NAMESPACE, name))
+        self.logger.info('Repacking the shared object store...')
+        self._git('gc {0} --prune={1}'.format(self.quiet_git, prune))
+
+
+def gc(cloned_repos_dir, prune=constants.SHARED_STORE_PRUNE, verbose=False):
+    """Api method repack and prune the shared object store of a clones
+    directory
+    """
+    utils.check_if_executable_exists_else_exit('git')
+    shared_store = SharedStore(cloned_repos_dir, verbose=verbose)
+    if not shared_store.exists():
+        utils.logger.error('No shared object store found in {0}'.format(
+            cloned_repos_dir))
+        sys.exit(1)
+    try:
+        shared_store.gc(prune=prune)
+    except subprocess.CalledProcessError as error:
+        utils.logger.error('Failed to repack the shared object store: '
+                           '{0}'.format(error))
+        sys.exit(1)
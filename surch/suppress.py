@@ -0,0 +1,137 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import re
+import sys
+import fnmatch
+import threading
+from collections import Counter
+
+import yaml
+
+from . import utils
+
+# Known false positives (e.g. test fixtures and example configs) are
+# listed in a suppression file:
+#
+#   blob_shas: [<sha of a blob>]
+#   paths: ['tests/fixtures/*', '*.example']
+#   patterns: [EXAMPLEKEY]
+#   fingerprints: [<fingerprint of a finding>]
+#
+# Blob shas and fingerprints are looked up in sets and path globs are
+# compiled into a single regular expression, so checking a finding costs
+# the same however long the file is. Findings are checked by path before
+# their blob is looked up and by blob before the details of their commit
+# are, so suppressed findings cost neither. Patterns are removed from the
+# search list, since matches don't tell which pattern they matched, so
+# they are counted as the number of patterns left out of the search list
+# rather than of findings.
+
+BLOB_SHA = 'blob_sha'
+PATH = 'path'
+PATTERN = 'pattern'
+FINGERPRINT = 'fingerprint'
+
+# The suppression file and the index it was last loaded into.
+_last_loaded = None, None
+_lock = threading.Lock()
+
+
+class SuppressionIndex(object):
+    def __init__(self, blob_shas=None, paths=None, patterns=None,
+                 fingerprints=None):
+        """Known false positives to leave out of the results
+
+        :param blob_shas: shas of blobs (list)
+        :param paths: globs of file paths, `*` matches `/` (list)
+        :param patterns: search strings (list)
+        :param fingerprints: fingerprints of findings (list)
+        """
+        self.blob_shas = frozenset(blob_shas or [])
+        self.fingerprints = frozenset(fingerprints or [])
+        self.patterns = frozenset(patterns or [])
+        self.paths = re.compile('|'.join(
+            fnmatch.translate(path) for path in paths)) if paths else None
+
+    def filter_search_list(self, search_list):
+        """Return the search list without the suppressed patterns
+        """
+        return [string for string in search_list
+                if string not in self.patterns]
+
+    def path(self, filepath):
+        return self.paths is not None and \
+            self.paths.match(filepath) is not None
+
+    def blob(self, blob_sha, fingerprint):
+        """Return why a finding of a blob is suppressed, if it is
+        """
+        if blob_sha in self.blob_shas:
+            return BLOB_SHA
+        if fingerprint in self.fingerprints:
+            return FINGERPRINT
+        return None
+
+
+def load(suppressions_file):
+    """Return the index of a suppression file
+
+    Every repository of a run uses the same file, so the index it was
+    last loaded into is kept until the file changes.
+    """
+    global _last_loaded
+    try:
+        key = suppressions_file, os.path.getmtime(suppressions_file)
+    except OSError:
+        utils.logger.error('Suppression file {0} not found'.format(
+            suppressions_file))
+        sys.exit(1)
+    with _lock:
+        last_key, last_index = _last_loaded
+        if key == last_key:
+            return last_index
+        with open(suppressions_file) as f:
+            suppressions = yaml.safe_load(f) or {}
+        index = SuppressionIndex(
+            blob_shas=suppressions.get('blob_shas'),
+            paths=suppressions.get('paths'),
+            patterns=suppressions.get('patterns'),
+            fingerprints=suppressions.get('fingerprints'))
+        _last_loaded = key, index
+        return index
+
+
+def add(total, counts):
+    """Add the suppressions of a repository to those of a run. Every
+    repository leaves the same patterns out of the search list, so they
+    aren't added up.
+    """
+    for reason, count in counts.items():
+        if reason == PATTERN:
+            total[reason] = max(total[reason], count)
+        else:
+            total[reason] += count
+
+
+def summary(counts):
+    """Return a line describing suppressed findings counted by reason
+    """
+    counts = Counter(counts)
+    return 'Suppressed {0} known false positives ({1}).'.format(
+        sum(counts.values()), ', '.join(
+            '{0} by {1}'.format(count, reason)
+            for reason, count in sorted(counts.items())))
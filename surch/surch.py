@@ -15,7 +15,18 @@
 
 import click
 
-from . import repo, organization, constants
+from . import repo, batch, store, webhook, profiling, workqueue, constants
+from . import trigram, clonecache, organization
+
+
+def _size(ctx, param, value):
+    if value is None:
+        return None
+    try:
+        return clonecache.parse_size(value)
+    except ValueError:
+        raise click.BadParameter('{0} is not a size, e.g. 500M or '
+                                 '20G'.format(value))
 
 
 @click.group()
@@ -44,24 +55,90 @@ def main():
               help='pager plugins(pagerduty).')
 @click.option('--source', multiple=True, default=[],
               help='source plugins(Vault).')
+@click.option('--range', 'commit_range', default=None,
+              help='Only search the commits in this range '
+                   '(e.g. `before..after`).')
+@click.option('--engine', default='grep',
+              type=click.Choice(constants.ENGINES),
+              help='Search with git grep, by reading the git object '
+                   'store natively, or with auto, which times every '
+                   'backend (grep, grep-pcre, native-regex, '
+                   'native-literal) on the HEAD of each repository and '
+                   'uses the fastest. The selected backend is recorded '
+                   'in costs.json. [defaults to grep]')
+@click.option('--introduced', default=False, is_flag=True,
+              help='Only report the commit which introduced each matching '
+                   'line, by searching the lines added by each commit.')
+@click.option('--entropy', default=False, is_flag=True,
+              help='Also report files containing high entropy strings '
+                   '(e.g. keys and tokens). Requires NumPy.')
+@click.option('--head-only', default=False, is_flag=True,
+              help='Only scan the files of the current HEAD instead of '
+                   'every commit.')
+@click.option('--first-match', default=False, is_flag=True,
+              help='Stop at the first finding, report only it and exit '
+                   'with status {0}.'.format(
+                       constants.FIRST_MATCH_EXIT_CODE))
+@click.option('--use-index', default=False, is_flag=True,
+              help='Only read and match the blobs the trigram index of '
+                   'each clone finds (see `surch index`), with the native '
+                   'engine. The index is updated first.')
+@click.option('--shared-store', default=False, is_flag=True,
+              help='Store the objects common to the cloned repositories '
+                   '(e.g. forks) once, in a shared reference store.')
+@click.option('--clone-budget', default=None, callback=_size,
+              help='Disk space the cloned repositories may take (e.g. '
+                   '20G). The least recently scanned ones are removed '
+                   'beyond it.')
+@click.option('--suppressions', default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help='A file of known false positives (blob shas, path '
+                   'globs, patterns or fingerprints) to leave out of '
+                   'the results.')
+@click.option('--rescan', default=False, is_flag=True,
+              help='Search the whole history for every string, instead '
+                   'of only the commits and strings new since the last '
+                   'scan.')
+@click.option('--profile', default=False, is_flag=True,
+              help='Profile CPU and memory use per stage of the run and '
+                   'write the reports to the results directory.')
+@click.option('--plan', default=False, is_flag=True,
+              help='Report the commits, blobs and bytes the repository '
+                   'would scan and the estimated time instead of '
+                   'searching.')
 @click.option('--print-result', default=False, is_flag=True)
 @click.option('-v', '--verbose', default=False, is_flag=True)
 def surch_repo(repo_url, config_file, string, print_result, pager, remove,
-               source, cloned_repo_dir, log, verbose):
+               source, cloned_repo_dir, log, commit_range, engine, introduced,
+               entropy, head_only, first_match, use_index, shared_store,
+               clone_budget, suppressions, rescan, profile, plan, verbose):
     """Search a single repository
     """
 
-    repo.search(
-        pager=pager,
-        source=source,
-        results_dir=log,
-        verbose=verbose,
-        repo_url=repo_url,
-        config_file=config_file,
-        search_list=list(string),
-        remove_cloned_dir=remove,
-        print_result=print_result,
-        cloned_repo_dir=cloned_repo_dir)
+    with profiling.profile(log, enabled=profile):
+        repo.search(
+            pager=pager,
+            source=source,
+            results_dir=log,
+            verbose=verbose,
+            repo_url=repo_url,
+            config_file=config_file,
+            search_list=list(string),
+            remove_cloned_dir=remove,
+            print_result=print_result,
+            commit_range=commit_range,
+            engine=engine,
+            introduced=introduced,
+            entropy=entropy,
+            head_only=head_only,
+            shared_store=shared_store,
+            clone_budget=clone_budget,
+            suppressions=suppressions,
+            first_match=first_match,
+            use_index=use_index,
+            rescan=rescan,
+            plan=plan,
+            cloned_repo_dir=cloned_repo_dir)
 
 
 @main.command(name='org')
@@ -82,6 +159,12 @@ def surch_repo(repo_url, config_file, string, print_result, pager, remove,
               help='Git user name for authenticate.')
 @click.option('-P', '--password', default=None, required=False,
               help='Git user password for authenticate')
+@click.option('-T', '--token', multiple=True,
+              help='GitHub API token. API requests are spread over all '
+                   'tokens. This can be passed multiple times.')
+@click.option('--api-url', default=None,
+              help='GitHub API url. '
+              '[defaults to {0}]'.format(constants.GITHUB_API_URL))
 @click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
               help='Directory to contain all cloned repositories. '
               '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
@@ -95,29 +178,115 @@ def surch_repo(repo_url, config_file, string, print_result, pager, remove,
               help='pager plugins(pagerduty).')
 @click.option('--source', multiple=True, default=[],
               help='source plugins(Vault).')
+@click.option('--engine', default='grep',
+              type=click.Choice(constants.ENGINES),
+              help='Search with git grep, by reading the git object '
+                   'store natively, or with auto, which times every '
+                   'backend (grep, grep-pcre, native-regex, '
+                   'native-literal) on the HEAD of each repository and '
+                   'uses the fastest. The selected backend is recorded '
+                   'in costs.json. [defaults to grep]')
+@click.option('--introduced', default=False, is_flag=True,
+              help='Only report the commit which introduced each matching '
+                   'line, by searching the lines added by each commit.')
+@click.option('--entropy', default=False, is_flag=True,
+              help='Also report files containing high entropy strings '
+                   '(e.g. keys and tokens). Requires NumPy.')
+@click.option('--head-only', default=False, is_flag=True,
+              help='Only scan the files of the current HEAD instead of '
+                   'every commit.')
+@click.option('--first-match', default=False, is_flag=True,
+              help='Stop at the first finding, report only it and exit '
+                   'with status {0}.'.format(
+                       constants.FIRST_MATCH_EXIT_CODE))
+@click.option('--use-index', default=False, is_flag=True,
+              help='Only read and match the blobs the trigram index of '
+                   'each clone finds (see `surch index`), with the native '
+                   'engine. The index is updated first.')
+@click.option('--shared-store', default=False, is_flag=True,
+              help='Store the objects common to the cloned repositories '
+                   '(e.g. forks) once, in a shared reference store.')
+@click.option('--clone-budget', default=None, callback=_size,
+              help='Disk space the cloned repositories may take (e.g. '
+                   '20G). The least recently scanned ones are removed '
+                   'beyond it.')
+@click.option('--suppressions', default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help='A file of known false positives (blob shas, path '
+                   'globs, patterns or fingerprints) to leave out of '
+                   'the results.')
+@click.option('--resume', default=False, is_flag=True,
+              help='Resume an interrupted run: skip the repositories it '
+                   'already scanned and add to its results.')
+@click.option('--rescan', default=False, is_flag=True,
+              help='Scan every repository and its whole history for every '
+                   'string, instead of reusing the results of the last '
+                   'scan for unchanged repositories, commits and '
+                   'strings.')
+@click.option('-w', '--workers', default=1, type=int,
+              help='Number of repositories to scan at once, largest '
+                   'first. [defaults to 1]')
+@click.option('--cache-ttl', default=constants.GITHUB_CACHE_TTL, type=int,
+              help='Seconds during which cached GitHub API responses are '
+                   'used without asking GitHub whether they changed. '
+                   '[defaults to {0}]'.format(constants.GITHUB_CACHE_TTL))
+@click.option('--offline', default=False, is_flag=True,
+              help='Only use cached GitHub API responses.')
+@click.option('--profile', default=False, is_flag=True,
+              help='Profile CPU and memory use per stage of the run and '
+                   'write the reports to the results directory.')
+@click.option('--plan', default=False, is_flag=True,
+              help='Report the commits, blobs and bytes each repository '
+                   'would scan and the estimated time instead of '
+                   'searching. With --queue-dir, also write a work unit '
+                   'per repository for `surch worker`.')
+@click.option('--queue-dir', default=None,
+              help='Shared work queue directory for distributed runs.')
 @click.option('--print-result', default=False, is_flag=True)
 @click.option('-v', '--verbose', default=False, is_flag=True)
 def surch_org(organization_name, config_file, string, include_repo, pager,
-              exclude_repo, user, print_result, remove, password, source,
-              cloned_repos_path, log, verbose):
+              exclude_repo, user, print_result, remove, password, token,
+              api_url, source, cloned_repos_path, log, engine, introduced,
+              entropy, head_only, first_match, use_index, shared_store,
+              clone_budget, suppressions, resume, rescan, workers, cache_ttl,
+              offline, profile, plan, queue_dir, verbose):
     """Search all or some repositories in an organization
     """
 
-    organization.search(
-        pager=pager,
-        source=source,
-        git_user=user,
-        results_dir=log,
-        verbose=verbose,
-        repos_to_skip=exclude_repo,
-        repos_to_check=include_repo,
-        git_password=password,
-        config_file=config_file,
-        remove_cloned_dir=remove,
-        search_list=list(string),
-        print_result=print_result,
-        organization=organization_name,
-        cloned_repos_dir=cloned_repos_path)
+    with profiling.profile(log, enabled=profile):
+        organization.search(
+            pager=pager,
+            source=source,
+            git_user=user,
+            results_dir=log,
+            verbose=verbose,
+            repos_to_skip=exclude_repo,
+            repos_to_check=include_repo,
+            git_password=password,
+            github_tokens=token,
+            github_api_url=api_url,
+            config_file=config_file,
+            remove_cloned_dir=remove,
+            search_list=list(string),
+            print_result=print_result,
+            organization=organization_name,
+            engine=engine,
+            introduced=introduced,
+            entropy=entropy,
+            shared_store=shared_store,
+            resume=resume,
+            rescan=rescan,
+            workers=workers,
+            cache_ttl=cache_ttl,
+            offline=offline,
+            head_only=head_only,
+            clone_budget=clone_budget,
+            suppressions=suppressions,
+            first_match=first_match,
+            use_index=use_index,
+            plan=plan,
+            queue_dir=queue_dir,
+            cloned_repos_dir=cloned_repos_path)
 
 
 @main.command(name='user')
@@ -138,6 +307,12 @@ def surch_org(organization_name, config_file, string, include_repo, pager,
               help='Git user name for authenticate.')
 @click.option('-P', '--password', default=None, required=False,
               help='Git user password for authenticate')
+@click.option('-T', '--token', multiple=True,
+              help='GitHub API token. API requests are spread over all '
+                   'tokens. This can be passed multiple times.')
+@click.option('--api-url', default=None,
+              help='GitHub API url. '
+              '[defaults to {0}]'.format(constants.GITHUB_API_URL))
 @click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
               help='Directory to contain all cloned repositories. '
               '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
@@ -151,28 +326,299 @@ def surch_org(organization_name, config_file, string, include_repo, pager,
               help='pager plugins(pagerduty).')
 @click.option('--source', multiple=True, default=[],
               help='source plugins(Vault).')
+@click.option('--engine', default='grep',
+              type=click.Choice(constants.ENGINES),
+              help='Search with git grep, by reading the git object '
+                   'store natively, or with auto, which times every '
+                   'backend (grep, grep-pcre, native-regex, '
+                   'native-literal) on the HEAD of each repository and '
+                   'uses the fastest. The selected backend is recorded '
+                   'in costs.json. [defaults to grep]')
+@click.option('--introduced', default=False, is_flag=True,
+              help='Only report the commit which introduced each matching '
+                   'line, by searching the lines added by each commit.')
+@click.option('--entropy', default=False, is_flag=True,
+              help='Also report files containing high entropy strings '
+                   '(e.g. keys and tokens). Requires NumPy.')
+@click.option('--head-only', default=False, is_flag=True,
+              help='Only scan the files of the current HEAD instead of '
+                   'every commit.')
+@click.option('--first-match', default=False, is_flag=True,
+              help='Stop at the first finding, report only it and exit '
+                   'with status {0}.'.format(
+                       constants.FIRST_MATCH_EXIT_CODE))
+@click.option('--use-index', default=False, is_flag=True,
+              help='Only read and match the blobs the trigram index of '
+                   'each clone finds (see `surch index`), with the native '
+                   'engine. The index is updated first.')
+@click.option('--shared-store', default=False, is_flag=True,
+              help='Store the objects common to the cloned repositories '
+                   '(e.g. forks) once, in a shared reference store.')
+@click.option('--clone-budget', default=None, callback=_size,
+              help='Disk space the cloned repositories may take (e.g. '
+                   '20G). The least recently scanned ones are removed '
+                   'beyond it.')
+@click.option('--suppressions', default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help='A file of known false positives (blob shas, path '
+                   'globs, patterns or fingerprints) to leave out of '
+                   'the results.')
+@click.option('--resume', default=False, is_flag=True,
+              help='Resume an interrupted run: skip the repositories it '
+                   'already scanned and add to its results.')
+@click.option('--rescan', default=False, is_flag=True,
+              help='Scan every repository and its whole history for every '
+                   'string, instead of reusing the results of the last '
+                   'scan for unchanged repositories, commits and '
+                   'strings.')
+@click.option('-w', '--workers', default=1, type=int,
+              help='Number of repositories to scan at once, largest '
+                   'first. [defaults to 1]')
+@click.option('--cache-ttl', default=constants.GITHUB_CACHE_TTL, type=int,
+              help='Seconds during which cached GitHub API responses are '
+                   'used without asking GitHub whether they changed. '
+                   '[defaults to {0}]'.format(constants.GITHUB_CACHE_TTL))
+@click.option('--offline', default=False, is_flag=True,
+              help='Only use cached GitHub API responses.')
+@click.option('--profile', default=False, is_flag=True,
+              help='Profile CPU and memory use per stage of the run and '
+                   'write the reports to the results directory.')
+@click.option('--plan', default=False, is_flag=True,
+              help='Report the commits, blobs and bytes each repository '
+                   'would scan and the estimated time instead of '
+                   'searching. With --queue-dir, also write a work unit '
+                   'per repository for `surch worker`.')
+@click.option('--queue-dir', default=None,
+              help='Shared work queue directory for distributed runs.')
 @click.option('--print-result', default=False, is_flag=True)
 @click.option('-v', '--verbose', default=False, is_flag=True)
 def surch_user(organization_name, config_file, string, include_repo, pager,
-               exclude_repo, user, remove, password, cloned_repos_path, log,
-               print_result, source, verbose):
+               exclude_repo, user, remove, password, token, api_url,
+               cloned_repos_path, log, print_result, source, engine,
+               introduced, entropy, head_only, first_match, use_index,
+               shared_store, clone_budget, suppressions, resume, rescan,
+               workers, cache_ttl, offline, profile, plan, queue_dir,
+               verbose):
 
     """Search all or some repositories for a user
     """
 
-    organization.search(
+    with profiling.profile(log, enabled=profile):
+        organization.search(
+            pager=pager,
+            source=source,
+            git_user=user,
+            results_dir=log,
+            verbose=verbose,
+            repos_to_skip=exclude_repo,
+            repos_to_check=include_repo,
+            is_organization=False,
+            git_password=password,
+            github_tokens=token,
+            github_api_url=api_url,
+            config_file=config_file,
+            remove_cloned_dir=remove,
+            search_list=list(string),
+            print_result=print_result,
+            organization=organization_name,
+            engine=engine,
+            introduced=introduced,
+            entropy=entropy,
+            shared_store=shared_store,
+            resume=resume,
+            rescan=rescan,
+            workers=workers,
+            cache_ttl=cache_ttl,
+            offline=offline,
+            head_only=head_only,
+            clone_budget=clone_budget,
+            suppressions=suppressions,
+            first_match=first_match,
+            use_index=use_index,
+            plan=plan,
+            queue_dir=queue_dir,
+            cloned_repos_dir=cloned_repos_path)
+
+
+@main.command(name='batch')
+@click.argument('config_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
+              help='Directory to contain all cloned repositories. '
+              '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
+@click.option('-l', '--log', default=constants.RESULTS_PATH,
+              help='All results will be logged to this directory. '
+              '[defaults to {0}]'.format(constants.RESULTS_PATH))
+@click.option('-w', '--workers', default=1, type=int,
+              help='Number of repositories to scan at once, largest '
+                   'first. [defaults to 1]')
+@click.option('--cache-ttl', default=constants.GITHUB_CACHE_TTL, type=int,
+              help='Seconds during which cached GitHub API responses are '
+                   'used without asking GitHub whether they changed. '
+                   '[defaults to {0}]'.format(constants.GITHUB_CACHE_TTL))
+@click.option('--offline', default=False, is_flag=True,
+              help='Only use cached GitHub API responses.')
+@click.option('--clone-budget', default=None, callback=_size,
+              help='Disk space the cloned repositories may take (e.g. '
+                   '20G). The least recently scanned ones are removed '
+                   'beyond it.')
+@click.option('--suppressions', default=None,
+              type=click.Path(exists=True, dir_okay=False),
+              help='A file of known false positives (blob shas, path '
+                   'globs, patterns or fingerprints) to leave out of '
+                   'the results.')
+@click.option('--profile', default=False, is_flag=True,
+              help='Profile CPU and memory use per stage of the run and '
+                   'write the reports to the results directory.')
+@click.option('-v', '--verbose', default=False, is_flag=True)
+def surch_batch(config_file, cloned_repos_path, log, workers, cache_ttl,
+                offline, clone_budget, suppressions, profile, verbose):
+    """Search the organizations, users and repositories listed in the
+    `targets` of a config file in one run
+
+    Pager plugins aren't triggered by batch runs.
+    """
+
+    with profiling.profile(log, enabled=profile):
+        batch.search(
+            config_file=config_file,
+            results_dir=log,
+            cloned_repos_dir=cloned_repos_path,
+            workers=workers,
+            cache_ttl=cache_ttl,
+            offline=offline,
+            clone_budget=clone_budget,
+            suppressions=suppressions,
+            verbose=verbose)
+
+
+@main.command(name='webhook')
+@click.option('-c', '--config-file', default=None,
+              type=click.Path(exists=False, file_okay=True),
+              help='A path to a Surch config file')
+@click.option('-s', '--string', multiple=True,
+              help='String you would like to search for. '
+                   'This can be passed multiple times.')
+@click.option('-H', '--host', default='127.0.0.1',
+              help='Address to listen on. [defaults to 127.0.0.1]')
+@click.option('--port', default=constants.WEBHOOK_PORT, type=int,
+              help='Port to listen on. '
+              '[defaults to {0}]'.format(constants.WEBHOOK_PORT))
+@click.option('--secret', default=None,
+              help='The secret configured for the GitHub webhook. '
+                   'Required unless listening on a loopback address.')
+@click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
+              help='Directory to contain all cloned repositories. '
+              '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
+@click.option('-l', '--log', default=constants.RESULTS_PATH,
+              help='All results will be logged to this directory. '
+              '[defaults to {0}]'.format(constants.RESULTS_PATH))
+@click.option('--pager', multiple=True, default=[],
+              help='pager plugins(pagerduty).')
+@click.option('--source', multiple=True, default=[],
+              help='source plugins(Vault).')
+@click.option('-v', '--verbose', default=False, is_flag=True)
+def surch_webhook(config_file, string, host, port, secret, cloned_repos_path,
+                  log, pager, source, verbose):
+    """Search the commits of GitHub push events as they arrive
+    """
+
+    webhook.receive(
+        host=host,
+        port=port,
         pager=pager,
+        secret=secret,
         source=source,
-        git_user=user,
         results_dir=log,
         verbose=verbose,
-        repos_to_skip=exclude_repo,
-        repos_to_check=include_repo,
-        is_organization=False,
-        git_password=password,
         config_file=config_file,
-        remove_cloned_dir=remove,
         search_list=list(string),
-        print_result=print_result,
-        organization=organization_name,
         cloned_repos_dir=cloned_repos_path)
+
+
+@main.command(name='gc')
+@click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
+              help='Directory containing the cloned repositories. '
+              '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
+@click.option('--prune', default=constants.SHARED_STORE_PRUNE,
+              help='Prune unreachable objects older than this date. '
+                   '[defaults to {0}]'.format(constants.SHARED_STORE_PRUNE))
+@click.option('-v', '--verbose', default=False, is_flag=True)
+def surch_gc(cloned_repos_path, prune, verbose):
+    """Repack the shared object store and prune unused objects
+    """
+
+    store.gc(
+        prune=prune,
+        verbose=verbose,
+        cloned_repos_dir=cloned_repos_path)
+
+
+@main.command(name='evict')
+@click.argument('budget', callback=_size)
+@click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
+              help='Directory containing the cloned repositories. '
+              '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
+@click.option('-v', '--verbose', default=False, is_flag=True)
+def surch_evict(budget, cloned_repos_path, verbose):
+    """Remove the least recently scanned clones until they take less
+    than BUDGET (e.g. 20G)
+    """
+
+    clonecache.evict(
+        budget=budget,
+        verbose=verbose,
+        cloned_repos_dir=cloned_repos_path)
+
+
+@main.command(name='index')
+@click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
+              help='Directory containing the cloned repositories. '
+              '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
+@click.option('-v', '--verbose', default=False, is_flag=True)
+def surch_index(cloned_repos_path, verbose):
+    """Build or update the trigram index of the blobs of every clone,
+    for `--use-index`
+    """
+
+    trigram.update(
+        verbose=verbose,
+        cloned_repos_dir=cloned_repos_path)
+
+
+@main.command(name='worker')
+@click.argument('queue_dir')
+@click.option('-p', '--cloned-repos-path', default=constants.CLONED_REPOS_PATH,
+              help='Directory to contain all cloned repositories. '
+              '[defaults to {0}]'.format(constants.CLONED_REPOS_PATH))
+@click.option('--lease-ttl', default=constants.LEASE_TTL, type=int,
+              help='Seconds after which the unit of a worker which stopped '
+                   'renewing its lease is reclaimed. '
+                   '[defaults to {0}]'.format(constants.LEASE_TTL))
+@click.option('--max-attempts', default=constants.QUEUE_MAX_ATTEMPTS,
+              type=int,
+              help='Failed attempts after which a unit is given up. '
+                   '[defaults to {0}]'.format(constants.QUEUE_MAX_ATTEMPTS))
+@click.option('-v', '--verbose', default=False, is_flag=True)
+def surch_worker(queue_dir, cloned_repos_path, lease_ttl, max_attempts,
+                 verbose):
+    """Scan the repositories of a shared work queue
+    """
+
+    workqueue.work(
+        verbose=verbose,
+        queue_dir=queue_dir,
+        lease_ttl=lease_ttl,
+        max_attempts=max_attempts,
+        cloned_repos_dir=cloned_repos_path)
+
+
+@main.command(name='merge')
+@click.argument('queue_dir')
+@click.option('-l', '--log', default=constants.RESULTS_PATH,
+              help='All results will be logged to this directory. '
+              '[defaults to {0}]'.format(constants.RESULTS_PATH))
+def surch_merge(queue_dir, log):
+    """Merge the result shards of a shared work queue
+    """
+
+    workqueue.merge(queue_dir=queue_dir, results_dir=log)
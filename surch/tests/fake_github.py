@@ -0,0 +1,161 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import json
+import time
+import random
+import hashlib
+import urlparse
+import threading
+from SocketServer import ThreadingMixIn
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+
+class FakeGitHub(ThreadingMixIn, HTTPServer):
+    """A local stand-in for the parts of the GitHub API surch uses
+    """
+    daemon_threads = True
+
+    def __init__(self, owners=None, rate_limit=5000, rate_limit_window=3600,
+                 latency=0, error_rate=0, seed=None):
+        """
+        :param owners: {(item_type, name): [repo dicts]} where item_type
+                       is `orgs` or `users` (dict)
+        :param rate_limit: requests allowed per credential (int)
+        :param rate_limit_window: seconds until the limit resets (int)
+        :param latency: seconds to wait before answering, or the (min, max)
+                        range to pick them from (float or tuple)
+        :param error_rate: share of the requests answered with a 502
+                        (float)
+        :param seed: seed of the injected latencies and errors (int)
+        """
+        HTTPServer.__init__(self, ('127.0.0.1', 0), _FakeGitHubHandler)
+        self.owners = owners or {}
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.remaining = {}
+        self.resets = {}
+        self.requests = []
+        self.injected = []
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        # (path, status, seconds) of every answered request.
+        self.timings = []
+        self.lock = threading.Lock()
+        self.url = 'http://{0}:{1}'.format(*self.server_address)
+
+    def inject(self, status, headers=None, body=None):
+        """Answer the next request with this response instead
+        """
+        self.injected.append((status, headers or {}, body or {}))
+
+    def delay(self):
+        """Return the seconds to wait before answering a request and
+        whether to answer it with an error
+        """
+        with self.lock:
+            latency = self.latency
+            if isinstance(latency, (tuple, list)):
+                latency = self.random.uniform(*latency)
+            return latency, self.random.random() < self.error_rate
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def rate_limit_headers(self, credential, count=True):
+        with self.lock:
+            now = time.time()
+            if now >= self.resets.get(credential, 0):
+                self.resets[credential] = int(now) + self.rate_limit_window
+                self.remaining[credential] = self.rate_limit
+            remaining = self.remaining[credential]
+            if remaining > 0 and count:
+                self.remaining[credential] -= 1
+            return remaining, {
+                'X-RateLimit-Limit': str(self.rate_limit),
+                'X-RateLimit-Remaining': str(max(remaining - 1, 0)),
+                'X-RateLimit-Reset': str(self.resets[credential])}
+
+    def route(self, path, query):
+        parts = path.strip('/').split('/')
+        if len(parts) < 2 or (parts[0], parts[1]) not in self.owners:
+            return 404, {'message': 'Not Found'}
+        repos = self.owners[(parts[0], parts[1])]
+        if len(parts) == 2:
+            return 200, {'login': parts[1], 'public_repos': len(repos)}
+        if parts[2:] == ['repos']:
+            per_page = int(query.get('per_page', ['30'])[0])
+            page = int(query.get('page', ['1'])[0])
+            return 200, repos[(page - 1) * per_page:page * per_page]
+        return 404, {'message': 'Not Found'}
+
+
+class _FakeGitHubHandler(BaseHTTPRequestHandler):
+    def _respond(self, status, headers, body):
+        body = json.dumps(body) if body is not None else ''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+        return status
+
+    def do_GET(self):
+        start = time.time()
+        status = self._get()
+        with self.server.lock:
+            self.server.timings.append(
+                (self.path, status, time.time() - start))
+
+    def _get(self):
+        server = self.server
+        credential = self.headers.get('Authorization', 'anonymous')
+        with server.lock:
+            server.requests.append((self.path, credential))
+            injected = server.injected.pop(0) if server.injected else None
+        if injected:
+            return self._respond(*injected)
+        latency, error = server.delay()
+        if latency:
+            time.sleep(latency)
+        if error:
+            return self._respond(502, {}, {'message': 'Server Error'})
+        url = urlparse.urlparse(self.path)
+        status, body = server.route(url.path, urlparse.parse_qs(url.query))
+        etag = '"{0}"'.format(hashlib.sha1(json.dumps(body)).hexdigest())
+        if status == 200 and self.headers.get('If-None-Match') == etag:
+            # Like GitHub, don't count conditional requests which are
+            # answered with 304.
+            _, headers = server.rate_limit_headers(credential, count=False)
+            return self._respond(304, headers, None)
+        remaining, headers = server.rate_limit_headers(credential)
+        if remaining <= 0:
+            return self._respond(403, headers, {
+                'message': 'API rate limit exceeded'})
+        headers['ETag'] = etag
+        return self._respond(status, headers, body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,93 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import subprocess
+
+GIT_ENV = dict(os.environ,
+               GIT_AUTHOR_NAME='surch',
+               GIT_AUTHOR_EMAIL='surch@example.com',
+               GIT_COMMITTER_NAME='surch',
+               GIT_COMMITTER_EMAIL='surch@example.com')
+
+
+def git(repo_path, command):
+    return subprocess.check_output(
+        'git -C {0} {1}'.format(repo_path, command),
+        shell=True, env=GIT_ENV).strip()
+
+
+def create_local_repo(repo_path, commits):
+    """Create a git repository with a commit per dict of
+    {filepath: content} in `commits` and return the commit shas
+    """
+    if not os.path.isdir(repo_path):
+        os.makedirs(repo_path)
+        git(repo_path, 'init --quiet')
+    return [add_commit(repo_path, files) for files in commits]
+
+
+def add_commit(repo_path, files):
+    for filepath, content in files.items():
+        full_path = os.path.join(repo_path, filepath)
+        if content is None:
+            os.remove(full_path)
+            continue
+        if not os.path.isdir(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        with open(full_path, 'w') as f:
+            f.write(content)
+    git(repo_path, 'add -A')
+    git(repo_path, 'commit --quiet --allow-empty -m commit')
+    return git(repo_path, 'rev-parse HEAD')
+
+
+def import_repo(repo_path, commits, commit_time=1468318530):
+    """Create a bare git repository with a commit per dict of
+    {filepath: content} in `commits` through a single `git fast-import`,
+    which is much faster than `create_local_repo` for many repositories
+    """
+    subprocess.check_call(['git', 'init', '--bare', '--quiet', repo_path])
+    branch = git(repo_path, 'symbolic-ref HEAD')
+    stream = []
+    for index, files in enumerate(commits):
+        stream.extend([
+            'commit {0}'.format(branch),
+            'committer surch <surch@example.com> {0} +0000'.format(
+                commit_time + index),
+            'data 6', 'commit'])
+        for filepath, content in sorted(files.items()):
+            if content is None:
+                stream.append('D {0}'.format(filepath))
+                continue
+            stream.extend(['M 100644 inline {0}'.format(filepath),
+                           'data {0}'.format(len(content)), content])
+        stream.append('')
+    fast_import = subprocess.Popen(
+        ['git', '-C', repo_path, 'fast-import', '--quiet'],
+        stdin=subprocess.PIPE, env=GIT_ENV)
+    fast_import.communicate('\n'.join(stream) + '\n')
+    if fast_import.returncode:
+        raise subprocess.CalledProcessError(fast_import.returncode,
+                                            'git fast-import')
+
+
+def read_results(results_file_path, table='_default'):
+    try:
+        with open(results_file_path) as results_file:
+            return json.load(results_file)[table].values()
+    except (IOError, ValueError, KeyError):
+        return []
@@ -0,0 +1,163 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import mock
+import testtools
+
+from surch import pack, repo, planner, backends, constants
+from surch.tests import helpers
+
+
+class TestBackends(testtools.TestCase):
+    def setUp(self):
+        super(TestBackends, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.repo_path = os.path.join(self.tmp, 'backends')
+        self.shas = helpers.create_local_repo(self.repo_path, [
+            {'a.txt': 'password = hunter2\n', 'b.txt': 'nothing\n'},
+            {'c/d.txt': 'token: abc-def\n'},
+            {'a.txt': None},
+        ])
+
+    def _search(self, name, search_list):
+        store = pack.ObjectStore(self.repo_path)
+        self.addCleanup(store.close)
+        backend = backends.create(name, self.repo_path, search_list,
+                                  store=store)
+        try:
+            return [sorted(backend.search_commit(sha)) for sha in self.shas]
+        finally:
+            backend.close()
+
+    def test_backends_find_the_same_files(self):
+        search_list = ['hunter2', 'abc-def']
+        expected = [
+            [('{0}:a.txt'.format(self.shas[0]), pack.PATTERN)],
+            [('{0}:a.txt'.format(self.shas[1]), pack.PATTERN),
+             ('{0}:c/d.txt'.format(self.shas[1]), pack.PATTERN)],
+            [('{0}:c/d.txt'.format(self.shas[2]), pack.PATTERN)]]
+        names = backends.candidates(self.repo_path, search_list)
+        self.assertIn(backends.NATIVE_LITERAL, names)
+        for name in names:
+            self.assertEqual(expected, self._search(name, search_list), name)
+
+    def test_regexes_are_matched_by_every_backend(self):
+        search_list = ['hunter[0-9]']
+        for name in backends.candidates(self.repo_path, search_list):
+            self.assertEqual(
+                ['{0}:a.txt'.format(self.shas[0])],
+                [match for match, _ in self._search(name, search_list)[0]],
+                name)
+
+    def test_patterns_matching_empty_lines(self):
+        self.shas = helpers.create_local_repo(self.repo_path, [
+            {'empty.txt': '', 'newline.txt': '\n', 'no_newline.txt': 'abc',
+             'blank_line.txt': 'a\n\nb\n', 'crlf.txt': 'a\r\nb\r\n'}])
+        for search_list in (['o*'], ['q\\?'], ['^$'], ['^$', 'hunter2']):
+            self.assertNotIn(backends.GREP_PCRE, backends.candidates(
+                self.repo_path, search_list))
+            expected = self._search(backends.GREP, search_list)
+            self.assertNotIn('empty.txt', str(expected))
+            for name in (backends.NATIVE_REGEX, backends.GREP_PCRE):
+                self.assertEqual(expected, self._search(name, search_list),
+                                 '{0} {1}'.format(name, search_list))
+
+    def test_classes_do_not_match_across_lines(self):
+        self.shas = helpers.create_local_repo(self.repo_path, [
+            {'split.txt': 'foo\nbar\n', 'joined.txt': 'foo bar\n'}])
+        for search_list in (['foo\\sbar'], ['foo[[:space:]]bar'],
+                            ['foo\\Wbar'], ['x\\s*y'], ['o\\W*b']):
+            expected = self._search(backends.GREP, search_list)
+            self.assertNotIn('split.txt', str(expected))
+            for name in (backends.NATIVE_REGEX, backends.GREP_PCRE):
+                self.assertEqual(expected, self._search(name, search_list),
+                                 '{0} {1}'.format(name, search_list))
+
+    def test_grep_threads(self):
+        backend = backends.GitGrep(self.repo_path, ['hunter2'], threads=2)
+        self.addCleanup(backend.close)
+        with mock.patch.object(backends.subprocess, 'check_output',
+                               wraps=backends.subprocess.check_output) as run:
+            self.assertEqual(
+                [('{0}:a.txt'.format(self.shas[0]), pack.PATTERN)],
+                backend.search_commit(self.shas[0]))
+        self.assertIn('grep -l --threads 2 ', run.call_args[0][0])
+
+    def test_candidates(self):
+        self.assertEqual([backends.NATIVE_REGEX],
+                         backends.candidates(self.repo_path, []))
+        names = backends.candidates(self.repo_path, ['a', 'b[0-9]'])
+        self.assertIn(backends.GREP, names)
+        self.assertNotIn(backends.NATIVE_LITERAL, names)
+        self.assertNotIn(backends.NATIVE_LITERAL, backends.candidates(
+            self.repo_path, [str(index) for index in
+                             range(constants.LITERAL_MATCHER_MAX + 1)]))
+
+    def test_literal_matcher(self):
+        matcher = backends.LiteralMatcher(['abc', 'xyz'])
+        self.assertTrue(matcher.search('__xyz__'))
+        self.assertFalse(matcher.search('ab c'))
+
+    def test_calibrate_estimates_every_candidate(self):
+        search_list = ['hunter2']
+        name, estimates = backends.calibrate(
+            self.repo_path, search_list, planner.repo_stats(self.repo_path))
+        self.assertEqual(
+            sorted(backends.candidates(self.repo_path, search_list)),
+            sorted(estimates))
+        self.assertEqual(min(estimates.values()), estimates[name])
+
+
+class TestAutoEngine(testtools.TestCase):
+    def setUp(self):
+        super(TestAutoEngine, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'auto')
+        helpers.create_local_repo(self.upstream, [
+            {'a.txt': 'secret\n'}, {'b.txt': 'secret\n'}])
+
+    def _search(self, engine):
+        results_dir = os.path.join(self.tmp, engine)
+        surch_repo = repo.search(
+            repo_url=self.upstream,
+            search_list=['secret'],
+            engine=engine,
+            results_dir=results_dir,
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'))
+        return surch_repo, sorted(
+            (result['commit_sha'], result['filepath'])
+            for result in helpers.read_results(
+                os.path.join(results_dir, 'results.json')))
+
+    def test_auto_engine_selects_a_backend(self):
+        surch_repo, results = self._search('auto')
+        self.assertIn(surch_repo.backend, backends.candidates(
+            surch_repo.repo_path, ['secret']))
+        self.assertEqual(self._search('grep')[1], results)
+        self.assertEqual(3, len(results))
+
+    def test_invalid_patterns_exit(self):
+        self.assertRaises(SystemExit, repo.search,
+                          repo_url=self.upstream,
+                          search_list=['a\\{1'],
+                          engine='auto',
+                          results_dir=self.tmp,
+                          cloned_repo_dir=os.path.join(self.tmp, 'clones'))
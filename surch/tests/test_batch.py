@@ -0,0 +1,117 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import shutil
+import tempfile
+
+import yaml
+import testtools
+
+from surch import batch
+from surch import constants
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+
+class TestBatch(testtools.TestCase):
+    def setUp(self):
+        super(TestBatch, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        owners = {}
+        for item_type, owner, names in (
+                ('orgs', 'org1', ['common', 'only1']),
+                ('orgs', 'org2', ['common', 'skipped']),
+                ('users', 'user', ['own'])):
+            repos = []
+            for name in names:
+                repo_path = os.path.join(self.tmp, 'upstream', owner, name)
+                helpers.create_local_repo(repo_path, [
+                    {'a.txt': 'surch {0}\n'.format(owner)}])
+                repos.append({'name': name, 'clone_url': repo_path,
+                              'size': 1})
+            owners[(item_type, owner)] = repos
+        self.single = os.path.join(self.tmp, 'upstream', 'single')
+        helpers.create_local_repo(self.single, [{'b.txt': 'surch\n'}])
+        self.api = FakeGitHub(owners=owners).start()
+        self.addCleanup(self.api.stop)
+        self.results_dir = os.path.join(self.tmp, 'results')
+
+    def _config(self, **conf_vars):
+        config_file = os.path.join(self.tmp, 'batch.yaml')
+        conf_vars.setdefault('search_list', ['surch'])
+        conf_vars.setdefault('github_api_url', self.api.url)
+        with open(config_file, 'w') as f:
+            yaml.safe_dump(conf_vars, f)
+        return config_file
+
+    def _search(self, config_file, workers=1):
+        return batch.search(
+            config_file=config_file,
+            results_dir=self.results_dir,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones'),
+            workers=workers)
+
+    def test_results_are_partitioned_by_target(self):
+        self._search(self._config(targets=[
+            {'org': 'org1'},
+            {'org': 'org2', 'repos_to_skip': ['skipped']},
+            {'user': 'user'},
+            {'repo': self.single}]), workers=3)
+        results_file_path = os.path.join(self.results_dir, 'results.json')
+        with open(results_file_path) as f:
+            tables = json.load(f)
+        self.assertEqual(['org/org1', 'org/org2', 'repo/upstream',
+                          'user/user'],
+                         sorted(table for table in tables if tables[table]))
+
+        def repos(table):
+            return sorted(result['repository_name'] for result in
+                          helpers.read_results(results_file_path, table))
+        self.assertEqual(['common', 'only1'], repos('org/org1'))
+        self.assertEqual(['common'], repos('org/org2'))
+        self.assertEqual(['own'], repos('user/user'))
+        self.assertEqual(['single'], repos('repo/upstream'))
+        # Repositories with the same name are cloned apart.
+        for owner in ('org1', 'org2'):
+            self.assertTrue(os.path.isdir(os.path.join(
+                self.tmp, 'clones', 'org', owner, 'common')))
+        with open(os.path.join(self.results_dir,
+                               constants.REPO_COSTS_FILE)) as f:
+            self.assertIn('org/org2/common', json.load(f))
+
+    def test_repos_of_different_owners(self):
+        targets = []
+        for owner in ('alice', 'bob'):
+            repo_path = os.path.join(self.tmp, 'upstream', owner, 'tools')
+            helpers.create_local_repo(repo_path, [
+                {'a.txt': 'surch {0}\n'.format(owner)}])
+            targets.append({'repo': repo_path})
+        self._search(self._config(targets=targets))
+        results_file_path = os.path.join(self.results_dir, 'results.json')
+        for owner in ('alice', 'bob'):
+            results = helpers.read_results(results_file_path,
+                                           'repo/{0}'.format(owner))
+            self.assertEqual(['tools'], [result['repository_name']
+                                         for result in results])
+            self.assertTrue(os.path.isdir(os.path.join(
+                self.tmp, 'clones', 'repo', owner, 'tools')))
+
+    def test_invalid_targets(self):
+        self.assertRaises(SystemExit, self._search, self._config())
+        self.assertRaises(SystemExit, self._search, self._config(
+            targets=[{'org': 'org1', 'user': 'user'}]))
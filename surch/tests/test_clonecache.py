@@ -0,0 +1,134 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+import testtools
+
+from surch import repo, clonecache, constants
+from surch.tests import helpers
+
+
+class TestCloneCache(testtools.TestCase):
+    def setUp(self):
+        super(TestCloneCache, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.clones = os.path.join(self.tmp, 'clones')
+
+    def _clone(self, name, size=8192):
+        path = os.path.join(self.clones, name)
+        os.makedirs(os.path.join(path, '.git'))
+        with open(os.path.join(path, 'data'), 'w') as f:
+            f.write('x' * size)
+        return path
+
+    def _scan(self, cache, path):
+        cache.use(path)
+        cache.release(path)
+
+    def _cloned(self):
+        return sorted(name for name in os.listdir(self.clones)
+                      if not name.startswith('.'))
+
+    def test_parse_size(self):
+        self.assertEqual(1024, clonecache.parse_size('1K'))
+        self.assertEqual(int(1.5 * 1024 ** 3), clonecache.parse_size('1.5G'))
+        self.assertEqual(500 * 1024 ** 2, clonecache.parse_size('500mb'))
+        self.assertEqual(42, clonecache.parse_size('42'))
+        self.assertRaises(ValueError, clonecache.parse_size, 'big')
+
+    def test_evicts_least_recently_scanned(self):
+        paths = [self._clone(name) for name in ('a', 'b', 'c')]
+        size = clonecache.disk_usage(paths[0])
+        cache = clonecache.CloneCache(self.clones, size * 2)
+        self._scan(cache, paths[0])
+        self._scan(cache, paths[1])
+        # Scanning `a` again makes `b` the least recently scanned.
+        self._scan(cache, paths[0])
+        self._scan(cache, paths[2])
+        self.assertEqual(['a', 'c'], self._cloned())
+        with open(os.path.join(self.clones, constants.CLONE_CACHE_INDEX)) as f:
+            self.assertEqual(['a', 'c'], sorted(json.load(f)))
+
+    def test_keeps_clones_in_use(self):
+        paths = [self._clone(name) for name in ('a', 'b')]
+        cache = clonecache.CloneCache(self.clones, 1)
+        cache.use(paths[0])
+        self._scan(cache, paths[1])
+        self.assertEqual(['a', 'b'], self._cloned())
+        cache.release(paths[0])
+        self.assertEqual(['a'], self._cloned())
+
+    def test_keeps_clones_leased_by_other_processes(self):
+        paths = [self._clone(name) for name in ('a', 'b', 'c')]
+        dead = subprocess.Popen(['true'])
+        dead.wait()
+        now = time.time()
+        index = {
+            'a': dict(size=8192, last_used=now - 30,
+                      leases=[[os.getppid(), now - 30]]),
+            'b': dict(size=8192, last_used=now - 20,
+                      leases=[[dead.pid, now - 20]]),
+            'c': dict(size=8192, last_used=now - 10,
+                      leases=[[os.getppid(), now - 10 -
+                               constants.CLONE_LEASE_TTL]])}
+        with open(os.path.join(self.clones, constants.CLONE_CACHE_INDEX),
+                  'w') as f:
+            json.dump(index, f)
+        clonecache.CloneCache(self.clones, 1).evict()
+        self.assertEqual(['a'], self._cloned())
+        self.assertTrue(os.path.isdir(paths[0]))
+
+    def test_untracked_clones_are_oldest(self):
+        old = self._clone(os.path.join('org', 'old'))
+        os.utime(old, (time.time() - 3600, time.time() - 3600))
+        new = self._clone(os.path.join('org', 'new'))
+        size = clonecache.disk_usage(new)
+        clonecache.CloneCache(self.clones, size).evict()
+        self.assertFalse(os.path.isdir(old))
+        self.assertTrue(os.path.isdir(new))
+
+    def test_evict_cli_method_requires_clones(self):
+        self.assertRaises(SystemExit, clonecache.evict,
+                          os.path.join(self.tmp, 'missing'), 1)
+
+
+class TestRepoCloneBudget(testtools.TestCase):
+    def setUp(self):
+        super(TestRepoCloneBudget, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.clones = os.path.join(self.tmp, 'clones')
+
+    def _search(self, name):
+        upstream = os.path.join(self.tmp, 'upstream', name)
+        helpers.create_local_repo(upstream, [{'a.txt': 'secret\n'}])
+        repo.search(repo_url=upstream,
+                    search_list=['secret'],
+                    results_dir=os.path.join(self.tmp, 'results'),
+                    cloned_repo_dir=self.clones,
+                    clone_budget=1)
+
+    def test_keeps_the_last_scanned_clone(self):
+        self._search('first')
+        self._search('second')
+        self.assertFalse(os.path.isdir(os.path.join(self.clones, 'first')))
+        self.assertTrue(os.path.isdir(os.path.join(self.clones, 'second')))
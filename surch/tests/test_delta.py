@@ -0,0 +1,104 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import mock
+import testtools
+
+from surch import repo
+from surch import delta
+from surch import constants
+from surch.tests import helpers
+
+
+class TestDelta(testtools.TestCase):
+    def setUp(self):
+        super(TestDelta, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'project')
+        helpers.create_local_repo(self.upstream, [
+            {'a.txt': 'secret\n', 'b.txt': 'token\n'},
+            {'c.txt': 'nothing\n'}])
+        self.results_dir = os.path.join(self.tmp, 'results')
+
+    def _search(self, search_list):
+        return repo.search(
+            repo_url=self.upstream,
+            search_list=search_list,
+            results_dir=self.results_dir,
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'))
+
+    def _read(self, results_file):
+        return sorted(
+            (result['filepath'], result.get('commit_sha'))
+            for result in helpers.read_results(
+                os.path.join(self.results_dir, results_file)))
+
+    def test_results_are_fingerprinted_by_blob(self):
+        self._search(['secret'])
+        results = helpers.read_results(
+            os.path.join(self.results_dir, 'results.json'))
+        # Both commits hold the same blob of a.txt.
+        self.assertEqual(2, len(results))
+        self.assertEqual(1, len(set(r['fingerprint'] for r in results)))
+        self.assertEqual(
+            helpers.git(self.upstream, 'rev-parse HEAD:a.txt').strip(),
+            results[0]['blob_sha'])
+
+    def test_only_new_findings_are_reported(self):
+        self._search(['secret'])
+        self.assertEqual(2, len(self._read(constants.NEW_RESULTS_FILE)))
+
+        self._search(['secret'])
+        self.assertEqual([], self._read(constants.NEW_RESULTS_FILE))
+        self.assertEqual([], self._read(constants.RESOLVED_RESULTS_FILE))
+
+        helpers.add_commit(self.upstream, {'d.txt': 'secret\n'})
+        self._search(['secret', 'token'])
+        self.assertEqual(['b.txt'] * 3 + ['d.txt'], [
+            path for path, _ in self._read(constants.NEW_RESULTS_FILE)])
+
+        self._search(['token'])
+        self.assertEqual([], self._read(constants.NEW_RESULTS_FILE))
+        self.assertEqual([('a.txt', None), ('d.txt', None)],
+                         self._read(constants.RESOLVED_RESULTS_FILE))
+
+    @mock.patch('surch.plugins.handler.pagerduty_trigger')
+    def test_pager_fires_on_new_findings(self, pagerduty_trigger):
+        surch_repo = repo.Repo(
+            repo_url=self.upstream,
+            search_list=['secret'],
+            results_dir=self.results_dir,
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'),
+            report_delta=True)
+        surch_repo.pager = ['pagerduty']
+        surch_repo.search(['secret'])
+        pagerduty_trigger.assert_called_once_with(
+            config_file=None, log=os.path.join(
+                self.results_dir, constants.NEW_RESULTS_FILE))
+
+    def test_findings_of_other_repos_are_not_resolved(self):
+        results_file_path = os.path.join(self.results_dir, 'results.json')
+        self._search(['secret'])
+        os.remove(results_file_path)
+        delta.update(results_file_path, scanned_repos=['other'])
+        self.assertEqual([], self._read(constants.RESOLVED_RESULTS_FILE))
+        delta.update(results_file_path, scanned_repos=['project'])
+        self.assertEqual([('a.txt', None)],
+                         self._read(constants.RESOLVED_RESULTS_FILE))
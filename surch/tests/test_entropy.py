@@ -0,0 +1,106 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import testtools
+
+from surch import repo
+from surch import entropy
+from surch.tests import helpers
+
+KEY = 'AKIAx9Qz3vLm0pT7Rw2sYb5NcJ8hUe4KfG6dV1iO'
+HEX_KEY = '9f86d081884c7d659a2feaa0c55ad015a3bf4f1b'
+SOURCE = 'def get_configuration_value(self, name):\n' \
+         '    return self.configuration_values[name]\n'
+
+
+@testtools.skipIf(entropy.numpy is None, 'NumPy is not installed')
+class TestEntropyDetector(testtools.TestCase):
+    def setUp(self):
+        super(TestEntropyDetector, self).setUp()
+        self.detector = entropy.EntropyDetector()
+
+    def test_finds_keys(self):
+        data = SOURCE + "key = '{0}'\nhash = {1}\n".format(KEY, HEX_KEY)
+        self.assertEqual(
+            [(data.index(KEY), data.index(KEY) + len(KEY), 'base64'),
+             (data.index(HEX_KEY), data.index(HEX_KEY) + len(HEX_KEY),
+              'hex')],
+            self.detector.scan(data))
+
+    def test_ignores_source_and_repetitive_strings(self):
+        self.assertEqual([], self.detector.scan(SOURCE * 100))
+        self.assertEqual([], self.detector.scan('a' * 1000))
+        self.assertEqual([], self.detector.scan('0123' * 25))
+
+    def test_scan_batch_maps_findings_to_blobs(self):
+        blobs = [SOURCE, KEY, '', SOURCE + HEX_KEY, SOURCE * 10]
+        self.assertEqual(set([1, 3]), self.detector.scan_batch(blobs))
+        self.assertEqual(set(), self.detector.scan_batch([]))
+
+    def test_windows_do_not_span_blobs(self):
+        half = len(KEY) // 2
+        self.assertEqual(
+            set(), self.detector.scan_batch([KEY[:half], KEY[half:]]))
+
+
+@testtools.skipIf(entropy.numpy is None, 'NumPy is not installed')
+class TestEntropySearch(testtools.TestCase):
+    def setUp(self):
+        super(TestEntropySearch, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'keys')
+        helpers.create_local_repo(self.upstream, [
+            {'app.py': SOURCE, 'settings.py': "KEY = '{0}'\n".format(KEY)},
+            {'app.py': SOURCE + '# secret\n'},
+            {'settings.py': 'KEY = None\n'},
+        ])
+
+    def _search(self, engine, search_list):
+        results_dir = os.path.join(self.tmp, engine)
+        surch_repo = repo.Repo(
+            repo_url=self.upstream,
+            search_list=search_list,
+            engine=engine,
+            entropy=True,
+            results_dir=results_dir,
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'))
+        surch_repo.search(search_list)
+        return sorted(
+            (result['filepath'], result.get('finding_type'))
+            for result in helpers.read_results(
+                os.path.join(results_dir, 'results.json')))
+
+    def test_entropy_findings_are_tagged(self):
+        expected = sorted([('app.py', None)] * 2 +
+                          [('settings.py', 'entropy')] * 2)
+        self.assertEqual(expected, self._search('native', ['secret']))
+        self.assertEqual(expected, self._search('grep', ['secret']))
+
+    def test_entropy_without_search_strings(self):
+        self.assertEqual([('settings.py', 'entropy')] * 2,
+                         self._search('native', []))
+
+    def test_entropy_cannot_be_combined_with_introduced(self):
+        self.assertRaises(SystemExit, repo.Repo,
+                          repo_url=self.upstream,
+                          search_list=['secret'],
+                          entropy=True,
+                          introduced=True,
+                          results_dir=self.tmp)
@@ -0,0 +1,71 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import testtools
+
+from surch import findings, constants
+
+
+class TestFindings(testtools.TestCase):
+    def setUp(self):
+        super(TestFindings, self).setUp()
+        self.findings = findings.Findings('org', 'repo')
+
+    def _add(self, commit_sha, filepath, blob_sha='b' * 40,
+             finding_type=None):
+        commit = self.findings.commit(
+            commit_sha, 'Author', 'author@example.com',
+            'Tue Jul 12 10:15:30 2016')
+        self.findings.add(commit, filepath, blob_sha, 'f' + blob_sha[1:],
+                          finding_type)
+
+    def test_rows(self):
+        self._add('a' * 40, 'dir/file.py')
+        self._add('c' * 40, 'key.pem', finding_type='entropy')
+        rows = list(self.findings.rows())
+        self.assertEqual(2, len(self.findings))
+        self.assertEqual(dict(
+            email='author@example.com',
+            filepath='dir/file.py',
+            username='Author',
+            commit_sha='a' * 40,
+            commit_time='Tue Jul 12 10:15:30 2016',
+            blob_sha='b' * 40,
+            fingerprint='f' + 'b' * 39,
+            repository_name='repo',
+            organization_name='org',
+            blob_url=constants.GITHUB_BLOB_URL.format(
+                'org', 'repo', 'a' * 40, 'dir/file.py')), rows[0])
+        self.assertNotIn('finding_type', rows[0])
+        self.assertEqual('entropy', rows[1]['finding_type'])
+
+    def test_repeated_values_are_shared(self):
+        # Strings split from git's output are distinct objects.
+        for commit_sha in ('a' * 40, 'c' * 40):
+            for _ in range(2):
+                self._add(''.join(commit_sha), ''.join(['dir/', 'file.py']),
+                          ''.join(['b' * 20, 'b' * 20]))
+        first, second, third, fourth = self.findings
+        self.assertIs(first.commit, second.commit)
+        self.assertIsNot(first.commit, third.commit)
+        self.assertIs(first.commit[1], third.commit[1])
+        self.assertIs(first.repository, fourth.repository)
+        for attribute in ('filepath', 'blob_sha', 'fingerprint'):
+            self.assertIs(getattr(first, attribute),
+                          getattr(fourth, attribute))
+
+    def test_findings_have_no_dict(self):
+        self._add('a' * 40, 'file.py')
+        self.assertFalse(hasattr(list(self.findings)[0], '__dict__'))
@@ -0,0 +1,143 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+import threading
+
+import mock
+import yaml
+import testtools
+
+from surch import repo, journal, constants, organization
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+
+class TestFirstMatch(testtools.TestCase):
+    def setUp(self):
+        super(TestFirstMatch, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'gate')
+        helpers.create_local_repo(self.upstream, [
+            {'a.txt': 'secret\n'},
+            {'b.txt': 'secret\n'},
+            {'c.txt': 'secret\n'},
+            {'d.txt': 'nothing\n'},
+        ])
+        self.results_dir = os.path.join(self.tmp, 'results')
+
+    def _repo(self, **kwargs):
+        return repo.Repo(repo_url=self.upstream,
+                         search_list=['secret'],
+                         results_dir=self.results_dir,
+                         cloned_repo_dir=os.path.join(self.tmp, 'clones'),
+                         first_match=True,
+                         **kwargs)
+
+    def _results(self):
+        return helpers.read_results(
+            os.path.join(self.results_dir, 'results.json'))
+
+    def test_stops_at_the_first_commit_with_a_finding(self):
+        surch_repo = self._repo()
+        with mock.patch.object(surch_repo, '_search_commit',
+                               wraps=surch_repo._search_commit) as search:
+            surch_repo.search(['secret'])
+        # The files of the newest commit already hold findings.
+        self.assertEqual(1, search.call_count)
+        self.assertEqual(4, surch_repo.commits)
+        self.assertEqual(1, len(self._results()))
+        self.assertEqual(self._results()[0]['filepath'],
+                         surch_repo.first_finding[0].rsplit(':', 1)[-1])
+
+    def test_engines_and_modes_report_one_finding(self):
+        for kwargs in (dict(engine='native'), dict(introduced=True),
+                       dict(head_only=True)):
+            surch_repo = self._repo(**kwargs)
+            surch_repo.search(['secret'])
+            self.assertIsNotNone(surch_repo.first_finding, kwargs)
+            self.assertEqual(1, len(self._results()), kwargs)
+
+    def test_introduced_reports_the_oldest_finding(self):
+        surch_repo = self._repo(introduced=True)
+        surch_repo.search(['secret'])
+        self.assertTrue(surch_repo.first_finding[0].endswith(':a.txt'))
+
+    def test_stops_when_another_repository_found_one(self):
+        stop = threading.Event()
+        stop.set()
+        surch_repo = self._repo(stop=stop)
+        surch_repo.search(['secret'])
+        self.assertIsNone(surch_repo.first_finding)
+        self.assertEqual([], self._results())
+
+    def test_suppressed_findings_do_not_stop_the_search(self):
+        suppressions = os.path.join(self.tmp, 'suppressions.yaml')
+        with open(suppressions, 'w') as f:
+            yaml.safe_dump({'paths': ['c.txt', 'b.txt']}, f)
+        surch_repo = self._repo(suppressions=suppressions)
+        surch_repo.search(['secret'])
+        self.assertTrue(surch_repo.first_finding[0].endswith(':a.txt'))
+
+    def test_exit_status(self):
+        error = self.assertRaises(
+            SystemExit, repo.search, repo_url=self.upstream,
+            search_list=['secret'], results_dir=self.results_dir,
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'),
+            first_match=True)
+        self.assertEqual(constants.FIRST_MATCH_EXIT_CODE, error.code)
+        surch_repo = repo.search(
+            repo_url=self.upstream, search_list=['nothing-like-it'],
+            results_dir=self.results_dir,
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'),
+            first_match=True)
+        self.assertIsNone(surch_repo.first_finding)
+
+
+class TestOrganizationFirstMatch(testtools.TestCase):
+    def setUp(self):
+        super(TestOrganizationFirstMatch, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        repos = []
+        for name, size in (('dirty', 500), ('clean', 50)):
+            repo_path = os.path.join(self.tmp, 'upstream', name)
+            helpers.create_local_repo(repo_path, [{'a.txt': name + '\n'}])
+            repos.append({'name': name, 'clone_url': repo_path,
+                          'size': size})
+        self.api = FakeGitHub(owners={('orgs', 'org'): repos}).start()
+        self.addCleanup(self.api.stop)
+
+    def test_stops_scanning_repositories(self):
+        error = self.assertRaises(
+            SystemExit, organization.search,
+            organization='org',
+            github_api_url=self.api.url,
+            search_list=['dirty'],
+            results_dir=self.tmp,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones'),
+            first_match=True)
+        self.assertEqual(constants.FIRST_MATCH_EXIT_CODE, error.code)
+        results_file_path = os.path.join(self.tmp, 'results.json')
+        # The largest repository is scanned first.
+        self.assertEqual(['dirty'], [
+            entry['repo_name'] for entry in journal.Journal(
+                results_file_path).read().values()])
+        self.assertEqual(1, len(helpers.read_results(results_file_path)))
+        self.assertFalse(os.path.isfile(os.path.join(
+            self.tmp, constants.NEW_RESULTS_FILE)))
@@ -0,0 +1,217 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import time
+import shutil
+import tempfile
+
+import requests
+import testtools
+
+from surch import github
+from surch import httpcache
+from surch import organization
+from surch.tests.fake_github import FakeGitHub
+
+
+def _repos(count):
+    return [{'name': 'repo{0}'.format(i),
+             'clone_url': 'https://example.com/org/repo{0}.git'.format(i)}
+            for i in range(count)]
+
+
+class TestGitHubClient(testtools.TestCase):
+    def setUp(self):
+        super(TestGitHubClient, self).setUp()
+        self.api = FakeGitHub(owners={('orgs', 'org'): _repos(250)}).start()
+        self.addCleanup(self.api.stop)
+        self.sleeps = []
+
+    def _client(self, **kwargs):
+        client = github.GitHubClient(api_url=self.api.url, backoff=0.01,
+                                     **kwargs)
+        client._sleep = self.sleeps.append
+        return client
+
+    def test_spreads_requests_over_tokens(self):
+        client = self._client(credentials=['a', 'b'])
+        client.get_many(['/orgs/org'] * 10)
+        used = [credential for _, credential in self.api.requests]
+        self.assertEqual(5, used.count('token a'))
+        self.assertEqual(5, used.count('token b'))
+
+    def test_spreads_concurrent_requests_before_any_answer(self):
+        # No response comes back before every request was sent.
+        self.api.latency = 0.2
+        client = self._client(credentials=['a', 'b'], workers=4)
+        client.get_many(['/orgs/org'] * 4)
+        used = [credential for _, credential in self.api.requests]
+        self.assertEqual(2, used.count('token a'))
+        self.assertEqual(2, used.count('token b'))
+
+    def test_waits_for_rate_limit_reset(self):
+        self.api.rate_limit = 2
+        self.api.rate_limit_window = 1
+        client = self._client(credentials=['a'])
+        client._sleep = lambda seconds: (self.sleeps.append(seconds),
+                                         time.sleep(seconds))
+        for _ in range(3):
+            self.assertEqual(200, client.get('/orgs/org').status_code)
+        # The third request had to wait for the reset advertised by the
+        # rate limit headers instead of getting a 403.
+        self.assertEqual(3, len(self.api.requests))
+        self.assertEqual(1, len(self.sleeps))
+
+    def test_switches_token_when_rate_limited(self):
+        self.api.rate_limit = 1
+        client = self._client(credentials=['a', 'b'])
+        client.get('/orgs/org')
+        client.get('/orgs/org')
+        self.assertEqual(['token a', 'token b'],
+                         sorted(c for _, c in self.api.requests))
+        self.assertEqual([], self.sleeps)
+
+    def test_retries_secondary_rate_limit_and_server_errors(self):
+        self.api.inject(403, {'Retry-After': '0'},
+                        {'message': 'You have exceeded a secondary '
+                                    'rate limit.'})
+        self.api.inject(502)
+        self.api.inject(403, body={'message': 'secondary rate limit'})
+        client = self._client()
+        self.assertEqual(200, client.get('/orgs/org').status_code)
+        self.assertEqual(4, len(self.api.requests))
+
+    def test_gives_up_after_max_retries(self):
+        for _ in range(3):
+            self.api.inject(500)
+        client = self._client(max_retries=2)
+        self.assertRaises(github.RateLimitError, client.get, '/orgs/org')
+
+    def test_retries_connection_errors(self):
+        client = self._client(max_retries=2)
+        get = client.session.get
+        failures = [requests.ConnectionError('reset'), requests.Timeout()]
+
+        def flaky_get(*args, **kwargs):
+            if failures:
+                raise failures.pop(0)
+            return get(*args, **kwargs)
+        client.session.get = flaky_get
+        self.assertEqual(200, client.get('/orgs/org').status_code)
+        self.assertEqual([0.01, 0.02], self.sleeps)
+
+        failures.extend([requests.ConnectionError('reset')] * 3)
+        self.assertRaises(requests.ConnectionError, client.get, '/orgs/org')
+
+    def test_permission_errors_are_not_retried(self):
+        self.api.inject(403, body={'message': 'Forbidden'})
+        self.assertEqual(403, self._client().get('/orgs/org').status_code)
+        self.assertEqual(1, len(self.api.requests))
+
+    def test_organization_lists_all_pages(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        org = organization.Organization(
+            organization='org', github_api_url=self.api.url,
+            github_tokens=['a'], github_cache_dir=cache_dir)
+        repos = org._get_all_repos_list()
+        self.assertEqual(250, len(repos))
+        self.assertEqual(set(r['name'] for r in _repos(250)),
+                         set(r['name'] for r in repos))
+
+    def test_organization_lists_all_pages_despite_errors(self):
+        api = FakeGitHub(owners={('orgs', 'org'): _repos(1000)},
+                         latency=(0, 0.01), error_rate=0.3, seed=0).start()
+        self.addCleanup(api.stop)
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        client = github.GitHubClient(api_url=api.url, backoff=0.01,
+                                     max_retries=10)
+        client._sleep = self.sleeps.append
+        org = organization.Organization(
+            organization='org', github_client=client,
+            github_cache_dir=cache_dir)
+        self.assertEqual(1000, len(org._get_all_repos_list()))
+        statuses = [status for _, status, _ in api.timings]
+        self.assertIn(502, statuses)
+        # The org and its 10 pages.
+        self.assertEqual(11, statuses.count(200))
+        self.assertTrue(all(seconds < 1 for _, _, seconds in api.timings))
+
+    def test_injects_latency(self):
+        self.api.latency = 0.05
+        self._client().get_many(['/orgs/org'] * 4)
+        self.assertEqual(4, len(self.api.timings))
+        self.assertTrue(all(seconds >= 0.05
+                            for _, _, seconds in self.api.timings))
+
+
+class TestResponseCache(testtools.TestCase):
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+        self.api = FakeGitHub(owners={('orgs', 'org'): _repos(250)}).start()
+        self.addCleanup(self.api.stop)
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    def _client(self, **kwargs):
+        return github.GitHubClient(
+            api_url=self.api.url,
+            cache=httpcache.ResponseCache(self.cache_dir),
+            **kwargs)
+
+    def _remaining(self):
+        return self.api.remaining['anonymous']
+
+    def test_unchanged_responses_are_revalidated(self):
+        client = self._client()
+        response = client.get('/orgs/org')
+        self.assertEqual(200, response.status_code)
+        remaining = self._remaining()
+
+        cached = self._client().get('/orgs/org')
+        self.assertEqual(200, cached.status_code)
+        self.assertEqual(response.json(), cached.json())
+        self.assertEqual(2, len(self.api.requests))
+        # The 304 didn't count against the rate limit.
+        self.assertEqual(remaining, self._remaining())
+
+        self.api.owners[('orgs', 'org')] = _repos(3)
+        self.assertEqual(3, client.get_json('/orgs/org')['public_repos'])
+        self.assertEqual(remaining - 1, self._remaining())
+
+    def test_fresh_responses_are_not_revalidated(self):
+        self._client().get('/orgs/org')
+        self._client(cache_ttl=3600).get('/orgs/org')
+        self.assertEqual(1, len(self.api.requests))
+
+    def test_offline_uses_cached_responses_only(self):
+        client = self._client(offline=True)
+        self.assertRaises(github.OfflineError, client.get, '/orgs/org')
+        self._client().get('/orgs/org')
+        self.assertEqual(250, client.get_json('/orgs/org')['public_repos'])
+        self.assertEqual(1, len(self.api.requests))
+
+    def test_organization_lists_cached_repos_offline(self):
+        def list_repos(offline):
+            return organization.Organization(
+                organization='org', github_api_url=self.api.url,
+                github_cache_dir=self.cache_dir,
+                offline=offline)._get_all_repos_list()
+
+        repos = list_repos(offline=False)
+        requests_count = len(self.api.requests)
+        self.assertEqual(repos, list_repos(offline=True))
+        self.assertEqual(requests_count, len(self.api.requests))
@@ -0,0 +1,96 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import mock
+import testtools
+
+from surch import journal
+from surch import organization
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+
+class TestResume(testtools.TestCase):
+    def setUp(self):
+        super(TestResume, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.repos = []
+        for index in range(3):
+            name = 'repo{0}'.format(index)
+            repo_path = os.path.join(self.tmp, 'upstream', name)
+            helpers.create_local_repo(repo_path, [
+                {'a.txt': 'surch {0}\n'.format(index)},
+                {'b.txt': 'nothing\n'}])
+            self.repos.append({'name': name, 'clone_url': repo_path})
+        self.api = FakeGitHub(owners={('orgs', 'org'): self.repos}).start()
+        self.addCleanup(self.api.stop)
+        self.results_file_path = os.path.join(self.tmp, 'results.json')
+        self.journal = journal.Journal(self.results_file_path)
+
+    def _search(self, resume=False):
+        org = organization.Organization(
+            organization='org',
+            github_api_url=self.api.url,
+            search_list=['surch'],
+            results_dir=self.tmp,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones'),
+            resume=resume)
+        org.search(['surch'])
+
+    def _results(self):
+        return sorted((result['repository_name'], result['commit_sha'])
+                      for result in helpers.read_results(
+                          self.results_file_path))
+
+    @mock.patch('surch.constants.CLONE_BACKOFF', 0)
+    def test_failed_repos_are_skipped_and_resumed(self):
+        # Make the second repository unreachable for the first run.
+        repo_url = self.repos[1]['clone_url']
+        shutil.move(repo_url, repo_url + '.away')
+        self._search()
+        self.assertEqual(['repo0', 'repo2'],
+                         sorted(set(name for name, _ in self._results())))
+        self.assertEqual([repo_url], list(self.journal.unfinished()))
+
+        shutil.move(repo_url + '.away', repo_url)
+        self._search(resume=True)
+        self.assertEqual(6, len(self._results()))
+        self.assertEqual(3, len(self.journal.done()))
+        self.assertEqual({}, self.journal.unfinished())
+
+    def test_resume_replaces_partial_results(self):
+        self._search()
+        expected = self._results()
+        # Crash while scanning the last repository, after some of its
+        # results were written.
+        repo_url = self.repos[2]['clone_url']
+        with open(self.journal.path, 'a') as journal_file:
+            journal_file.write(
+                '{{"event": "start", "repo_name": "repo2", '
+                '"repo_url": "{0}"}}\n{{"event": "do'.format(repo_url))
+        self._search(resume=True)
+        self.assertEqual(expected, self._results())
+        self.assertEqual(3, len(self.journal.done()))
+
+    def test_new_run_resets_the_journal(self):
+        self._search()
+        self._search()
+        self.assertEqual(3, len(self.journal.read()))
+        self.assertEqual(6, len(self._results()))
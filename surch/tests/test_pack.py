@@ -0,0 +1,172 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import mock
+import testtools
+
+from surch import pack
+from surch import repo
+from surch import patterns
+from surch import constants
+from surch.tests import helpers
+
+SEARCH_LIST = ['secret', 'a\\+b', 'a+b', 'foo.bar', '^bar', 'o\\$',
+               '[^x]token', 'x\\{2\\}', '\\(l\\)ine\\1', '[[:digit:]]z',
+               'first\\|zzz', '*star', 'sec\\-ret', 'end$']
+
+
+def _lines(count, word):
+    return ''.join('{0} {1}\n'.format(word, i) for i in range(count))
+
+
+class TestPatterns(testtools.TestCase):
+    def _matches(self, pattern, text):
+        return patterns.compile_search_list([pattern]).search(text) is not None
+
+    def test_basic_regular_expression_semantics(self):
+        self.assertTrue(self._matches('a+b', 'a+b'))
+        self.assertFalse(self._matches('a+b', 'aab'))
+        self.assertTrue(self._matches('a\\+b', 'aab'))
+        self.assertTrue(self._matches('\\(ab\\)\\{2\\}', 'abab'))
+        self.assertTrue(self._matches('*a', '*a'))
+        self.assertTrue(self._matches('a^b$c', 'a^b$c'))
+        self.assertTrue(self._matches('[]x]', ']'))
+        self.assertTrue(self._matches('[\\]', '\\'))
+        self.assertTrue(self._matches('\\<word\\>', 'a word here'))
+        self.assertFalse(self._matches('\\<word\\>', 'swordfish'))
+
+    def test_patterns_do_not_match_across_lines(self):
+        self.assertFalse(self._matches('a.b', 'a\nb'))
+        self.assertFalse(self._matches('a[^x]b', 'a\nb'))
+        self.assertTrue(self._matches('^b$', 'a\nb\nc'))
+
+    def test_back_references_are_renumbered(self):
+        regex = patterns.compile_search_list(
+            ['\\(x\\)\\1', '\\(y\\)\\1'])
+        self.assertTrue(regex.search('yy'))
+        self.assertFalse(regex.search('yx'))
+
+    def test_classify_fixed_strings(self):
+        self.assertEqual(
+            (['a+b', '*star', 'o$', 'sec-ret', 'a.b', ''],
+             ['foo.bar', '^bar', 'end$', 'x\\{2\\}', 'a\\+b', '[ab]']),
+            patterns.classify(['a+b', 'foo.bar', '*star', '^bar', 'o\\$',
+                               'sec\\-ret', 'end$', 'x\\{2\\}', 'a\\+b',
+                               'a\\.b', '[ab]', '']))
+
+    def test_fixed_strings_expression(self):
+        regex = patterns.compile_search_list(
+            ['abc', 'abd', 'ab', 'x\\.y', 'q\\*'])
+        for text in ('ab', 'abd', 'x.y', 'q*'):
+            self.assertTrue(regex.search(text))
+        for text in ('a', 'xzy', 'q'):
+            self.assertFalse(regex.search(text))
+
+    def test_invalid_pattern(self):
+        self.assertRaises(patterns.PatternError,
+                          patterns.compile_search_list, ['a\\'])
+        self.assertRaises(patterns.PatternError,
+                          patterns.compile_search_list, ['[a'])
+
+
+class TestNativeEngine(testtools.TestCase):
+    def setUp(self):
+        super(TestNativeEngine, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'packed')
+        big = _lines(400, 'filler')
+        helpers.create_local_repo(self.upstream, [
+            {'a.txt': big + 'secret\n', 'dir/plus': 'a+b\nfirst\n'},
+            {'a.txt': big + 'nothing\n', 'dir/sub/x': 'xx\ntoken\n'},
+            {'dir/plus': 'aab\nfoo bar\n', 'bin': 'x\0token\0o$'},
+            {'dir/sub/x': 'line1\nlinel\n*star\n', 'c': '1z\nbar\n'},
+        ])
+        helpers.git(self.upstream, 'checkout --quiet -b branch')
+        helpers.add_commit(self.upstream, {'b.txt': big + 'sec-ret end'})
+        helpers.git(self.upstream, 'tag -a -m tag v1')
+        helpers.git(self.upstream, 'checkout --quiet master')
+        os.symlink('secret', os.path.join(self.upstream, 'link'))
+        helpers.add_commit(self.upstream, {'a.txt': big + 'secret\n'})
+
+    def _search(self, engine, commit_range=None, search_list=SEARCH_LIST):
+        surch_repo = repo.Repo(
+            repo_url=self.upstream,
+            search_list=search_list,
+            engine=engine,
+            commit_range=commit_range,
+            results_dir=os.path.join(self.tmp, engine),
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'))
+        surch_repo._clone_or_pull()
+        surch_repo.search(search_list)
+        return sorted(
+            tuple(sorted(result.items())) for result in helpers.read_results(
+                os.path.join(self.tmp, engine, 'results.json')))
+
+    def _assert_engines_match(self):
+        grep_results = self._search('grep')
+        self.assertTrue(len(grep_results) > 10)
+        self.assertEqual(grep_results, self._search('native'))
+
+    def test_loose_objects_match_git_grep(self):
+        self._assert_engines_match()
+
+    def test_packed_deltas_match_git_grep(self):
+        helpers.git(self.upstream, 'gc --quiet --aggressive')
+        self._clone_and_run('repack -a -d -f -q --depth=50')
+        self._assert_engines_match()
+
+    def test_ref_deltas_match_git_grep(self):
+        self._clone_and_run(
+            '-c repack.useDeltaBaseOffset=false repack -a -d -f -q')
+        self._assert_engines_match()
+
+    def test_range_matches_git_grep(self):
+        commits = helpers.git(self.upstream, 'rev-list master').split()
+        commit_range = '{0}..{1}'.format(commits[2], commits[0])
+        self.assertEqual(self._search('grep', commit_range),
+                         self._search('native', commit_range))
+
+    def test_long_search_list_matches_git_grep(self):
+        search_list = SEARCH_LIST + ['filler {0}0'.format(i)
+                                     for i in range(400, 1000)]
+        with mock.patch.object(constants, 'PATTERN_ALTERNATION_SIZE', 7), \
+                mock.patch.object(constants, 'PATTERN_FILE_CHUNK_SIZE', 5):
+            grep_results = self._search('grep', search_list=search_list)
+        self.assertEqual(grep_results,
+                         self._search('native', search_list=search_list))
+        self.assertEqual(self._search('grep'), grep_results)
+
+    def _clone_and_run(self, command):
+        repo.Repo(repo_url=self.upstream,
+                  search_list=SEARCH_LIST,
+                  results_dir=self.tmp,
+                  cloned_repo_dir=os.path.join(self.tmp, 'clones')
+                  )._clone_or_pull()
+        helpers.git(os.path.join(self.tmp, 'clones', 'packed'), command)
+
+    def test_delta_base_cache_is_bounded(self):
+        cache = pack.DeltaBaseCache(max_size=100)
+        for key in range(10):
+            cache.put(key, ('blob', 'x' * 20))
+        self.assertEqual(100, cache.size)
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(('blob', 'x' * 20), cache.get(9))
+        cache.put('big', ('blob', 'x' * 50))
+        self.assertIsNone(cache.get('big'))
@@ -0,0 +1,118 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import shutil
+import tempfile
+
+import testtools
+
+from surch import repo, planner, scheduler, constants, organization
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+
+class TestPlanner(testtools.TestCase):
+    def setUp(self):
+        super(TestPlanner, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.clones = os.path.join(self.tmp, 'clones')
+        self.repo_path = os.path.join(self.clones, 'planned')
+        self.shas = helpers.create_local_repo(self.repo_path, [
+            {'a.txt': 'a' * 100, 'b.txt': 'b' * 10},
+            {'a.txt': 'a' * 200},
+            # The blob of the first a.txt again.
+            {'a.txt': 'a' * 100},
+        ])
+
+    def test_repo_stats(self):
+        self.assertEqual(
+            dict(commits=3, blobs=3, blob_bytes=310, head_bytes=110),
+            planner.repo_stats(self.repo_path))
+        # Blobs reachable from the start of the range aren't counted.
+        self.assertEqual(
+            dict(commits=2, blobs=1, blob_bytes=200, head_bytes=110),
+            planner.repo_stats(self.repo_path,
+                               revisions='{0}..'.format(self.shas[0])))
+        self.assertIsNone(planner.repo_stats(
+            os.path.join(self.clones, 'missing')))
+
+    def test_makespan(self):
+        self.assertEqual(10, planner.makespan([5, 4, 3, 3, 3], 2))
+        self.assertEqual(18, planner.makespan([5, 4, 3, 3, 3], 1))
+        self.assertEqual(0, planner.makespan([], 4))
+
+    def test_plan_scales_estimates_to_the_scanned_part(self):
+        costs = scheduler.Costs(os.path.join(self.tmp, 'results.json'))
+        costs.record('planned', 31, size=1)
+        repos = [dict(name='planned', size=1),
+                 dict(name='unknown', size=None)]
+        scan_plan = planner.plan(repos, self.clones, costs, workers=2)
+        self.assertEqual(
+            [dict(name='planned', size_kb=1, commits=3, blobs=3,
+                  scanned_bytes=310, seconds=31),
+             dict(name='unknown', size_kb=None, commits=None, blobs=None,
+                  scanned_bytes=None, seconds=0)],
+            scan_plan['repos'])
+        self.assertEqual(31, scan_plan['wall_seconds'])
+        head_plan = planner.plan(repos, self.clones, costs, head_only=True)
+        self.assertEqual(11, head_plan['repos'][0]['seconds'])
+
+    def test_repo_plan_does_not_scan(self):
+        results_dir = os.path.join(self.tmp, 'results')
+        os.makedirs(results_dir)
+        results_file_path = os.path.join(results_dir, 'results.json')
+        with open(results_file_path, 'w') as f:
+            f.write('{}')
+        repo.search(repo_url=os.path.join(self.tmp, 'upstream', 'planned'),
+                    search_list=['a'],
+                    results_dir=results_dir,
+                    cloned_repo_dir=self.clones,
+                    plan=True)
+        self.assertEqual(['results.json', constants.SCAN_PLAN_FILE],
+                         sorted(os.listdir(results_dir)))
+        with open(os.path.join(results_dir, constants.SCAN_PLAN_FILE)) as f:
+            self.assertEqual(3, json.load(f)['repos'][0]['commits'])
+
+
+class TestOrganizationPlan(testtools.TestCase):
+    def setUp(self):
+        super(TestOrganizationPlan, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        repos = [{'name': name, 'clone_url': os.path.join(self.tmp, name),
+                  'size': size} for name, size in (('small', 5),
+                                                   ('large', 500))]
+        self.api = FakeGitHub(owners={('orgs', 'org'): repos}).start()
+        self.addCleanup(self.api.stop)
+
+    def test_plan_without_queue_dir_reports_largest_first(self):
+        org = organization.Organization(
+            organization='org',
+            github_api_url=self.api.url,
+            results_dir=self.tmp,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones'),
+            workers=2)
+        org.plan()
+        with open(os.path.join(self.tmp, constants.SCAN_PLAN_FILE)) as f:
+            scan_plan = json.load(f)
+        self.assertEqual(['large', 'small'],
+                         [row['name'] for row in scan_plan['repos']])
+        self.assertEqual([500, 5],
+                         [row['size_kb'] for row in scan_plan['repos']])
+        self.assertEqual(2, scan_plan['workers'])
+        self.assertFalse(os.path.isdir(os.path.join(self.tmp, 'clones')))
@@ -0,0 +1,68 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import pstats
+import shutil
+import tempfile
+
+import testtools
+import click.testing as clicktest
+
+import surch.surch as surch
+from surch import profiling
+from surch.tests import helpers
+
+
+class TestProfiling(testtools.TestCase):
+    def setUp(self):
+        super(TestProfiling, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'profiled')
+        helpers.create_local_repo(self.upstream, [{'a.txt': 'secret\n'}])
+        self.log = os.path.join(self.tmp, 'log')
+
+    def _surch_repo(self, *args):
+        result = clicktest.CliRunner().invoke(surch.surch_repo, [
+            self.upstream, '-s', 'secret', '-l', self.log,
+            '-p', os.path.join(self.tmp, 'clones')] + list(args))
+        self.assertEqual(0, result.exit_code, result.output)
+
+    def test_profile_writes_reports_per_stage(self):
+        self._surch_repo('--profile')
+        self.assertIsNone(profiling._active)
+        files = os.listdir(self.log)
+        for name in ('setup', 'clone', 'list_commits', 'search',
+                     'write_results', 'report'):
+            self.assertIn('profile-{0}.pstats'.format(name), files)
+        stats = pstats.Stats(os.path.join(self.log, 'profile.pstats'))
+        self.assertTrue(any(function == '_search_commit'
+                            for _, _, function in stats.stats))
+        with open(os.path.join(self.log, 'profile.txt')) as report:
+            report = report.read()
+        self.assertIn('write_results', report)
+        self.assertIn('cumulative time', report)
+        if profiling.tracemalloc:
+            self.assertIn('allocations during search', report)
+        else:
+            # Memory is still measured per stage.
+            self.assertIn('object types created during search', report)
+            self.assertIn('rss grew', report)
+
+    def test_no_reports_without_profile(self):
+        self._surch_repo()
+        self.assertEqual([], [name for name in os.listdir(self.log)
+                              if name.startswith('profile')])
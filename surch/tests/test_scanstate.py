@@ -0,0 +1,170 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import shutil
+import tempfile
+
+import mock
+import testtools
+
+from surch import repo, delta, findings, scanstate
+from surch.tests import helpers
+
+
+class TestChanges(testtools.TestCase):
+    def test_changes(self):
+        digests = [scanstate.digest(pattern) for pattern in ('a', 'b')]
+        self.assertEqual((['c'], [digests[0]]),
+                         scanstate.changes(digests, ['b', 'c']))
+        self.assertEqual(([], []), scanstate.changes(digests[:1], ['a']))
+
+
+class TestStoredFindings(testtools.TestCase):
+    def test_findings_are_stored_compactly(self):
+        found = findings.Findings('org', 'repo')
+        commit = found.commit('c1', 'name', 'name@example.com', 'time')
+        for filepath in ('a.txt', 'b.txt'):
+            found.add(commit, filepath, 'blob-' + filepath, delta.fingerprint(
+                'org', 'repo', filepath, 'blob-' + filepath))
+        found.add(commit, 'a.txt', 'blob-a.txt', delta.fingerprint(
+            'org', 'repo', 'a.txt', 'blob-a.txt', 'entropy'), 'entropy')
+        commits, stored = scanstate.dump_findings([found])
+        # Each commit is stored once.
+        self.assertEqual([commit], commits)
+        self.assertEqual((0, 'b.txt', 'blob-b.txt', None), stored[1])
+
+        state = json.loads(json.dumps(dict(commits=commits,
+                                           findings=stored)))
+        loaded = scanstate.load_findings(state, 'org', 'repo')
+        self.assertEqual(list(found.rows()), list(loaded.rows()))
+
+
+class TestIncrementalScan(testtools.TestCase):
+    def setUp(self):
+        super(TestIncrementalScan, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'state')
+        helpers.create_local_repo(self.upstream, [
+            {'a.txt': 'password\n', 'b.txt': 'token\n'},
+            {'c.txt': 'password token\n'},
+        ])
+
+    def _search(self, search_list, results='results', **kwargs):
+        results_dir = os.path.join(self.tmp, results)
+        surch_repo = repo.Repo(repo_url=self.upstream,
+                               search_list=search_list,
+                               results_dir=results_dir,
+                               cloned_repo_dir=os.path.join(
+                                   self.tmp, results + '-clones'),
+                               **kwargs)
+        with mock.patch.object(surch_repo, '_search',
+                               wraps=surch_repo._search) as search:
+            surch_repo.search(search_list)
+        self.searched = [(list(args[0]), len(args[1]))
+                         for args, _ in search.call_args_list]
+        return sorted(
+            (result['commit_sha'], result['filepath'],
+             result.get('finding_type'))
+            for result in helpers.read_results(
+                os.path.join(results_dir, 'results.json')))
+
+    def _full_scan(self, search_list, **kwargs):
+        return self._search(search_list, results='full', rescan=True,
+                            **kwargs)
+
+    def _only_searches_what_changed(self, engine):
+        self._search(['password'], engine=engine)
+        self.assertEqual([(['password'], 2)], self.searched)
+        # Nothing changed.
+        self.assertEqual(self._full_scan(['password'], engine=engine),
+                         self._search(['password'], engine=engine))
+        self.assertEqual([], self.searched)
+        helpers.add_commit(self.upstream, {'d.txt': 'password\n'})
+        results = self._search(['password', 'token'], engine=engine)
+        self.assertEqual([(['password', 'token'], 1), (['token'], 2)],
+                         self.searched)
+        self.assertEqual(
+            self._full_scan(['password', 'token'], engine=engine), results)
+
+    def test_only_searches_what_changed(self):
+        self._only_searches_what_changed('grep')
+
+    def test_only_searches_what_changed_natively(self):
+        self._only_searches_what_changed('native')
+
+    def test_ignores_states_holding_rows(self):
+        self._search(['password'])
+        state_path = os.path.join(self.tmp, 'results', 'scan_state',
+                                  'upstream', 'state.json')
+        with open(state_path) as state_file:
+            state = json.load(state_file)
+        self.assertNotIn('results', state)
+        del state['findings']
+        state['results'] = []
+        with open(state_path, 'w') as state_file:
+            json.dump(state, state_file)
+        self._search(['password'])
+        self.assertEqual([(['password'], 2)], self.searched)
+
+    def test_search_list_is_not_stored(self):
+        self._search(['password'])
+        state_path = os.path.join(self.tmp, 'results', 'scan_state',
+                                  'upstream', 'state.json')
+        self.assertEqual(0o600, os.stat(state_path).st_mode & 0o777)
+        with open(state_path) as state_file:
+            state = json.load(state_file)
+        self.assertNotIn('password', json.dumps(state))
+        # States of older versions held the search list.
+        state['search_list'] = ['password']
+        del state['search_list_digests']
+        with open(state_path, 'w') as state_file:
+            json.dump(state, state_file)
+        self._search(['password'])
+        self.assertEqual([(['password'], 2)], self.searched)
+
+    def test_repos_of_different_owners(self):
+        self._search(['password'])
+        shutil.rmtree(os.path.join(self.tmp, 'results-clones'))
+        self.upstream = os.path.join(self.tmp, 'other', 'state')
+        helpers.create_local_repo(self.upstream, [{'d.txt': 'token\n'}])
+        self._search(['password', 'token'])
+        self.assertEqual([(['password', 'token'], 1)], self.searched)
+        for owner in ('upstream', 'other'):
+            self.assertTrue(os.path.isfile(os.path.join(
+                self.tmp, 'results', 'scan_state', owner, 'state.json')))
+
+    def test_drops_the_results_of_removed_strings(self):
+        self._search(['password', 'token'])
+        results = self._search(['token'])
+        self.assertEqual([], self.searched)
+        self.assertEqual(self._full_scan(['token']), results)
+        self.assertEqual([], self._search(['nothing-like-it']))
+
+    def test_other_options_scan_everything(self):
+        self._search(['password'])
+        self._search(['password'], results='results',
+                     suppressions=self._suppressions())
+        self.assertEqual([(['password'], 2)], self.searched)
+        self._search(['password'], rescan=True)
+        self.assertEqual([(['password'], 2)], self.searched)
+
+    def _suppressions(self):
+        path = os.path.join(self.tmp, 'suppressions.yaml')
+        with open(path, 'w') as f:
+            f.write('paths: [b.txt]\n')
+        return path
@@ -0,0 +1,107 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import json
+import shutil
+import tempfile
+
+import testtools
+
+from surch import journal
+from surch import scheduler
+from surch import constants
+from surch import organization
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+
+class TestCosts(testtools.TestCase):
+    def setUp(self):
+        super(TestCosts, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.costs = scheduler.Costs(os.path.join(self.tmp, 'results.json'))
+
+    def test_estimates_unscanned_repos_by_size(self):
+        repos = [{'name': 'small', 'size': 10}, {'name': 'big', 'size': 1000},
+                 {'name': 'empty', 'size': None}]
+        self.assertEqual({'small': 10, 'big': 1000, 'empty': 0},
+                         self.costs.estimate(repos))
+        self.assertEqual(['big', 'small', 'empty'], [
+            repo_data['name'] for repo_data in scheduler.largest_first(
+                repos, self.costs.estimate(repos))])
+
+    def test_estimates_scanned_repos_by_their_last_scan(self):
+        self.costs.record('slow', 30, size=100)
+        self.costs.record('fast', 10, size=300)
+        self.costs.save()
+        costs = scheduler.Costs(os.path.join(self.tmp, 'results.json'))
+        estimates = costs.estimate([
+            {'name': 'slow', 'size': 100},
+            # Twice as large as when it was scanned.
+            {'name': 'fast', 'size': 600},
+            # At 40 seconds for 400 KB.
+            {'name': 'new', 'size': 50}])
+        self.assertEqual({'slow': 30, 'fast': 20, 'new': 5}, estimates)
+
+
+class TestParallelScan(testtools.TestCase):
+    def setUp(self):
+        super(TestParallelScan, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        repos = []
+        for index, size in enumerate([5, 500, 50, 5000, 0, 50000]):
+            name = 'repo{0}'.format(index)
+            repo_path = os.path.join(self.tmp, 'upstream', name)
+            helpers.create_local_repo(repo_path, [
+                {'a.txt': 'surch {0}\n'.format(index)},
+                {'b.txt': 'nothing\n'}])
+            repos.append({'name': name, 'clone_url': repo_path, 'size': size,
+                          'pushed_at': '2016-07-12T10:15:30Z'})
+        self.api = FakeGitHub(owners={('orgs', 'org'): repos}).start()
+        self.addCleanup(self.api.stop)
+        self.results_file_path = os.path.join(self.tmp, 'results.json')
+
+    def _search(self, workers):
+        org = organization.Organization(
+            organization='org',
+            github_api_url=self.api.url,
+            search_list=['surch'],
+            results_dir=self.tmp,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones'),
+            workers=workers)
+        org.search(['surch'])
+
+    def test_largest_repos_are_scanned_first(self):
+        self._search(workers=1)
+        with open(journal.Journal(self.results_file_path).path) as f:
+            started = [json.loads(line)['repo_name'] for line in f
+                       if json.loads(line)['event'] == journal.STARTED]
+        self.assertEqual(
+            ['repo5', 'repo3', 'repo1', 'repo2', 'repo0', 'repo4'], started)
+
+    def test_workers_write_all_results_and_costs(self):
+        self._search(workers=3)
+        results = helpers.read_results(self.results_file_path)
+        # Each repo's two commits contain a.txt.
+        self.assertEqual(12, len(results))
+        with open(os.path.join(self.tmp, constants.REPO_COSTS_FILE)) as f:
+            costs = json.load(f)
+        self.assertEqual(6, len(costs))
+        self.assertEqual(2, costs['repo3']['commits'])
+        self.assertEqual(5000, costs['repo3']['size'])
+        self.assertEqual('2016-07-12T10:15:30Z', costs['repo3']['pushed_at'])
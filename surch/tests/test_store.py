@@ -0,0 +1,94 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import testtools
+
+from surch import repo
+from surch import store
+from surch.tests import helpers
+
+
+def _local_objects(repo_path):
+    counts = dict(line.split(': ') for line in helpers.git(
+        repo_path, 'count-objects -v').splitlines())
+    return int(counts['count']) + int(counts['in-pack'])
+
+
+class TestSharedStore(testtools.TestCase):
+    def setUp(self):
+        super(TestSharedStore, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'project')
+        helpers.create_local_repo(self.upstream, [
+            {'a.txt': 'secret\n'}, {'b.txt': 'nothing\n'}])
+        self.fork = os.path.join(self.tmp, 'upstream', 'fork')
+        helpers.git(self.tmp, 'clone --quiet {0} {1}'.format(
+            self.upstream, self.fork))
+        helpers.add_commit(self.fork, {'c.txt': 'secret\n'})
+        self.clones = os.path.join(self.tmp, 'clones')
+        self.shared_store = store.SharedStore(self.clones)
+
+    def _search(self, repo_path):
+        # Clones of local paths copy all objects, unlike other transports.
+        surch_repo = repo.Repo(
+            repo_url='file://' + repo_path,
+            search_list=['secret'],
+            shared_store=True,
+            results_dir=os.path.join(self.tmp, 'results'),
+            cloned_repo_dir=self.clones)
+        surch_repo.search(['secret'])
+        return surch_repo.result_count
+
+    def test_clones_borrow_objects_from_the_store(self):
+        self.assertEqual(2, self._search(self.upstream))
+        self.assertEqual(4, self._search(self.fork))
+        self.assertEqual(
+            [('fork', os.path.join(self.clones, 'fork')),
+             ('project', os.path.join(self.clones, 'project'))],
+            self.shared_store.clones())
+        for name in ('project', 'fork'):
+            self.assertEqual(
+                0, _local_objects(os.path.join(self.clones, name)))
+        # The objects of the upstream are stored once.
+        self.assertEqual(
+            helpers.git(self.fork, 'count-objects -v'),
+            helpers.git(self.shared_store.path, 'count-objects -v'))
+
+    def test_gc_keeps_objects_reachable_from_clones(self):
+        self._search(self.upstream)
+        self._search(self.fork)
+        clone = os.path.join(self.clones, 'project')
+        old_head = helpers.git(clone, 'rev-parse HEAD')
+        # Rewrite the upstream history, so only the clone still has
+        # refs to its last commit.
+        helpers.git(self.upstream, 'reset --quiet --hard HEAD~1')
+        helpers.add_commit(self.upstream, {'d.txt': 'rewritten\n'})
+        self.shared_store.fetch('project', self.upstream)
+        shutil.rmtree(os.path.join(self.clones, 'fork'))
+
+        self.shared_store.gc(prune='now')
+
+        helpers.git(clone, 'fsck --no-dangling --no-progress')
+        self.assertEqual(old_head, helpers.git(clone, 'rev-parse HEAD'))
+        self.assertEqual(set(['project']), self.shared_store._namespaces())
+
+    def test_gc_without_store(self):
+        os.makedirs(self.clones)
+        self.assertRaises(SystemExit, store.gc, self.clones)
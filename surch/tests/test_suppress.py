@@ -0,0 +1,128 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+from collections import Counter
+
+import yaml
+import testtools
+
+from surch import repo, suppress
+from surch.tests import helpers
+
+
+class TestSuppressionIndex(testtools.TestCase):
+    def setUp(self):
+        super(TestSuppressionIndex, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+
+    def _write(self, suppressions, name='suppressions.yaml'):
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w') as f:
+            yaml.safe_dump(suppressions, f)
+        return path
+
+    def test_matches(self):
+        index = suppress.SuppressionIndex(
+            blob_shas=['b1'], paths=['tests/fixtures/*', '*.example'],
+            patterns=['EXAMPLEKEY'], fingerprints=['f1'])
+        self.assertTrue(index.path('tests/fixtures/deep/keys.json'))
+        self.assertTrue(index.path('conf/app.yaml.example'))
+        self.assertFalse(index.path('src/tests/fixtures/keys.json'))
+        self.assertEqual(suppress.BLOB_SHA, index.blob('b1', 'f2'))
+        self.assertEqual(suppress.FINGERPRINT, index.blob('b2', 'f1'))
+        self.assertIsNone(index.blob('b2', 'f2'))
+        self.assertEqual(['secret'], index.filter_search_list(
+            ['secret', 'EXAMPLEKEY']))
+
+    def test_empty_index_suppresses_nothing(self):
+        index = suppress.load(self._write({}))
+        self.assertFalse(index.path('a.txt'))
+        self.assertIsNone(index.blob('b1', 'f1'))
+
+    def test_load_is_cached_until_the_file_changes(self):
+        path = self._write({'paths': ['a/*']})
+        index = suppress.load(path)
+        self.assertIs(index, suppress.load(path))
+        self._write({'paths': ['b/*']})
+        os.utime(path, (0, 0))
+        self.assertTrue(suppress.load(path).path('b/c'))
+
+    def test_missing_file(self):
+        self.assertRaises(SystemExit, suppress.load,
+                          os.path.join(self.tmp, 'missing.yaml'))
+
+    def test_summary(self):
+        self.assertEqual(
+            'Suppressed 3 known false positives (1 by blob_sha, 2 by path).',
+            suppress.summary({'path': 2, 'blob_sha': 1}))
+
+    def test_patterns_are_counted_once_per_run(self):
+        total = Counter()
+        for counts in ({'pattern': 1, 'path': 2}, {'pattern': 1, 'path': 1}):
+            suppress.add(total, counts)
+        self.assertEqual({'pattern': 1, 'path': 3}, dict(total))
+
+
+class TestRepoSuppressions(testtools.TestCase):
+    def setUp(self):
+        super(TestRepoSuppressions, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'fixtures')
+        helpers.create_local_repo(self.upstream, [
+            {'app.py': 'password = secret\n',
+             'tests/fixtures/config.yaml': 'password: secret\n',
+             'README.md': 'token: EXAMPLEKEY\n'},
+        ])
+        self.example_blob = helpers.git(self.upstream,
+                                        'rev-parse HEAD:README.md')
+
+    def _search(self, suppressions, engine='grep'):
+        path = os.path.join(self.tmp, 'suppressions.yaml')
+        with open(path, 'w') as f:
+            yaml.safe_dump(suppressions, f)
+        results_dir = os.path.join(self.tmp, 'results')
+        surch_repo = repo.search(
+            repo_url=self.upstream,
+            search_list=['secret', 'EXAMPLEKEY'],
+            engine=engine,
+            results_dir=results_dir,
+            cloned_repo_dir=os.path.join(self.tmp, 'clones'),
+            suppressions=path,
+            # Every engine searches the repo again.
+            rescan=True)
+        return surch_repo, sorted(
+            result['filepath'] for result in helpers.read_results(
+                os.path.join(results_dir, 'results.json')))
+
+    def test_suppressed_findings_are_not_written(self):
+        for engine in ('grep', 'native'):
+            surch_repo, filepaths = self._search(
+                {'paths': ['tests/fixtures/*'],
+                 'blob_shas': [self.example_blob]}, engine=engine)
+            self.assertEqual(['app.py'], filepaths)
+            self.assertEqual({suppress.PATH: 1, suppress.BLOB_SHA: 1},
+                             dict(surch_repo.suppressed))
+            self.assertEqual(1, surch_repo.result_count)
+
+    def test_suppressed_patterns_are_not_searched(self):
+        surch_repo, filepaths = self._search({'patterns': ['EXAMPLEKEY']})
+        self.assertEqual(['app.py', 'tests/fixtures/config.yaml'],
+                         filepaths)
+        self.assertEqual({suppress.PATTERN: 1}, dict(surch_repo.suppressed))
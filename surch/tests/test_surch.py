@@ -16,15 +16,19 @@
 import os
 import json
 import mock
+import shutil
+import tempfile
 
 import testtools
 import click.testing as clicktest
 
 from surch import repo
 from surch import utils
+from surch import backends
 import surch.surch as surch
 from surch import constants
 from surch import organization
+from surch.tests import helpers
 
 
 def _invoke_click(func, args=None, opts=None):
@@ -107,17 +111,17 @@ class TestRepo(testtools.TestCase):
         utils.remove_repos_folder(test_path)
 
     def test_create_search_strings(self):
-        Repo = repo.Repo(repo_url='',
-                         search_list='',
-                         verbose=False,
-                         results_dir=None,
-                         print_result=False,
-                         cloned_repo_dir=None,
-                         consolidate_log=False,
-                         remove_cloned_dir=False)
-        search_list = Repo._create_search_string(['a', 'b', 'c'])
-        success = search_list == "'a' --or -e 'b' --or -e 'c'"
-        self.assertTrue(success)
+        patterns_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, patterns_dir)
+        with mock.patch.object(constants, 'PATTERN_FILE_CHUNK_SIZE', 2):
+            grep_options = backends.create_pattern_files(
+                ['a', 'b.c', 'd\\.e', 'f', 'g\\+'], patterns_dir)
+        fixed_path = os.path.join(patterns_dir, 'fixed-0')
+        self.assertEqual(['-E -f ' + fixed_path,
+                          '-G -f ' + os.path.join(patterns_dir, 'regex-0')],
+                         grep_options)
+        with open(fixed_path) as fixed_file:
+            self.assertEqual('a|d\\.e|f\n', fixed_file.read())
 
     def test_clone_or_pull(self):
         repo_class = repo.Repo(
@@ -157,6 +161,48 @@ class TestRepo(testtools.TestCase):
         dicts_num = count_dicts_in_results_file(result_path)
         self.assertTrue(dicts_num > 0)
 
+    def test_surch_repo_command_with_range(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        upstream = os.path.join(tmp, 'upstream', 'ranged')
+        first, second, third = helpers.create_local_repo(
+            upstream, [{'a.txt': 'surch'}, {'b.txt': 'surch'}, {'c': ''}])
+        opts = {
+            '-s': 'surch',
+            '-p': os.path.join(tmp, 'clones'),
+            '-l': tmp,
+            '--range=': '{0}..{1}'.format(first, third)}
+        result = _invoke_click('surch_repo', [upstream], opts)
+        self.assertEqual(0, result.exit_code)
+        results = helpers.read_results(os.path.join(tmp, 'results.json'))
+        self.assertEqual(
+            set([second, third]), set(r['commit_sha'] for r in results))
+        self.assertEqual(4, len(results))
+
+    def test_search_introduced_reports_only_introducing_commits(self):
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        upstream = os.path.join(tmp, 'upstream', 'introduced')
+        first, _, third, _, _ = helpers.create_local_repo(upstream, [
+            {'a.txt': 'key=surch\n'},
+            {'a.txt': 'key=surch\nother\n'},
+            {'dir/b c.txt': '++ surch\n'},
+            {'a.txt': 'other\n'},
+            {'a.txt': 'key=surch\n'}])
+        repo_class = repo.Repo(repo_url=upstream,
+                               search_list=['surch'],
+                               introduced=True,
+                               results_dir=tmp,
+                               cloned_repo_dir=os.path.join(tmp, 'clones'))
+        repo_class.search(['surch'])
+        results = helpers.read_results(os.path.join(tmp, 'results.json'))
+        self.assertEqual(
+            sorted([(first, 'a.txt'), (third, 'dir/b c.txt')]),
+            sorted((r['commit_sha'], r['filepath']) for r in results))
+        self.assertEqual(set(['surch@example.com']),
+                         set(r['email'] for r in results))
+        self.assertEqual(5, repo_class.commits)
+
 
 class TestUtils(testtools.TestCase):
     def test_read_config_file(self):
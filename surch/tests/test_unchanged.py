@@ -0,0 +1,91 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import testtools
+
+from surch import journal, constants, organization
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+
+class TestUnchangedRepositories(testtools.TestCase):
+    def setUp(self):
+        super(TestUnchangedRepositories, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.repos = []
+        for name in ('first', 'second'):
+            repo_path = os.path.join(self.tmp, 'upstream', name)
+            helpers.create_local_repo(repo_path, [
+                {'a.txt': 'secret\n'}, {'b.txt': 'secret\n'}])
+            self.repos.append({'name': name, 'clone_url': repo_path,
+                               'size': 10,
+                               'pushed_at': '2016-07-12T10:15:30Z'})
+        self.api = FakeGitHub(owners={('orgs', 'org'): self.repos}).start()
+        self.addCleanup(self.api.stop)
+        self.results_file_path = os.path.join(self.tmp, 'results.json')
+
+    def _search(self, search_list=('secret',), **kwargs):
+        organization.Organization(
+            organization='org',
+            github_api_url=self.api.url,
+            github_cache_dir=os.path.join(self.tmp, 'cache'),
+            cache_ttl=0,
+            results_dir=self.tmp,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones'),
+            **kwargs).search(list(search_list))
+        return dict((entry['repo_name'], entry.get('carried', False))
+                    for entry in journal.Journal(
+                        self.results_file_path).read().values())
+
+    def _results(self):
+        return sorted((result['repository_name'], result['filepath'])
+                      for result in helpers.read_results(
+                          self.results_file_path))
+
+    def test_carries_the_results_of_unchanged_repositories(self):
+        self.assertEqual({'first': False, 'second': False}, self._search())
+        results = self._results()
+        self.assertEqual(6, len(results))
+        self.assertEqual({'first': True, 'second': True}, self._search())
+        self.assertEqual(results, self._results())
+        self.assertEqual([], helpers.read_results(os.path.join(
+            self.tmp, constants.NEW_RESULTS_FILE)))
+        self.assertEqual([], helpers.read_results(os.path.join(
+            self.tmp, constants.RESOLVED_RESULTS_FILE)))
+
+    def test_scans_pushed_repositories(self):
+        self._search()
+        self.repos[0]['pushed_at'] = '2016-07-13T10:15:30Z'
+        helpers.add_commit(self.repos[1]['clone_url'], {'c.txt': 'secret\n'})
+        self.assertEqual({'first': False, 'second': False}, self._search())
+        self.assertEqual(9, len(self._results()))
+        self.assertEqual({'first': True, 'second': True}, self._search())
+        self.assertEqual(9, len(self._results()))
+
+    def test_scans_for_other_strings_again(self):
+        self._search()
+        self.assertEqual({'first': False, 'second': False},
+                         self._search(search_list=['secret', 'token']))
+
+    def test_rescan(self):
+        self._search()
+        self.assertEqual({'first': False, 'second': False},
+                         self._search(rescan=True))
+        self.assertEqual(6, len(self._results()))
@@ -0,0 +1,142 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import hmac
+import json
+import shutil
+import hashlib
+import tempfile
+import functools
+import threading
+
+import fixtures
+import requests
+import testtools
+
+from surch import webhook
+from surch.tests import helpers
+
+
+class TestPushReceiver(testtools.TestCase):
+    def setUp(self):
+        super(TestPushReceiver, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'pushed')
+        self.results_dir = os.path.join(self.tmp, 'results')
+        self.first, self.second = helpers.create_local_repo(
+            self.upstream, [{'a.txt': 'old secret\n'},
+                            {'b.txt': 'nothing here\n'}])
+        # Local paths aren't accepted as clone urls, have git fetch the
+        # remote url from the local repository instead.
+        self.clone_url = 'https://github.com/org/pushed.git'
+        for name, value in (
+                ('GIT_CONFIG_COUNT', '1'),
+                ('GIT_CONFIG_KEY_0',
+                 'url.{0}.insteadOf'.format(self.upstream)),
+                ('GIT_CONFIG_VALUE_0', self.clone_url)):
+            self.useFixture(fixtures.EnvironmentVariable(name, value))
+        self.receiver = webhook.PushReceiver(
+            port=0,
+            secret='s3cr3t',
+            search_list=['secret'],
+            results_dir=self.results_dir,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones'))
+        server = threading.Thread(target=self.receiver.serve_forever)
+        server.daemon = True
+        server.start()
+        self.addCleanup(self.receiver.shutdown)
+        self.url = 'http://{0}:{1}/'.format(*self.receiver.address)
+
+    def _send(self, payload, event='push', secret='s3cr3t'):
+        body = json.dumps(payload)
+        signature = 'sha1={0}'.format(
+            hmac.new(secret, body, hashlib.sha1).hexdigest())
+        return requests.post(self.url, data=body, headers={
+            'X-GitHub-Event': event, 'X-Hub-Signature': signature})
+
+    def _push(self, before, after):
+        return {'before': before,
+                'after': after,
+                'repository': {'clone_url': self.clone_url}}
+
+    def test_push_scans_only_pushed_range(self):
+        third = helpers.add_commit(self.upstream, {'c.txt': 'new secret\n'})
+        response = self._send(self._push(self.second, third))
+        self.assertEqual(202, response.status_code)
+        self.receiver.pushes.join()
+        results = helpers.read_results(
+            os.path.join(self.results_dir, 'results.json'))
+        self.assertEqual(
+            [(third, 'a.txt'), (third, 'c.txt')],
+            sorted((r['commit_sha'], r['filepath']) for r in results))
+
+    def test_failing_push_does_not_stop_the_worker(self):
+        scan_push = self.receiver.scan_push
+        failures = [SystemExit(1)]
+
+        def failing_scan_push(*args):
+            if failures:
+                raise failures.pop()
+            return scan_push(*args)
+        self.receiver.scan_push = failing_scan_push
+        third = helpers.add_commit(self.upstream, {'c.txt': 'new secret\n'})
+        for _ in range(2):
+            self.assertEqual(202, self._send(
+                self._push(self.second, third)).status_code)
+        self.receiver.pushes.join()
+        self.assertEqual([], failures)
+        results = helpers.read_results(
+            os.path.join(self.results_dir, 'results.json'))
+        self.assertEqual(2, len(results))
+
+    def test_bad_signature_is_rejected(self):
+        response = self._send(
+            self._push(self.first, self.second), secret='wrong')
+        self.assertEqual(403, response.status_code)
+        self.assertTrue(self.receiver.pushes.empty())
+
+    def test_ping_and_deleted_branch_are_not_scanned(self):
+        self.assertEqual(200, self._send({}, event='ping').status_code)
+        response = self._send(self._push(self.second, webhook.NULL_SHA))
+        self.assertEqual(202, response.status_code)
+        self.assertTrue(self.receiver.pushes.empty())
+
+    def test_invalid_payload(self):
+        payload = self._push(self.first, self.second)
+        for clone_url in ('repo; rm -rf /', '-u/path/to/prog',
+                          self.upstream, 'file:///home/x/private',
+                          '-u@host:repo', 'https://-host/repo'):
+            payload['repository']['clone_url'] = clone_url
+            self.assertEqual(400, self._send(payload).status_code)
+        self.assertEqual(400, self._send({'zen': 'hi'}).status_code)
+
+    def test_accepts_remote_clone_urls(self):
+        for clone_url in ('https://github.com/org/repo.git',
+                          'ssh://git@github.com/org/repo.git',
+                          'git@github.com:org/repo.git'):
+            self.assertEqual((clone_url, self.second),
+                             self.receiver.parse_push({
+                                 'before': webhook.NULL_SHA,
+                                 'after': self.second,
+                                 'repository': {'clone_url': clone_url}}))
+
+    def test_requires_a_secret_off_loopback(self):
+        receive = functools.partial(
+            webhook.PushReceiver, port=0, search_list=['secret'])
+        self.assertRaises(SystemExit, receive, host='0.0.0.0')
+        receiver = receive(host='127.0.0.1')
+        receiver.server.server_close()
@@ -0,0 +1,127 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+import testtools
+
+from surch import workqueue, constants
+from surch import organization
+from surch.tests import helpers
+from surch.tests.fake_github import FakeGitHub
+
+
+class TestWorkQueue(testtools.TestCase):
+    def setUp(self):
+        super(TestWorkQueue, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.queue_dir = os.path.join(self.tmp, 'queue')
+        repos = []
+        for index in range(6):
+            name = 'repo{0}'.format(index)
+            repo_path = os.path.join(self.tmp, 'upstream', name)
+            helpers.create_local_repo(repo_path, [
+                {'a.txt': 'surch {0}\n'.format(index)},
+                {'b.txt': 'nothing\n'}])
+            repos.append({'name': name, 'clone_url': repo_path})
+        self.api = FakeGitHub(owners={('orgs', 'org'): repos}).start()
+        self.addCleanup(self.api.stop)
+
+    def _plan(self):
+        org = organization.Organization(
+            organization='org', github_api_url=self.api.url,
+            results_dir=self.tmp)
+        org.plan(queue_dir=self.queue_dir, search_list=['surch'])
+        return workqueue.WorkQueue(self.queue_dir, lease_ttl=2)
+
+    def _worker(self, index):
+        return workqueue.Worker(
+            self.queue_dir, lease_ttl=2, poll_interval=0.2,
+            cloned_repos_dir=os.path.join(self.tmp, 'clones', str(index)))
+
+    def test_plan_writes_a_unit_per_repo(self):
+        queue = self._plan()
+        self.assertEqual(6, len(queue.units()))
+        self.assertEqual(['surch'], queue.read_plan()['search_list'])
+        self.assertRaises(SystemExit, self._plan)
+
+    def test_workers_share_the_queue(self):
+        self._plan()
+        workers = [multiprocessing.Process(target=self._worker(i).work)
+                   for i in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(60)
+            self.assertEqual(0, worker.exitcode)
+        results_dir = os.path.join(self.tmp, 'merged')
+        self.assertEqual([], workqueue.merge(self.queue_dir, results_dir))
+        results = helpers.read_results(
+            os.path.join(results_dir, 'results.json'))
+        # Each repo's two commits contain a.txt.
+        self.assertEqual(12, len(results))
+        self.assertEqual(6, len(set(r['repository_name'] for r in results)))
+
+    def test_expired_leases_are_reclaimed(self):
+        queue = self._plan()
+        units = queue.units()
+        for unit_id in units:
+            self.assertEqual(unit_id, queue.claim('dead-worker'))
+        self.assertIsNone(queue.claim('worker'))
+
+        past = time.time() - 60
+        os.utime(os.path.join(queue.leases_dir, units[3]), (past, past))
+        self.assertEqual(units[3], queue.claim('worker'))
+        self.assertIsNone(queue.claim('worker'))
+
+        # A worker waits for the remaining leases to expire.
+        self.assertEqual(6, self._worker(0).work())
+        self.assertEqual([], queue.pending())
+
+    def test_failing_unit_is_given_up(self):
+        self.patch(constants, 'CLONE_BACKOFF', 0)
+        queue = self._plan()
+        broken = queue.units()[2]
+        shutil.rmtree(queue.read_unit(broken)['repo_url'])
+        # The worker doesn't retry the unit forever.
+        self.assertEqual(5, self._worker(0).work())
+        self.assertEqual([broken], queue.failed().keys())
+        self.assertEqual(constants.QUEUE_MAX_ATTEMPTS,
+                         len(os.listdir(queue.attempts_dir)))
+        self.assertEqual([], queue.pending())
+        self.assertIsNone(queue.claim('worker'))
+
+        results_dir = os.path.join(self.tmp, 'merged')
+        self.assertEqual([broken], workqueue.merge(self.queue_dir,
+                                                   results_dir))
+        results = helpers.read_results(
+            os.path.join(results_dir, 'results.json'))
+        self.assertEqual(5, len(set(r['repository_name'] for r in results)))
+
+    def test_late_worker_does_not_override_the_done_unit(self):
+        queue = self._plan()
+        unit_id = queue.units()[0]
+        for worker_id in ('first', 'second'):
+            os.makedirs(queue.shard_dir(unit_id, worker_id))
+            queue.complete(unit_id, worker_id)
+        self.assertEqual(
+            os.path.join(queue.shard_dir(unit_id, 'first'), 'results.json'),
+            queue.done_shards()[unit_id])
+        self.assertFalse(os.path.isdir(queue.shard_dir(unit_id, 'second')))
@@ -0,0 +1,93 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import shutil
+import tempfile
+
+import testtools
+
+from surch import repo
+from surch import entropy
+from surch import worktree
+from surch.tests import helpers
+
+KEY = 'AKIAx9Qz3vLm0pT7Rw2sYb5NcJ8hUe4KfG6dV1iO'
+
+
+class TestHeadOnly(testtools.TestCase):
+    def setUp(self):
+        super(TestHeadOnly, self).setUp()
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp)
+        self.upstream = os.path.join(self.tmp, 'upstream', 'project')
+        helpers.create_local_repo(self.upstream, [
+            {'a.txt': 'secret\n', 'b.txt': 'nothing\n'},
+            {'a.txt': 'removed\n', 'dir/c.txt': 'a token\n',
+             'empty.txt': '', 'key.py': "KEY = '{0}'\n".format(KEY)},
+        ])
+        self.head = helpers.git(self.upstream, 'rev-parse HEAD').strip()
+        self.clones = os.path.join(self.tmp, 'clones')
+
+    def _search(self, search_list, **kwargs):
+        results_dir = os.path.join(self.tmp, 'results')
+        surch_repo = repo.Repo(
+            repo_url=self.upstream,
+            search_list=search_list,
+            head_only=True,
+            results_dir=results_dir,
+            cloned_repo_dir=self.clones,
+            **kwargs)
+        surch_repo.search(search_list)
+        return sorted(
+            (result['commit_sha'], result['filepath'],
+             result.get('finding_type'))
+            for result in helpers.read_results(
+                os.path.join(results_dir, 'results.json')))
+
+    def test_only_head_files_are_reported(self):
+        self.assertEqual(
+            [(self.head, 'dir/c.txt', None)],
+            self._search(['secret', 'token']))
+
+    def test_modified_files_fall_back_to_the_head_tree(self):
+        self._search(['token'])
+        with open(os.path.join(self.clones, 'project', 'b.txt'), 'w') as f:
+            f.write('token\n')
+        self.assertEqual(
+            [(self.head, 'dir/c.txt', None)], self._search(['token']))
+
+    @testtools.skipIf(entropy.numpy is None, 'NumPy is not installed')
+    def test_entropy(self):
+        self.assertEqual(
+            [(self.head, 'dir/c.txt', None),
+             (self.head, 'key.py', 'entropy')],
+            self._search(['token'], entropy=True))
+
+    def test_cannot_be_combined_with_introduced(self):
+        self.assertRaises(SystemExit, repo.Repo,
+                          repo_url=self.upstream,
+                          search_list=['secret'],
+                          head_only=True,
+                          introduced=True,
+                          results_dir=self.tmp)
+
+    def test_files_skip_submodules_and_symlinks(self):
+        os.symlink('a.txt', os.path.join(self.upstream, 'link'))
+        helpers.git(self.upstream, 'add link')
+        searcher = worktree.WorktreeSearch(self.upstream)
+        self.assertEqual(
+            ['a.txt', 'b.txt', 'dir/c.txt', 'empty.txt', 'key.py'],
+            sorted(searcher.files()))
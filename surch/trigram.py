@@ -0,0 +1,271 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import sys
+import array
+import sqlite3
+import logging
+import subprocess
+from binascii import unhexlify
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from . import pack, utils, patterns, constants
+
+# The trigram index of a clone lists, for every sequence of 3 bytes, the
+# blobs which contain it. It is a SQLite database in the clone's `.git`
+# directory, so it goes away with the clone. Blobs are numbered in the
+# order they are indexed, and the posting list of a trigram is an array
+# of these numbers. Updating the index only reads the blobs reachable
+# from the refs which aren't indexed yet, and appends them to the
+# posting lists.
+#
+# A match of a pattern contains the strings `patterns.required_substrings`
+# returns, so only the blobs having all their trigrams can match it. The
+# native backends read and match these candidate blobs only. Patterns
+# without a required string of 3 bytes or more can't be narrowed down,
+# and neither can entropy detection, which reads every blob.
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS blobs '
+    '(id INTEGER PRIMARY KEY, sha BLOB UNIQUE)',
+    'CREATE TABLE IF NOT EXISTS postings '
+    '(trigram INTEGER PRIMARY KEY, blobs BLOB)',
+)
+# SQLite's default limit of variables per statement.
+MAX_VARIABLES = 999
+
+
+def _key(trigram):
+    return (ord(trigram[0]) << 16) | (ord(trigram[1]) << 8) | ord(trigram[2])
+
+
+def _trigram_array(data):
+    chars = numpy.frombuffer(data, dtype=numpy.uint8).astype(numpy.uint32)
+    return numpy.unique((chars[:-2] << 16) | (chars[1:-1] << 8) | chars[2:])
+
+
+def trigrams(data):
+    """Return the distinct trigrams of data as integers
+    """
+    if len(data) < 3:
+        return []
+    if numpy is not None:
+        return _trigram_array(data).tolist()
+    return [_key(trigram) for trigram in
+            set(data[i:i + 3] for i in xrange(len(data) - 2))]
+
+
+def postings(blobs):
+    """Return the (trigram, packed array of blob ids) posting lists of
+    (blob id, data) pairs, blob ids in increasing order
+    """
+    if numpy is None:
+        blob_ids = {}
+        for blob_id, data in blobs:
+            for key in trigrams(data):
+                blob_ids.setdefault(key, array.array('I')).append(blob_id)
+        return [(key, ids.tostring()) for key, ids in blob_ids.iteritems()]
+    keys = []
+    ids = []
+    for blob_id, data in blobs:
+        if len(data) >= 3:
+            keys.append(_trigram_array(data))
+            ids.append(numpy.full(len(keys[-1]), blob_id, numpy.uint32))
+    if not keys:
+        return []
+    # Sorting by trigram then blob id keeps the ids of a trigram in order.
+    pairs = numpy.concatenate(keys).astype(numpy.uint64) << 32
+    pairs |= numpy.concatenate(ids)
+    pairs.sort()
+    keys = (pairs >> 32).astype(numpy.uint32)
+    ids = pairs.astype(numpy.uint32)
+    starts = numpy.flatnonzero(numpy.diff(keys)) + 1
+    return [(int(keys[start]), ids[start:end].tostring())
+            for start, end in zip([0] + starts.tolist(),
+                                  starts.tolist() + [len(keys)])]
+
+
+class TrigramIndex(object):
+    def __init__(self, repo_path,
+                 batch_size=constants.TRIGRAM_INDEX_BATCH_SIZE):
+        """The trigram index of the blobs of a clone
+
+        :param repo_path: path to the clone (string)
+        :param batch_size: bytes of blobs to read between writes of the
+                           posting lists (int)
+        """
+        self.repo_path = repo_path
+        self.path = os.path.join(repo_path, '.git',
+                                 constants.TRIGRAM_INDEX_FILE)
+        self.batch_size = batch_size
+        self._db = None
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path)
+            for statement in SCHEMA:
+                self._db.execute(statement)
+        return self._db
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _reachable_blobs(self):
+        git = 'git -C {0} '.format(self.repo_path)
+        objects = subprocess.check_output(
+            git + 'rev-list --objects --all | ' + git +
+            "cat-file --batch-check='%(objecttype) %(objectname) %(rest)'",
+            shell=True)
+        return set(unhexlify(line.split(' ', 2)[1])
+                   for line in objects.splitlines()
+                   if line.startswith('blob '))
+
+    def _write_postings(self, db, blobs):
+        for key, blob_ids in postings(blobs):
+            row = db.execute('SELECT blobs FROM postings WHERE trigram = ?',
+                             (key,)).fetchone()
+            if row:
+                blob_ids = str(row[0]) + blob_ids
+            db.execute('INSERT OR REPLACE INTO postings VALUES (?, ?)',
+                       (key, buffer(blob_ids)))
+
+    def update(self):
+        """Index the reachable blobs which aren't indexed yet and return
+        their number
+        """
+        db = self._connect()
+        indexed = set(str(sha) for (sha,) in db.execute(
+            'SELECT sha FROM blobs'))
+        new_blobs = sorted(self._reachable_blobs() - indexed)
+        if not new_blobs:
+            return 0
+        blob_id = db.execute('SELECT MAX(id) FROM blobs').fetchone()[0] or 0
+        store = pack.ObjectStore(self.repo_path)
+        batch = []
+        size = 0
+        try:
+            for sha in new_blobs:
+                blob_id += 1
+                _, data = store.read_binary(sha)
+                batch.append((blob_id, data))
+                db.execute('INSERT INTO blobs VALUES (?, ?)',
+                           (blob_id, buffer(sha)))
+                size += len(data)
+                if size >= self.batch_size:
+                    self._write_postings(db, batch)
+                    batch = []
+                    size = 0
+            self._write_postings(db, batch)
+            # An interrupted update leaves the index as it was.
+            db.commit()
+        except BaseException:
+            db.rollback()
+            raise
+        finally:
+            store.close()
+        return len(new_blobs)
+
+    def _blob_ids(self, db, keys):
+        """Return the ids of the blobs containing all the trigrams
+        """
+        blob_ids = None
+        for key in keys:
+            row = db.execute('SELECT blobs FROM postings WHERE trigram = ?',
+                             (key,)).fetchone()
+            if row is None:
+                return set()
+            ids = set(array.array('I', str(row[0])))
+            blob_ids = ids if blob_ids is None else blob_ids & ids
+            if not blob_ids:
+                break
+        return blob_ids
+
+    def candidates(self, search_list):
+        """Return the binary shas of the indexed blobs which may match a
+        pattern of the search list, or None if a pattern can't be
+        narrowed down
+        """
+        db = self._connect()
+        blob_ids = set()
+        for pattern in search_list:
+            keys = set(key for substring in
+                       patterns.required_substrings(pattern)
+                       for key in trigrams(substring))
+            if not keys:
+                return None
+            blob_ids.update(self._blob_ids(db, keys))
+        blob_ids = sorted(blob_ids)
+        shas = set()
+        for start in xrange(0, len(blob_ids), MAX_VARIABLES):
+            chunk = blob_ids[start:start + MAX_VARIABLES]
+            shas.update(str(sha) for (sha,) in db.execute(
+                'SELECT sha FROM blobs WHERE id IN ({0})'.format(
+                    ', '.join('?' * len(chunk))), chunk))
+        return shas
+
+    def size(self):
+        """Return the number of indexed blobs
+        """
+        return self._connect().execute(
+            'SELECT COUNT(*) FROM blobs').fetchone()[0]
+
+
+def clones(cloned_repos_dir):
+    """Return the paths of the clones of a clones directory
+    """
+    paths = []
+    for root, dirs, _ in os.walk(cloned_repos_dir):
+        if root != cloned_repos_dir and '.git' in dirs:
+            paths.append(root)
+            dirs[:] = []
+        else:
+            # Skip the shared object store and other hidden files.
+            dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+    return paths
+
+
+def update(cloned_repos_dir, verbose=False):
+    """Api method build or update the trigram index of every clone of a
+    clones directory
+    """
+    utils.check_if_executable_exists_else_exit('git')
+    utils.logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    repo_paths = clones(cloned_repos_dir) \
+        if os.path.isdir(cloned_repos_dir) else []
+    if not repo_paths:
+        utils.logger.error('No clones found in {0}'.format(cloned_repos_dir))
+        sys.exit(1)
+    for repo_path in repo_paths:
+        trigram_index = TrigramIndex(repo_path)
+        try:
+            indexed = trigram_index.update()
+            utils.logger.info('Indexed {0} new blobs of {1} ({2} in '
+                              'total).'.format(indexed, repo_path,
+                                               trigram_index.size()))
+        except subprocess.CalledProcessError as error:
+            utils.logger.error('Failed to index {0}: {1}'.format(
+                repo_path, error))
+        finally:
+            trigram_index.close()
@@ -57,7 +57,8 @@ def read_config_file(config_file,
                      search_list=None,
                      print_result=False,
                      is_organization=True,
-                     remove_cloned_dir=False):
+                     remove_cloned_dir=False,
+                     **kwargs):
     """Define vars from "config.yaml" file
     """
     with open(config_file) as config:
@@ -78,6 +79,8 @@ def read_config_file(config_file,
     conf_vars.setdefault('verbose', verbose)
     conf_vars.setdefault('is_organization', is_organization)
     conf_vars.setdefault('remove_cloned_dir', remove_cloned_dir)
+    for key, value in kwargs.items():
+        conf_vars.setdefault(key, value)
     return conf_vars
 
 
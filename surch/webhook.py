@@ -0,0 +1,239 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import re
+import sys
+import hmac
+import json
+import Queue
+import hashlib
+import logging
+import threading
+from time import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+from .plugins import handler
+from . import repo, utils, constants
+
+NULL_SHA = '0' * 40
+SHA_REGEX = re.compile(r'^[0-9a-f]{40}$')
+# The clone url ends up on a git command line, so only accept
+# characters a legitimate repository url consists of. It must be a
+# remote url (`https://`, `ssh://`, `git://` or `user@host:`): local
+# paths would scan whatever the host can read, and a leading `-` would
+# be taken as an option.
+CLONE_URL_REGEX = re.compile(
+    r'^(?:(?:https|ssh|git)://\w[\w@:.~+-]*/|\w[\w.-]*@\w[\w.-]*:)'
+    r'[\w@:/.~+-]+$')
+LOOPBACK_HOSTS = ('localhost', '::1')
+
+
+class PushReceiver(object):
+    def __init__(self,
+                 search_list,
+                 host='127.0.0.1',
+                 port=constants.WEBHOOK_PORT,
+                 secret=None,
+                 pager=None,
+                 verbose=False,
+                 config_file=None,
+                 results_dir=None,
+                 cloned_repos_dir=None,
+                 **kwargs):
+        """Surch push receiver instance init
+
+        :param search_list: list of string we want to search (list)
+        :param host: address to listen on (string)
+        :param port: port to listen on (int)
+        :param secret: GitHub webhook secret for signature checks (string)
+        :param verbose: log level (boolean)
+        :param results_dir: path to result file (string)
+        :param cloned_repos_dir: path for cloned repos (string)
+        """
+        self.logger = utils.logger
+        self.logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+        if len(search_list) == 0:
+            self.logger.error(
+                'You must supply at least one string to search for.')
+            sys.exit(1)
+        if not secret and not _is_loopback(host):
+            self.logger.error(
+                'Refusing to listen on {0} without a webhook secret: anyone '
+                'could make Surch clone and scan repositories. Pass '
+                '--secret or listen on 127.0.0.1.'.format(host))
+            sys.exit(1)
+
+        self.search_list = search_list
+        self.secret = secret
+        self.pager = pager
+        self.verbose = verbose
+        self.config_file = config_file
+        self.results_dir = results_dir
+        self.cloned_repos_dir = cloned_repos_dir or constants.CLONED_REPOS_PATH
+        self.pushes = Queue.Queue()
+        self.server = HTTPServer((host, port), _PushRequestHandler)
+        self.server.receiver = self
+        self.address = self.server.server_address
+        self._worker = threading.Thread(target=self._scan_pushes)
+        self._worker.daemon = True
+
+    def verify_signature(self, body, signature):
+        """Check the `X-Hub-Signature` header GitHub sends with
+        each delivery when the webhook has a secret
+        """
+        if not self.secret:
+            return True
+        if not signature:
+            return False
+        digest = hmac.new(str(self.secret), body, hashlib.sha1).hexdigest()
+        return hmac.compare_digest('sha1={0}'.format(digest), signature)
+
+    def parse_push(self, payload):
+        """Return the clone url and the commit range of a push event payload
+        or None when there is nothing to scan
+        """
+        try:
+            clone_url = payload['repository']['clone_url']
+            before = payload['before']
+            after = payload['after']
+        except (KeyError, TypeError):
+            raise ValueError('Not a push event payload')
+        if not CLONE_URL_REGEX.match(clone_url):
+            raise ValueError('Invalid clone url: {0}'.format(clone_url))
+        if not SHA_REGEX.match(before) or not SHA_REGEX.match(after):
+            raise ValueError('Invalid commit range: {0}..{1}'.format(
+                before, after))
+        if after == NULL_SHA:
+            # The branch was deleted.
+            return None
+        if before == NULL_SHA:
+            # A new branch was pushed; we have nothing to compare it to.
+            return clone_url, after
+        return clone_url, '{0}..{1}'.format(before, after)
+
+    def scan_push(self, clone_url, commit_range):
+        """Fetch the pushed repository and scan only the pushed commits
+        """
+        start = time()
+        self.logger.info('Scanning push to {0} ({1})...'.format(
+            clone_url, commit_range))
+        push_repo = repo.Repo(
+            pager=self.pager,
+            repo_url=clone_url,
+            verbose=self.verbose,
+            consolidate_log=True,
+            config_file=self.config_file,
+            results_dir=self.results_dir,
+            search_list=self.search_list,
+            commit_range=commit_range,
+            cloned_repo_dir=self.cloned_repos_dir)
+        push_repo.search(search_list=self.search_list)
+        self.logger.info('Push to {0} scanned in {1} seconds.'.format(
+            clone_url, utils.convert_to_seconds(start, time())))
+
+    def _scan_pushes(self):
+        while True:
+            clone_url, commit_range = self.pushes.get()
+            try:
+                self.scan_push(clone_url, commit_range)
+            except (Exception, SystemExit) as error:
+                # Repo exits on some errors, which must not stop the
+                # only thread scanning pushes.
+                self.logger.error('Failed scanning push to {0}: {1}'.format(
+                    clone_url, error if not isinstance(error, SystemExit)
+                    else 'exited with {0}'.format(error.code)))
+            finally:
+                self.pushes.task_done()
+
+    def serve_forever(self):
+        self._worker.start()
+        self.logger.info('Listening for push events on {0}:{1}...'.format(
+            *self.address))
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+
+def _is_loopback(host):
+    return host in LOOPBACK_HOSTS or host.startswith('127.')
+
+
+class _PushRequestHandler(BaseHTTPRequestHandler):
+    def _respond(self, code, message):
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/plain')
+        self.end_headers()
+        self.wfile.write(message)
+
+    def do_POST(self):
+        receiver = self.server.receiver
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not receiver.verify_signature(
+                body, self.headers.get('X-Hub-Signature')):
+            return self._respond(403, 'Bad signature')
+        event = self.headers.get('X-GitHub-Event', 'push')
+        if event == 'ping':
+            return self._respond(200, 'pong')
+        if event != 'push':
+            return self._respond(202, 'Ignoring {0} event'.format(event))
+        try:
+            push = receiver.parse_push(json.loads(body))
+        except ValueError as error:
+            return self._respond(400, str(error))
+        if push:
+            receiver.pushes.put(push)
+        self._respond(202, 'Accepted')
+
+    def log_message(self, format, *args):
+        utils.logger.debug(format % args)
+
+
+def receive(
+        host='127.0.0.1',
+        port=constants.WEBHOOK_PORT,
+        secret=None,
+        pager=None,
+        source=None,
+        verbose=False,
+        search_list=None,
+        config_file=None,
+        results_dir=None,
+        cloned_repos_dir=None,
+        **kwargs):
+    """Api method init push receiver instance and serve push events
+    """
+
+    utils.check_if_executable_exists_else_exit('git')
+    pager = handler.plugins_handle(config_file=config_file, plugins_list=pager)
+    source = handler.plugins_handle(config_file=config_file,
+                                    plugins_list=source)
+    search_list = handler.merge_all_search_list(source=source,
+                                                config_file=config_file,
+                                                search_list=search_list or [])
+    receiver = PushReceiver(
+        host=host,
+        port=port,
+        pager=pager,
+        secret=secret,
+        verbose=verbose,
+        config_file=config_file,
+        results_dir=results_dir,
+        search_list=search_list,
+        cloned_repos_dir=cloned_repos_dir)
+    receiver.serve_forever()
@@ -0,0 +1,387 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import re
+import sys
+import json
+import time
+import errno
+import socket
+import shutil
+import logging
+import threading
+
+from tinydb import TinyDB
+
+from . import repo, delta, utils, constants
+
+# The queue is a shared directory (e.g. on NFS) laid out as:
+#   plan.json            the search list and scan options of the run
+#   units/<unit>.json    a repository to scan
+#   leases/<unit>        held by the worker scanning the unit; its mtime
+#                        is renewed while the worker is alive
+#   shards/<unit>.<worker>/results.json
+#                        the results of one attempt at a unit
+#   done/<unit>          names the shard holding the unit's results
+#   attempts/<unit>.<n>  the error of the nth failed attempt at a unit
+#   failed/<unit>        the unit failed too many times and is given up
+# Every state change is a single atomic create (O_EXCL), rename or
+# removal, so workers on several hosts need no other coordination.
+
+
+def _create_exclusive(path, content=''):
+    """Create a file only if it doesn't exist. Return whether it was
+    created by this call.
+    """
+    try:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    except OSError as error:
+        if error.errno == errno.EEXIST:
+            return False
+        raise
+    with os.fdopen(fd, 'w') as f:
+        f.write(content)
+    return True
+
+
+class WorkQueue(object):
+    def __init__(self, queue_dir, lease_ttl=constants.LEASE_TTL):
+        """A queue of repository work units in a shared directory
+
+        :param queue_dir: the shared directory (string)
+        :param lease_ttl: seconds a lease lasts without being
+                          renewed (int)
+        """
+        self.logger = utils.logger
+        self.queue_dir = queue_dir
+        self.lease_ttl = lease_ttl
+        self.units_dir = os.path.join(queue_dir, 'units')
+        self.leases_dir = os.path.join(queue_dir, 'leases')
+        self.shards_dir = os.path.join(queue_dir, 'shards')
+        self.done_dir = os.path.join(queue_dir, 'done')
+        self.attempts_dir = os.path.join(queue_dir, 'attempts')
+        self.failed_dir = os.path.join(queue_dir, 'failed')
+        self.plan_path = os.path.join(queue_dir, 'plan.json')
+
+    def plan(self, repos_urls, search_list, **options):
+        """Write a work unit per repository along with the search list
+        and options the workers should use
+        """
+        for directory in (self.units_dir, self.leases_dir, self.shards_dir,
+                          self.done_dir, self.attempts_dir, self.failed_dir):
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+        # The plan is only readable by its owner since the search list
+        # may contain secrets (e.g. from Vault).
+        if not _create_exclusive(self.plan_path, json.dumps(
+                dict(search_list=search_list, options=options), indent=4)):
+            self.logger.error('A work queue was already planned in {0}'.format(
+                self.queue_dir))
+            sys.exit(1)
+        for index, repo_url in enumerate(repos_urls):
+            repo_name = repo_url.rsplit('/', 1)[-1].rsplit('.', 1)[0]
+            unit_id = '{0:05d}-{1}'.format(
+                index, re.sub(r'[^\w.-]', '_', repo_name))
+            with open(os.path.join(self.units_dir, unit_id + '.json'),
+                      'w') as unit_file:
+                json.dump(dict(id=unit_id, repo_url=repo_url), unit_file)
+        self.logger.info('Planned {0} work units in {1}'.format(
+            len(repos_urls), self.queue_dir))
+
+    def read_plan(self):
+        with open(self.plan_path) as plan_file:
+            return json.load(plan_file)
+
+    def units(self):
+        return sorted(name[:-len('.json')]
+                      for name in os.listdir(self.units_dir)
+                      if name.endswith('.json'))
+
+    def read_unit(self, unit_id):
+        with open(os.path.join(self.units_dir, unit_id + '.json')) as f:
+            return json.load(f)
+
+    def is_done(self, unit_id):
+        return os.path.isfile(os.path.join(self.done_dir, unit_id))
+
+    def is_failed(self, unit_id):
+        return os.path.isfile(os.path.join(self.failed_dir, unit_id))
+
+    def pending(self):
+        return [unit_id for unit_id in self.units()
+                if not self.is_done(unit_id) and not self.is_failed(unit_id)]
+
+    def _lease_path(self, unit_id):
+        return os.path.join(self.leases_dir, unit_id)
+
+    def _reclaim_if_expired(self, unit_id, worker_id):
+        """Remove a lease whose holder stopped renewing it. Only one of
+        the workers racing to do so succeeds.
+        """
+        lease_path = self._lease_path(unit_id)
+        try:
+            expired = time.time() - os.path.getmtime(lease_path) > \
+                self.lease_ttl
+        except OSError:
+            return True
+        if not expired:
+            return False
+        expired_path = '{0}.expired.{1}'.format(lease_path, worker_id)
+        try:
+            os.rename(lease_path, expired_path)
+        except OSError:
+            return False
+        os.remove(expired_path)
+        self.logger.info('Reclaimed expired lease on {0}'.format(unit_id))
+        return True
+
+    def claim(self, worker_id):
+        """Lease the next unit nobody is working on and return its id,
+        or None if there is none right now
+        """
+        for unit_id in self.pending():
+            lease_path = self._lease_path(unit_id)
+            if _create_exclusive(lease_path, worker_id):
+                if self.is_done(unit_id) or self.is_failed(unit_id):
+                    os.remove(lease_path)
+                    continue
+                return unit_id
+            if self._reclaim_if_expired(unit_id, worker_id) and \
+                    _create_exclusive(lease_path, worker_id):
+                return unit_id
+        return None
+
+    def renew(self, unit_id):
+        try:
+            os.utime(self._lease_path(unit_id), None)
+            return True
+        except OSError:
+            return False
+
+    def release(self, unit_id):
+        try:
+            os.remove(self._lease_path(unit_id))
+        except OSError:
+            pass
+
+    def record_failure(self, unit_id, worker_id, error,
+                       max_attempts=constants.QUEUE_MAX_ATTEMPTS):
+        """Record a failed attempt at a unit and give the unit up once
+        it failed `max_attempts` times. Return whether it was given up.
+        """
+        for directory in (self.attempts_dir, self.failed_dir):
+            # Queues planned by an older version don't have them.
+            try:
+                os.makedirs(directory)
+            except OSError as os_error:
+                if os_error.errno != errno.EEXIST:
+                    raise
+        content = json.dumps(dict(worker=worker_id, error=str(error)))
+        attempt = 1
+        while not _create_exclusive(os.path.join(
+                self.attempts_dir, '{0}.{1}'.format(unit_id, attempt)),
+                content):
+            attempt += 1
+        if attempt < max_attempts:
+            return False
+        _create_exclusive(os.path.join(self.failed_dir, unit_id), content)
+        return True
+
+    def failed(self):
+        """Return the error of the last attempt at every failed unit
+        """
+        errors = {}
+        for unit_id in self.units():
+            if self.is_failed(unit_id):
+                with open(os.path.join(self.failed_dir, unit_id)) as f:
+                    errors[unit_id] = json.load(f)['error']
+        return errors
+
+    def shard_dir(self, unit_id, worker_id):
+        return os.path.join(self.shards_dir, '{0}.{1}'.format(
+            unit_id, worker_id))
+
+    def complete(self, unit_id, worker_id):
+        """Mark a unit as done with this worker's shard, unless another
+        worker (which reclaimed the lease) got there first
+        """
+        shard = os.path.basename(self.shard_dir(unit_id, worker_id))
+        if not _create_exclusive(os.path.join(self.done_dir, unit_id),
+                                 shard):
+            shutil.rmtree(self.shard_dir(unit_id, worker_id),
+                          ignore_errors=True)
+        self.release(unit_id)
+
+    def done_shards(self):
+        shards = {}
+        for unit_id in self.units():
+            if self.is_done(unit_id):
+                with open(os.path.join(self.done_dir, unit_id)) as f:
+                    shards[unit_id] = os.path.join(
+                        self.shards_dir, f.read().strip(), 'results.json')
+        return shards
+
+
+class Worker(object):
+    def __init__(self,
+                 queue_dir,
+                 verbose=False,
+                 cloned_repos_dir=None,
+                 lease_ttl=constants.LEASE_TTL,
+                 poll_interval=constants.QUEUE_POLL_INTERVAL,
+                 max_attempts=constants.QUEUE_MAX_ATTEMPTS,
+                 **kwargs):
+        """Surch worker instance init
+
+        :param queue_dir: the shared queue directory (string)
+        :param verbose: log level (boolean)
+        :param cloned_repos_dir: local path for cloned repos (string)
+        :param lease_ttl: seconds a lease lasts without being
+                          renewed (int)
+        :param poll_interval: seconds to wait between looking for
+                          reclaimable units (int)
+        :param max_attempts: failed attempts after which a unit is
+                          given up (int)
+        """
+        utils.check_if_executable_exists_else_exit('git')
+        self.logger = utils.logger
+        self.logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+        self.verbose = verbose
+        self.queue = WorkQueue(queue_dir, lease_ttl=lease_ttl)
+        self.cloned_repos_dir = cloned_repos_dir or constants.CLONED_REPOS_PATH
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.worker_id = '{0}-{1}'.format(
+            re.sub(r'[^\w.-]', '_', socket.gethostname()), os.getpid())
+
+    def _renew_lease(self, unit_id, scanned):
+        while not scanned.wait(self.queue.lease_ttl / 3.0):
+            if not self.queue.renew(unit_id):
+                self.logger.warn('Lost the lease on {0}'.format(unit_id))
+                return
+
+    def process(self, unit_id):
+        unit = self.queue.read_unit(unit_id)
+        plan = self.queue.read_plan()
+        self.logger.info('Worker {0} scanning {1}...'.format(
+            self.worker_id, unit['repo_url']))
+        scanned = threading.Event()
+        heartbeat = threading.Thread(target=self._renew_lease,
+                                     args=(unit_id, scanned))
+        heartbeat.daemon = True
+        heartbeat.start()
+        try:
+            options = plan['options']
+            options.update(
+                repo_url=unit['repo_url'],
+                verbose=self.verbose,
+                consolidate_log=True,
+                search_list=plan['search_list'],
+                results_dir=self.queue.shard_dir(unit_id, self.worker_id),
+                cloned_repo_dir=self.cloned_repos_dir)
+            unit_repo = repo.Repo(**options)
+            unit_repo.search(plan['search_list'])
+        except Exception as error:
+            # Record the attempt before releasing the lease, so the unit
+            # is never claimed again once it's given up.
+            if self.queue.record_failure(unit_id, self.worker_id, error,
+                                         self.max_attempts):
+                self.logger.error('Giving up on {0} after {1} failed '
+                                  'attempts.'.format(unit_id,
+                                                     self.max_attempts))
+            self.queue.release(unit_id)
+            raise
+        finally:
+            scanned.set()
+        self.queue.complete(unit_id, self.worker_id)
+
+    def work(self):
+        """Process units until every unit of the queue is done
+        """
+        processed = 0
+        while True:
+            unit_id = self.queue.claim(self.worker_id)
+            if unit_id:
+                try:
+                    self.process(unit_id)
+                    processed += 1
+                except Exception as error:
+                    self.logger.error('Failed scanning {0}: {1}'.format(
+                        unit_id, error))
+                continue
+            if not self.queue.pending():
+                break
+            # The remaining units are leased by other workers. Wait in
+            # case one of them dies and its lease expires.
+            time.sleep(self.poll_interval)
+        self.logger.info('Worker {0} processed {1} units.'.format(
+            self.worker_id, processed))
+        return processed
+
+
+def merge(queue_dir, results_dir=None, consolidate_log=False):
+    """Combine the result shards of all done units into one results file
+    and return the units which are not done or failed
+    """
+    queue = WorkQueue(queue_dir)
+    results_file_path = os.path.join(
+        results_dir or constants.RESULTS_PATH, 'results.json')
+    utils.handle_results_file(results_file_path, consolidate_log)
+    db = TinyDB(
+        results_file_path,
+        indent=4,
+        sort_keys=True,
+        separators=(',', ': '))
+    shards = queue.done_shards()
+    result_count = 0
+    for shard_path in shards.values():
+        if not os.path.isfile(shard_path):
+            continue
+        results = TinyDB(shard_path).all()
+        db.insert_multiple(results)
+        result_count += len(results)
+    missing = queue.pending()
+    if missing:
+        utils.logger.warn('{0} unit(s) are not done yet: {1}'.format(
+            len(missing), ', '.join(missing)))
+    failed = queue.failed()
+    for unit_id, error in sorted(failed.items()):
+        utils.logger.error('Unit {0} ({1}) failed: {2}'.format(
+            unit_id, queue.read_unit(unit_id)['repo_url'], error))
+    utils.logger.info('Merged {0} results from {1} shards into {2}'.format(
+        result_count, len(shards), results_file_path))
+    scanned_repos = set()
+    for unit_id in shards:
+        repo_url = queue.read_unit(unit_id)['repo_url']
+        scanned_repos.add(repo_url.rsplit('/', 1)[-1].rsplit('.', 1)[0])
+    delta.update(results_file_path, scanned_repos=scanned_repos)
+    return sorted(missing + failed.keys())
+
+
+def work(queue_dir, verbose=False, cloned_repos_dir=None,
+         lease_ttl=constants.LEASE_TTL,
+         max_attempts=constants.QUEUE_MAX_ATTEMPTS, **kwargs):
+    """Api method init worker instance and process the queue
+    """
+    if not os.path.isfile(os.path.join(queue_dir, 'plan.json')):
+        utils.logger.error('No work queue found in {0}'.format(queue_dir))
+        sys.exit(1)
+    worker = Worker(queue_dir,
+                    verbose=verbose,
+                    lease_ttl=lease_ttl,
+                    max_attempts=max_attempts,
+                    cloned_repos_dir=cloned_repos_dir)
+    worker.work()
@@ -0,0 +1,109 @@
+########
+# Copyright (c) 2016 GigaSpaces Technologies Ltd. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#        http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+#    * WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#    * See the License for the specific language governing permissions and
+#    * limitations under the License.
+
+import os
+import mmap
+import subprocess
+from multiprocessing.pool import ThreadPool
+
+from . import pack, constants
+
+# Scanning the checked out files of a clone answers whether a secret is
+# in its current tree without decompressing any object. Files are
+# memory-mapped, so the regular expression and the entropy detector read
+# them in place, and several files are read at once.
+
+# Submodules and symlinks have no content to scan.
+SKIPPED_MODES = ('160000', '120000')
+
+
+class WorktreeSearch(object):
+    def __init__(self, repo_path, regex=None, entropy=None,
+                 workers=constants.WORKTREE_WORKERS):
+        """Search the checked out files of a repository
+
+        :param repo_path: path to the repository (string)
+        :param regex: compiled search list (regex)
+        :param entropy: detector of high entropy strings (EntropyDetector)
+        :param workers: number of files read at once (int)
+        """
+        self.repo_path = repo_path
+        self.regex = regex
+        self.entropy = entropy
+        self.workers = workers
+
+    def _git(self, command):
+        return subprocess.check_output(
+            'git -C {0} {1}'.format(self.repo_path, command), shell=True)
+
+    def is_clean(self):
+        """Return whether the tracked files are those of HEAD
+        """
+        return subprocess.call(
+            'git -C {0} diff --quiet HEAD --'.format(self.repo_path),
+            shell=True) == 0
+
+    def files(self):
+        """Return the paths of the tracked files
+        """
+        paths = []
+        for entry in self._git('ls-files -s -z').split('\0'):
+            if not entry:
+                continue
+            info, path = entry.split('\t', 1)
+            if info.split(' ', 1)[0] not in SKIPPED_MODES:
+                paths.append(path)
+        return paths
+
+    def scan_file(self, path):
+        """Return the path and the findings (`pattern`, `entropy`) of a
+        file
+        """
+        findings = []
+        with open(os.path.join(self.repo_path, path), 'rb') as scanned:
+            size = os.fstat(scanned.fileno()).st_size
+            if not size:
+                return path, findings
+            data = mmap.mmap(scanned.fileno(), size, access=mmap.ACCESS_READ)
+            try:
+                if self.regex and self.regex.search(data):
+                    findings.append(pack.PATTERN)
+                if self.entropy and self.entropy.scan(data):
+                    findings.append(pack.ENTROPY)
+            finally:
+                data.close()
+        return path, findings
+
+    def search(self, stop=None):
+        """Return the (path, finding) pairs of the checked out files
+
+        :param stop: called with the path and the findings of every file
+                     with findings, the files left aren't scanned if it
+                     returns True (callable)
+        """
+        paths = self.files()
+        pool = ThreadPool(self.workers)
+        found = []
+        try:
+            scanned = pool.imap_unordered(
+                self.scan_file, paths,
+                chunksize=max(1, len(paths) // (self.workers * 4)))
+            for path, findings in scanned:
+                found.extend((path, finding) for finding in findings)
+                if findings and stop and stop(path, findings):
+                    break
+            return sorted(found)
+        finally:
+            pool.terminate()